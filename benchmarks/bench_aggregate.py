@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Totals by category and month with qifparse.aggregate, with and without
+NumPy, against a loop over the transactions and their splits.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_aggregate [transactions]
+"""
+import sys
+import time
+
+from qifparse import columnar
+from qifparse.aggregate import totals
+from qifparse.parser import QifParser
+from benchmarks.synthetic import bank_lines
+
+
+def loop_totals(qif):
+    res = {}
+    for account, header, item in qif.iter_transactions():
+        for posting in getattr(item, '_splits', None) or [item]:
+            key = ((item.date.year, item.date.month), posting.category)
+            res[key] = res.get(key, 0) + posting.amount
+    return res
+
+
+def main(transactions=300000):
+    qif = QifParser.buildQif(QifParser._iter_parsed(
+        list(bank_lines(transactions)), 'dmy', '.', ''))
+    start = time.time()
+    table = qif.get_columns()
+    print('get_columns: %.2fs' % (time.time() - start))
+    numpy = columnar.get_numpy()
+    try:
+        for name, module in (('numpy', numpy), ('pure python', None)):
+            if name == 'numpy' and numpy is None:
+                continue
+            columnar.numpy = module
+            start = time.time()
+            totals(table, by=('month', 'category'), rollup=True)
+            print('totals, %s: %.3fs' % (name, time.time() - start))
+    finally:
+        columnar.numpy = numpy
+    start = time.time()
+    loop_totals(qif)
+    print('loop: %.3fs' % (time.time() - start))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Merging two overlapping imports of a bank account with Qif.merge, which
+matches the fingerprints of the transactions in a set, compared to looking
+for every new transaction among the existing ones.
+
+The two files hold the same number of transactions and overlap by half.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_dedupe [transactions] [pairwise_transactions]
+"""
+import io
+import sys
+import time
+
+from qifparse import dedupe
+from qifparse.parser import QifParser
+from benchmarks.synthetic import bank_lines
+
+
+def _overlapping(transactions):
+    """
+    :return: the texts of two files of transactions records, the second
+        starting at the middle of the first
+    """
+    lines = list(bank_lines(transactions + transactions // 2))
+    start = lines.index('!Type:Bank') + 1
+    head = lines[:start]
+    ends = [i + 1 for i, line in enumerate(lines) if line == '^'][1:]
+    records = [lines[begin:end]
+               for begin, end in zip([start] + ends[:-1], ends)]
+    return tuple(
+        '\n'.join(head + [line for record in part for line in record]) + '\n'
+        for part in (records[:transactions], records[transactions // 2:]))
+
+
+def _parse(text):
+    return QifParser.parse(io.StringIO(text), date_format='dmy',
+                           num_sep=('.', ''))
+
+
+def _pairwise(qif_obj, other):
+    existing = [(account.name, dedupe.fingerprint_text(item))
+                for account, header, item in qif_obj.iter_transactions()]
+    added = 0
+    for account, header, item in other.iter_transactions():
+        item_key = (account.name, dedupe.fingerprint_text(item))
+        for i, key in enumerate(existing):
+            if key == item_key:
+                del existing[i]
+                break
+        else:
+            added += 1
+    return added
+
+
+def _time(name, transactions, merge, *args):
+    start = time.time()
+    res = merge(*args)
+    elapsed = time.time() - start
+    print('%s, %d + %d transactions: %.2fs, %.0f transactions/s (%s)' % (
+        name, transactions, transactions, elapsed,
+        2 * transactions / elapsed, res))
+
+
+def main(transactions=200000, pairwise_transactions=5000):
+    for count, merges in ((pairwise_transactions, ['pairwise', 'merge']),
+                          (transactions, ['merge'])):
+        old, new = _overlapping(count)
+        if 'pairwise' in merges:
+            _time('pairwise', count, _pairwise, _parse(old), _parse(new))
+        _time('merge', count, dedupe.merge, _parse(old), _parse(new))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Cost of parsing the records appended to a large file with
+QifParser.parse_delta, compared to parsing the whole file again.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_delta [transactions] [appended]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from qifparse.parser import QifParser
+from benchmarks.synthetic import bank_lines, write_file
+
+
+def main(transactions=1000000, appended=1000):
+    fd, path = tempfile.mkstemp(suffix='.qif')
+    os.close(fd)
+    try:
+        lines = list(bank_lines(transactions + appended))
+        # 5 header lines, 7 or 10 lines per transaction
+        cut = 5 + sum(10 if i % 10 == 0 else 7 for i in range(transactions))
+        write_file(path, lines[:cut])
+        start = time.time()
+        index = QifParser.parse_delta(path, date_format='dmy',
+                                      num_sep=('.', '')).index
+        print('index: %d records in %.2fs' % (len(index),
+                                              time.time() - start))
+        write_file(path, lines)
+        start = time.time()
+        QifParser.parse_path(path, date_format='dmy', num_sep=('.', ''))
+        print('parse_path: %.2fs' % (time.time() - start))
+        start = time.time()
+        delta = QifParser.parse_delta(path, index)
+        print('parse_delta: %d new records in %.3fs' % (
+            len(delta.records), time.time() - start))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
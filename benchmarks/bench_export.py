@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Exporting transactions by record batches with qifparse.export, compared to
+converting them to dicts one at a time.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_export [transactions]
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from qifparse import export
+from qifparse.parser import QifParser
+from benchmarks.synthetic import bank_lines, write_file
+
+
+def _per_object(qif_obj, path):
+    with open(path, 'w') as fh:
+        for account, header, item in qif_obj.iter_transactions():
+            fh.write(json.dumps({
+                'date': item.date.date().isoformat(),
+                'amount': float(item.amount),
+                'payee': item.payee,
+                'category': item.category,
+                'to_account': item.to_account,
+                'memo': item.memo,
+                'account': account.name if account is not None else None,
+                'type': header[6:],
+                'splits': [{'amount': float(split.amount),
+                            'category': split.category,
+                            'to_account': split.to_account,
+                            'memo': split.memo}
+                           for split in getattr(item, '_splits', ())],
+            }))
+            fh.write('\n')
+
+
+def main(transactions=200000):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = write_file(os.path.join(tmpdir, 'file.qif'),
+                          bank_lines(transactions))
+        qif_obj = QifParser.parse_path(path, date_format='dmy',
+                                       num_sep=('.', ''))
+        start = time.time()
+        _per_object(qif_obj, os.path.join(tmpdir, 'objects.jsonl'))
+        print('dict per transaction, jsonl: %.2fs' % (time.time() - start))
+        formats = ['jsonl', 'csv']
+        if export.pyarrow is not None:
+            formats.extend(['parquet', 'arrow'])
+        for format in formats:
+            start = time.time()
+            qif_obj.export(os.path.join(tmpdir, 'transactions.' + format),
+                           os.path.join(tmpdir, 'splits.' + format))
+            print('batches, %s: %.2fs' % (format, time.time() - start))
+        with open(path) as fh:
+            start = time.time()
+            export.export(QifParser.iter_records(fh, date_format='dmy',
+                                                 num_sep=('.', ''),
+                                                 context=True),
+                          os.path.join(tmpdir, 'streamed.csv'))
+            print('parse and export while parsing, csv: %.2fs' % (
+                time.time() - start))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+QifParser.parse_many on many small files against a QifParser.parse call per
+file, the number format being guessed for each file.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_many [files] [transactions] [workers]
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from qifparse.parser import QifParser
+from benchmarks.synthetic import bank_lines, write_file
+
+
+def main(files=2000, transactions=50, workers=None):
+    workers = workers or multiprocessing.cpu_count()
+    tmpdir = tempfile.mkdtemp()
+    try:
+        rnd = random.Random(0)
+        paths = [write_file(os.path.join(tmpdir, '%d.qif' % i),
+                            bank_lines(rnd.randint(1, transactions * 2),
+                                       seed=i))
+                 for i in range(files)]
+        start = time.time()
+        for path in paths:
+            with open(path) as fh:
+                QifParser.parse(fh, date_format='dmy')
+        serial = time.time() - start
+        print('parse per file: %.2fs, %.1f files/s' % (
+            serial, files / serial))
+        batch = QifParser.parse_many(paths, workers=workers,
+                                     date_format='dmy')
+        print('parse_many, %d workers: %s, %.2fx' % (
+            workers, batch, serial / batch.elapsed))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
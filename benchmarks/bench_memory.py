@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Memory held by parsed transactions.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_memory [transactions]
+"""
+import sys
+import tracemalloc
+
+from qifparse.parser import QifParser
+from benchmarks.synthetic import bank_lines
+
+
+def main(transactions=100000):
+    lines = list(bank_lines(transactions))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    qif = QifParser.buildQif(
+        QifParser._iter_parsed(lines, 'dmy', '.', ''))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    # the input lines are excluded, the strings kept by the records are not
+    print('memory: %d records, %.0f bytes per transaction' % (
+        transactions, float(used) / transactions))
+    return qif
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Scaling of QifParser.parse_parallel with the number of workers.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_parallel [transactions] [max_workers]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from qifparse.parser import QifParser
+from benchmarks.synthetic import bank_lines, write_file
+
+
+def main(transactions=1000000, max_workers=None):
+    max_workers = max_workers or multiprocessing.cpu_count()
+    fd, path = tempfile.mkstemp(suffix='.qif')
+    os.close(fd)
+    try:
+        write_file(path, bank_lines(transactions))
+        with open(path) as fh:
+            start = time.time()
+            QifParser.parse(fh, date_format='dmy', num_sep=('.', ''))
+            serial = time.time() - start
+        print('parse: %.2fs' % serial)
+        workers = 1
+        while workers <= max_workers:
+            start = time.time()
+            QifParser.parse_parallel(path, workers=workers,
+                                     date_format='dmy', num_sep=('.', ''))
+            elapsed = time.time() - start
+            print('parse_parallel, %d workers: %.2fs, %.2fx' % (
+                workers, elapsed, serial / elapsed))
+            workers *= 2
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
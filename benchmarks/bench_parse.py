@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Parse throughput and peak memory on a synthetic bank file.
+
+Run from the repository root, once per reader since the peak memory is
+the one of the whole process::
+
+    python -m benchmarks.bench_parse [transactions] [parse|parse_path]
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from qifparse.parser import QifParser
+from benchmarks.synthetic import bank_lines, write_file
+
+
+def main(transactions=1000000, reader='parse'):
+    fd, path = tempfile.mkstemp(suffix='.qif')
+    os.close(fd)
+    try:
+        write_file(path, bank_lines(transactions))
+        start = time.time()
+        if reader == 'parse_path':
+            QifParser.parse_path(path, date_format='dmy', num_sep=('.', ''))
+        else:
+            with open(path) as fh:
+                QifParser.parse(fh, date_format='dmy', num_sep=('.', ''))
+        elapsed = time.time() - start
+    finally:
+        os.remove(path)
+    print('%s: %d records in %.2fs, %.0f records/sec, peak RSS %d MB' % (
+        reader, transactions, elapsed, transactions / elapsed,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(*([int(arg) for arg in args[:1]] + args[1:2]))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Loading a binary snapshot with QifParser.parse_cached, compared to parsing
+the file.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_snapshot [transactions]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from qifparse.parser import QifParser
+from benchmarks.synthetic import bank_lines, write_file
+
+
+def main(transactions=1000000):
+    fd, path = tempfile.mkstemp(suffix='.qif')
+    os.close(fd)
+    cache_path = path + '.snapshot'
+    try:
+        write_file(path, bank_lines(transactions))
+        start = time.time()
+        QifParser.parse_path(path, date_format='dmy', num_sep=('.', ''))
+        parse = time.time() - start
+        print('parse_path: %.2fs' % parse)
+        start = time.time()
+        QifParser.parse_cached(path, cache_path, date_format='dmy',
+                               num_sep=('.', ''))
+        print('parse_cached, miss: %.2fs, snapshot of %d bytes for %d' % (
+            time.time() - start, os.path.getsize(cache_path),
+            os.path.getsize(path)))
+        for verify in (True, False):
+            start = time.time()
+            QifParser.parse_cached(path, cache_path, date_format='dmy',
+                                   num_sep=('.', ''), verify=verify)
+            elapsed = time.time() - start
+            print('parse_cached, hit%s: %.2fs, %.1fx' % (
+                '' if verify else ' without hash', elapsed, parse / elapsed))
+    finally:
+        os.remove(path)
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
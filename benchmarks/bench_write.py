@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Peak memory and time of writing a parsed synthetic bank file.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_write [transactions]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from qifparse.parser import QifParser
+from qifparse.qif import write_records
+from benchmarks.synthetic import bank_lines, write_file
+
+
+def measure(name, func):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    # tracing slows everything down: measure memory in a second run
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('%s: %.2fs, peak %.1f MB' % (name, elapsed, peak / 1e6))
+
+
+def main(transactions=100000):
+    fd, path = tempfile.mkstemp(suffix='.qif')
+    os.close(fd)
+    try:
+        write_file(path, bank_lines(transactions))
+        qif = QifParser.parse_path(path, date_format='dmy',
+                                   num_sep=('.', ''))
+
+        def to_string():
+            with open(os.devnull, 'w') as out:
+                out.write(str(qif))
+
+        def write():
+            with open(os.devnull, 'w') as out:
+                qif.write(out)
+
+        def transcode():
+            with open(path) as fh, open(os.devnull, 'w') as out:
+                write_records(out, QifParser.iter_records(
+                    fh, date_format='dmy', num_sep=('.', ''), context=True))
+
+        measure('str(qif)', to_string)
+        measure('Qif.write', write)
+        measure('iter_records + write_records', transcode)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite: parse and write throughput, peak memory and round trip
+fidelity on synthetic files of every shape (see synthetic.SHAPES) and of
+several date and number formats, compared to the baselines stored in
+baselines.json.
+
+Formats are guessed while parsing, and must be the ones the file has been
+written with. Round trip: the written file parsed again must be written
+the same way, with the same number of records.
+
+Run from the repository root::
+
+    python -m benchmarks.suite [--transactions N] [--update] [scenario ...]
+
+The exit status is 1 when a scenario is slower or uses more memory than
+its baseline beyond the tolerance, or when its round trip fails.
+``--update`` stores the measures as the new baselines.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+from qifparse.parser import QifParser
+from benchmarks.synthetic import qif_lines
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+DEFAULT_TRANSACTIONS = 20000
+DEFAULT_TOLERANCE = 0.3
+
+Scenario = namedtuple('Scenario', 'name shape date_format num_sep')
+
+SCENARIOS = [
+    Scenario('bank', 'bank', 'dmy', ('.', '')),
+    Scenario('bank_mdy_thousands', 'bank', 'mdy', ('.', ',')),
+    Scenario('bank_ymd_comma', 'bank', 'ymd', (',', '')),
+    Scenario('bank_dmy_comma_thousands', 'bank', 'dmy', (',', '.')),
+    Scenario('splits', 'splits', 'dmy', ('.', '')),
+    Scenario('invst', 'invst', 'mdy', ('.', '')),
+    Scenario('memorized', 'memorized', 'dmy', ('.', '')),
+    Scenario('multi_account', 'multi_account', 'ymd', ('.', ',')),
+]
+
+# metrics where higher is better, the others being better lower
+THROUGHPUT_METRICS = ('parse_records_per_sec', 'parse_mb_per_sec',
+                      'write_mb_per_sec')
+MEMORY_METRICS = ('parse_peak_bytes_per_record',)
+
+
+class _Counter(object):
+    """
+    Text file object counting the characters written
+    """
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def _write_scenario(path, scenario, transactions):
+    """
+    :return: the number of records of the file
+    """
+    records = 0
+    with open(path, 'w') as fh:
+        for line in qif_lines(scenario.shape, transactions,
+                              date_format=scenario.date_format,
+                              num_sep=scenario.num_sep):
+            if line == '^':
+                records += 1
+            fh.write(line)
+            fh.write('\n')
+    return records
+
+
+def _count_records(qif):
+    return len(qif.get_accounts()) + len(qif.get_categories()) + \
+        len(qif.get_classes()) + \
+        sum(1 for transaction in qif.iter_transactions())
+
+
+def run_scenario(scenario, transactions=DEFAULT_TRANSACTIONS, repeat=3):
+    """
+    :return: ``(metrics, failures)``: dict of the measures and list of the
+        round trip failures
+    """
+    fd, path = tempfile.mkstemp(suffix='.qif')
+    os.close(fd)
+    failures = []
+    try:
+        records = _write_scenario(path, scenario, transactions)
+        size = os.path.getsize(path)
+        with open(path) as fh:
+            date_format, num_sep, _ = QifParser.sniffFormats(
+                line.strip() for line in fh)
+        if (date_format, tuple(num_sep)) != \
+                (scenario.date_format, scenario.num_sep):
+            failures.append('guessed formats %s %r instead of %s %r' % (
+                date_format, num_sep, scenario.date_format,
+                scenario.num_sep))
+        parsed = []
+        parse_time = best_time(
+            lambda: parsed.append(QifParser.parse_path(path)), repeat)
+        qif = parsed[-1]
+        del parsed[:]
+        tracemalloc.start()
+        QifParser.parse_path(path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        out = _Counter()
+        write_time = best_time(lambda: qif.write(out), repeat)
+        written = str(qif)
+        if _count_records(qif) != records:
+            failures.append('%d records parsed instead of %d' % (
+                _count_records(qif), records))
+        again = QifParser.parse(io.StringIO(written), date_format='dmy',
+                                num_sep=('.', ''))
+        if _count_records(again) != records:
+            failures.append('%d records parsed back instead of %d' % (
+                _count_records(again), records))
+        if str(again) != written:
+            failures.append('the file parsed back is written differently')
+    finally:
+        os.remove(path)
+    metrics = {
+        'parse_records_per_sec': records / parse_time,
+        'parse_mb_per_sec': size / parse_time / 1e6,
+        'write_mb_per_sec': out.size / repeat / write_time / 1e6,
+        'parse_peak_bytes_per_record': peak / float(records),
+    }
+    return metrics, failures
+
+
+def compare(metrics, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    :return: list of the regressions of metrics against baseline
+    """
+    res = []
+    for name in THROUGHPUT_METRICS:
+        if name in baseline and \
+                metrics[name] < baseline[name] * (1 - tolerance):
+            res.append('%s %.1f < %.1f' % (name, metrics[name],
+                                           baseline[name]))
+    for name in MEMORY_METRICS:
+        if name in baseline and \
+                metrics[name] > baseline[name] * (1 + tolerance):
+            res.append('%s %.1f > %.1f' % (name, metrics[name],
+                                           baseline[name]))
+    return res
+
+
+def load_baselines(path=BASELINES):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_baselines(baselines, path=BASELINES):
+    baselines = dict((name, dict((metric, round(value, 2))
+                                 for metric, value in metrics.items()))
+                     for name, metrics in baselines.items())
+    with open(path, 'w') as fh:
+        json.dump(baselines, fh, indent=2, sort_keys=True)
+        fh.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('scenarios', nargs='*',
+                        help='names of the scenarios to run, all by default')
+    parser.add_argument('--transactions', type=int,
+                        default=DEFAULT_TRANSACTIONS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--update', action='store_true',
+                        help='store the measures as the new baselines')
+    args = parser.parse_args(argv)
+    scenarios = [scenario for scenario in SCENARIOS
+                 if not args.scenarios or scenario.name in args.scenarios]
+    baselines = load_baselines()
+    status = 0
+    for scenario in scenarios:
+        metrics, failures = run_scenario(scenario, args.transactions,
+                                         args.repeat)
+        failures.extend(compare(metrics, baselines.get(scenario.name, {}),
+                                args.tolerance))
+        print('%-26s parse %8.0f records/s %6.2f MB/s, write %6.2f MB/s, '
+              'peak %5.0f bytes/record %s' % (
+                  scenario.name, metrics['parse_records_per_sec'],
+                  metrics['parse_mb_per_sec'], metrics['write_mb_per_sec'],
+                  metrics['parse_peak_bytes_per_record'],
+                  'FAILED: ' + '; '.join(failures) if failures else 'ok'))
+        if failures:
+            status = 1
+        baselines[scenario.name] = metrics
+    if args.update:
+        save_baselines(baselines)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
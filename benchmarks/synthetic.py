@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Generators of synthetic qif files for the benchmarks.
+
+Every generator yields the lines of a file, without line separators. Dates
+and numbers are written in the given ``date_format`` ('dmy', 'mdy' or
+'ymd', as guessed by QifParser.guessDateFormat) and ``num_sep``
+(``(decimal_sep, thousands_sep)``, as guessed by
+QifParser.guessNumberFormat).
+"""
+import random
+from datetime import date, timedelta
+
+PAYEES = ['Supermarket', 'Gas station', 'Joe Hayes', 'Restaurant',
+          'Book shop', 'Pharmacy', 'Electricity', 'Telephone']
+CATEGORIES = ['food', 'food:lunch', 'food:groceries', 'car:fuel',
+              'house:rent', 'house:utilities', 'health', 'leisure:books']
+INCOME_CATEGORIES = ['salary', 'interests']
+CLASSES = ['home', 'work', 'travel']
+SECURITIES = ['ACME', 'Globex', 'Initech', 'Umbrella', 'Hooli']
+INVESTMENT_ACTIONS = ['Buy', 'Sell', 'Div', 'ReinvDiv', 'ShrsIn']
+MEMORIZED_TYPES = ['C', 'D', 'P', 'E']
+
+DATE_FORMATS = {
+    'dmy': '%d/%m/%Y',
+    'mdy': '%m/%d/%Y',
+    'ymd': '%Y-%m-%d',
+}
+NUM_SEPS = [('.', ''), ('.', ','), (',', ''), (',', '.')]
+
+_START = date(2000, 1, 1)
+
+
+def format_date(day, date_format='dmy'):
+    return day.strftime(DATE_FORMATS[date_format])
+
+
+def format_number(value, decimals=2, num_sep=('.', '')):
+    """
+    Write an integer number of ``10 ** -decimals`` units, e.g. cents
+    """
+    decimal_sep, thousands_sep = num_sep
+    sign = '-' if value < 0 else ''
+    units, fraction = divmod(abs(value), 10 ** decimals)
+    digits = '%d' % units
+    if thousands_sep:
+        groups = []
+        while len(digits) > 3:
+            groups.insert(0, digits[-3:])
+            digits = digits[:-3]
+        digits = thousands_sep.join([digits] + groups)
+    return '%s%s%s%0*d' % (sign, digits, decimal_sep, decimals, fraction)
+
+
+def _random_day(rnd):
+    return _START + timedelta(days=rnd.randint(0, 7000))
+
+
+def account_lines(name, account_type):
+    yield '!Account'
+    yield 'N%s' % name
+    yield 'T%s' % account_type
+    yield '^'
+
+
+def bank_lines(transactions, seed=0, header='!Type:Bank', split_every=10,
+               splits=2, date_format='dmy', num_sep=('.', ''),
+               account='Checking'):
+    """
+    Yield the lines of a bank account with ``transactions`` records, one in
+    ``split_every`` having ``splits`` splits (none if split_every is 0)
+    :param account: name of the account, no account record if None
+    """
+    rnd = random.Random(seed)
+    if account is not None:
+        for line in account_lines(account, header.split(':')[1]):
+            yield line
+    yield header
+    for i in range(transactions):
+        amount = rnd.randint(-200000, 100000)
+        yield 'D%s' % format_date(_random_day(rnd), date_format)
+        yield 'T%s' % format_number(amount, 2, num_sep)
+        yield 'P%s' % rnd.choice(PAYEES)
+        yield 'N%d' % i
+        yield 'MTransaction %d' % i
+        if split_every and i % split_every == 0:
+            left = amount
+            for split in range(splits, 0, -1):
+                part = left // split
+                left -= part
+                yield 'S%s' % rnd.choice(CATEGORIES)
+                yield '$%s' % format_number(part, 2, num_sep)
+        else:
+            yield 'L%s' % rnd.choice(CATEGORIES)
+        yield '^'
+
+
+def investment_lines(transactions, seed=0, date_format='dmy',
+                     num_sep=('.', ''), account='Brokerage'):
+    """
+    Yield the lines of an investment account with ``transactions`` records
+    """
+    rnd = random.Random(seed)
+    if account is not None:
+        for line in account_lines(account, 'Invst'):
+            yield line
+    yield '!Type:Invst'
+    for i in range(transactions):
+        price = rnd.randint(1000, 500000)
+        quantity = rnd.randint(1000, 100000)
+        yield 'D%s' % format_date(_random_day(rnd), date_format)
+        yield 'N%s' % rnd.choice(INVESTMENT_ACTIONS)
+        yield 'Y%s' % rnd.choice(SECURITIES)
+        yield 'I%s' % format_number(price, 3, num_sep)
+        yield 'Q%s' % format_number(quantity, 3, num_sep)
+        yield 'T%s' % format_number(price * quantity // 10000, 2, num_sep)
+        yield 'O%s' % format_number(rnd.randint(0, 2000), 2, num_sep)
+        yield 'MOrder %d' % i
+        yield '^'
+
+
+def memorized_lines(transactions, seed=0, num_sep=('.', '')):
+    """
+    Yield the lines of a list of ``transactions`` memorized transactions
+    """
+    rnd = random.Random(seed)
+    yield '!Type:Memorized'
+    for i in range(transactions):
+        yield 'K%s' % rnd.choice(MEMORIZED_TYPES)
+        yield 'T%s' % format_number(rnd.randint(-200000, 100000), 2, num_sep)
+        yield 'P%s' % rnd.choice(PAYEES)
+        yield 'L%s' % rnd.choice(CATEGORIES)
+        yield 'MMemorized %d' % i
+        yield '^'
+
+
+def list_lines():
+    """
+    Yield the lines of the category and class lists, without descriptions:
+    format guessing takes all the ``D`` lines for dates
+    """
+    yield '!Type:Cat'
+    for name in CATEGORIES:
+        yield 'N%s' % name
+        yield 'E'
+        yield '^'
+    for name in INCOME_CATEGORIES:
+        yield 'N%s' % name
+        yield 'I'
+        yield '^'
+    yield '!Type:Class'
+    for name in CLASSES:
+        yield 'N%s' % name
+        yield '^'
+
+
+def multi_account_lines(transactions, seed=0, accounts=10, date_format='dmy',
+                        num_sep=('.', '')):
+    """
+    Yield the lines of the category and class lists followed by
+    ``accounts`` accounts of all types sharing ``transactions`` records
+    """
+    for line in list_lines():
+        yield line
+    kinds = ['Bank', 'CCard', 'Cash', 'Oth A', 'Invst']
+    for index in range(accounts):
+        kind = kinds[index % len(kinds)]
+        count = transactions // accounts + (index < transactions % accounts)
+        name = '%s %d' % (kind, index)
+        if kind == 'Invst':
+            lines = investment_lines(count, seed + index, date_format,
+                                     num_sep, account=name)
+        else:
+            lines = bank_lines(count, seed + index, '!Type:%s' % kind,
+                               date_format=date_format, num_sep=num_sep,
+                               account=name)
+        for line in lines:
+            yield line
+
+
+def _bank(transactions, seed, date_format, num_sep):
+    for line in list_lines():
+        yield line
+    for line in bank_lines(transactions, seed, date_format=date_format,
+                           num_sep=num_sep):
+        yield line
+
+
+def _splits(transactions, seed, date_format, num_sep):
+    return bank_lines(transactions, seed, split_every=1, splits=6,
+                      date_format=date_format, num_sep=num_sep)
+
+
+def _investments(transactions, seed, date_format, num_sep):
+    return investment_lines(transactions, seed, date_format, num_sep)
+
+
+def _memorized(transactions, seed, date_format, num_sep):
+    # memorized transactions have no date: a few dated records make the
+    # date format guessable
+    for line in bank_lines(20, seed, split_every=0, date_format=date_format,
+                           num_sep=num_sep):
+        yield line
+    for line in memorized_lines(transactions, seed, num_sep):
+        yield line
+
+
+def _multi_account(transactions, seed, date_format, num_sep):
+    return multi_account_lines(transactions, seed, date_format=date_format,
+                               num_sep=num_sep)
+
+
+# shape name: function(transactions, seed, date_format, num_sep) yielding
+# the lines of a file
+SHAPES = {
+    'bank': _bank,
+    'splits': _splits,
+    'invst': _investments,
+    'memorized': _memorized,
+    'multi_account': _multi_account,
+}
+
+
+def qif_lines(shape, transactions, seed=0, date_format='dmy',
+              num_sep=('.', '')):
+    """
+    Yield the lines of a file of one of the SHAPES
+    """
+    return SHAPES[shape](transactions, seed, date_format, num_sep)
+
+
+def write_file(path, lines):
+    with open(path, 'w') as fh:
+        for line in lines:
+            fh.write(line)
+            fh.write('\n')
+    return path
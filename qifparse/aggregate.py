@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Totals of the transactions of a Qif object by category, month and account.
+
+Amounts are summed over postings: a transaction counts with its own amount
+and category, unless it has splits, in which case each split counts with
+its amount and category. Sums are computed on the columns of a
+qifparse.columnar.TransactionTable, with NumPy when it is installed.
+"""
+import six
+from array import array
+from datetime import date
+
+from qifparse import columnar
+from qifparse.columnar import NO_VALUE, NO_DATE, TransactionTable
+
+GROUP_KEYS = ('category', 'account', 'month')
+CATEGORY_SEPARATOR = ':'
+
+# date.toordinal() of 1970-01-01, the epoch of numpy.datetime64
+_EPOCH_ORDINAL = 719163
+
+
+def _month(ordinal):
+    if ordinal == NO_DATE:
+        return None
+    day = date.fromordinal(ordinal)
+    return day.year, day.month
+
+
+def parent_categories(category):
+    """
+    :return: the category and its parents, e.g. ``food:lunch``, ``food``
+    """
+    res = [category]
+    while CATEGORY_SEPARATOR in category:
+        category = category.rsplit(CATEGORY_SEPARATOR, 1)[0]
+        res.append(category)
+    return res
+
+
+class Postings(object):
+    """
+    Amount, category, account and date columns of the postings of a
+    TransactionTable
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.strings = table.strings
+        splits = table.splits
+        numpy = columnar.get_numpy()
+        if numpy is not None:
+            mask = numpy.ones(len(table), dtype=bool)
+            parents = splits.column('parent')
+            mask[parents] = False
+            rows = numpy.flatnonzero(mask)
+            self.amount = numpy.concatenate(
+                (table.column('amount')[rows], splits.column('amount')))
+            self.category = numpy.concatenate(
+                (table.column('category')[rows], splits.column('category')))
+            self.account = numpy.concatenate(
+                (table.column('account')[rows],
+                 table.column('account')[parents]))
+            self.date = numpy.concatenate(
+                (table.column('date')[rows], table.column('date')[parents]))
+        else:
+            parents = splits.parent
+            with_splits = set(parents)
+            rows = [row for row in range(len(table))
+                    if row not in with_splits]
+            self.amount = array('q', (table.amount[row] for row in rows))
+            self.amount.extend(splits.amount)
+            self.category = array('i', (table.category[row] for row in rows))
+            self.category.extend(splits.category)
+            self.account = array('i', (table.account[row] for row in rows))
+            self.account.extend(table.account[row] for row in parents)
+            self.date = array('i', (table.date[row] for row in rows))
+            self.date.extend(table.date[row] for row in parents)
+
+    def __len__(self):
+        return len(self.amount)
+
+    def keys(self, name):
+        """
+        :return: the integer keys of the postings for a GROUP_KEYS name
+            and the function decoding them
+        """
+        get = self.strings.get
+        if name in ('category', 'account'):
+            return getattr(self, name), get
+        if name != 'month':
+            raise ValueError("can't group by %s, valid keys: %s" % (
+                name, ', '.join(GROUP_KEYS)))
+        numpy = columnar.get_numpy()
+        if numpy is not None:
+            ordinals = self.date
+            days = (ordinals - _EPOCH_ORDINAL).astype('datetime64[D]')
+            months = days.astype('datetime64[M]').astype('int64')
+            # months since 1970 start at 0: keep NO_VALUE for missing dates
+            months = numpy.where(ordinals == NO_DATE, NO_VALUE, months)
+
+            def decode(key):
+                if key == NO_VALUE:
+                    return None
+                return 1970 + key // 12, key % 12 + 1
+            return months, decode
+        cache = {}
+        months = []
+        for ordinal in self.date:
+            try:
+                months.append(cache[ordinal])
+            except KeyError:
+                months.append(cache.setdefault(ordinal, _month(ordinal)))
+        return months, lambda key: key
+
+    def totals(self, by='category'):
+        """
+        Sum the amounts grouping by one or more GROUP_KEYS
+        :param by: a key name or a tuple of key names
+        :return: dict mapping the values of the keys (a tuple of them when
+            by is a tuple) to Decimal totals
+        """
+        names = (by,) if isinstance(by, six.string_types) else tuple(by)
+        columns = []
+        decoders = []
+        for name in names:
+            keys, decode = self.keys(name)
+            columns.append(keys)
+            decoders.append(decode)
+        from_scaled = self.table.from_scaled
+        numpy = columnar.get_numpy()
+        sums = {}
+        if numpy is not None and len(self):
+            # a single integer key per posting, mixing the columns
+            combined = numpy.zeros(len(self), dtype='int64')
+            bounds = []
+            for column in columns:
+                column = numpy.asarray(column, dtype='int64')
+                low = int(column.min())
+                span = int(column.max()) - low + 1
+                combined = combined * span + (column - low)
+                bounds.append((low, span))
+            # sum the amounts of the runs of equal keys
+            order = numpy.argsort(combined, kind='stable')
+            combined = combined[order]
+            starts = numpy.flatnonzero(numpy.concatenate(
+                ([True], combined[1:] != combined[:-1])))
+            totals = numpy.add.reduceat(
+                numpy.asarray(self.amount, dtype='int64')[order], starts)
+            for key, total in zip(combined[starts].tolist(),
+                                  totals.tolist()):
+                values = []
+                for low, span in reversed(bounds):
+                    key, value = divmod(key, span)
+                    values.append(value + low)
+                sums[tuple(reversed(values))] = total
+        else:
+            for key, amount in zip(zip(*columns), self.amount):
+                sums[key] = sums.get(key, 0) + amount
+        res = {}
+        for key, total in sums.items():
+            key = tuple(decode(value) for decode, value in zip(decoders, key))
+            res[key if len(names) > 1 else key[0]] = from_scaled(total)
+        return res
+
+
+def totals(source, by='category', rollup=False, scale=None):
+    """
+    Total of the postings of a Qif object or of a TransactionTable grouped
+    by one or more of GROUP_KEYS
+    :param by: a key name or a tuple of key names
+    :param rollup: also add the totals of the subcategories to their
+        parents (``food:lunch`` to ``food``)
+    :param scale: decimals kept when building the table of a Qif object,
+        as many as the amounts have if None
+    :return: dict mapping the values of the keys to Decimal totals
+    """
+    if not isinstance(source, TransactionTable):
+        source = TransactionTable.from_qif(source, scale=scale)
+    res = Postings(source).totals(by)
+    names = (by,) if isinstance(by, six.string_types) else tuple(by)
+    if not rollup or 'category' not in names:
+        return res
+    position = names.index('category')
+    rolled = {}
+    for key, total in res.items():
+        category = key if len(names) == 1 else key[position]
+        for parent in parent_categories(category) if category else [None]:
+            if len(names) > 1:
+                parent = key[:position] + (parent,) + key[position + 1:]
+            rolled[parent] = rolled.get(parent, 0) + total
+    return rolled
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing of qif data read from an asyncio stream, e.g. the body of an HTTP
+request, without blocking the event loop.
+
+Lines are grouped in batches of whole records; each batch is parsed either
+in the loop, control being given back to the loop after it, or in an
+executor (e.g. a ThreadPoolExecutor) while the loop keeps running.
+Requires Python 3.7 or later.
+"""
+import asyncio
+import codecs
+import io
+
+from qifparse.parser import QifParser, QifParserException, \
+    QifParserInvalidDate, QifParserInvalidNumber, DEFAULT_SNIFF_LINES
+
+DEFAULT_BATCH_LINES = 5000
+DEFAULT_READ_SIZE = 1 << 16
+
+
+async def _iter_chunks(stream, read_size):
+    """
+    Chunks of an async iterable, or of an object with a ``read(size)``
+    coroutine
+    """
+    if hasattr(stream, '__aiter__'):
+        async for chunk in stream:
+            yield chunk
+        return
+    while True:
+        chunk = await stream.read(read_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def _iter_lines(stream, encoding, read_size=DEFAULT_READ_SIZE):
+    """
+    Stripped lines of a stream of bytes or str chunks, cut anywhere; line
+    endings can be ``\\n``, ``\\r\\n`` or ``\\r``
+    :return: async generator of lists of lines
+    """
+    decoder = None
+    pending = ''
+    async for chunk in _iter_chunks(stream, read_size):
+        if decoder is None:
+            empty = '' if isinstance(chunk, str) else b''
+            decoder = io.IncrementalNewlineDecoder(
+                None if isinstance(chunk, str)
+                else codecs.getincrementaldecoder(encoding)(), True)
+        lines = (pending + decoder.decode(chunk)).split('\n')
+        # the last line may go on in the next chunk
+        pending = lines.pop()
+        if lines:
+            yield [line.strip() for line in lines]
+    if decoder is not None:
+        pending += decoder.decode(empty, final=True)
+    if pending.strip():
+        yield [pending.strip()]
+
+
+def _parse_batch(lines, date_format, num_sep, header, account, parsers):
+    """
+    Parse whole records, starting with the header and account in effect
+    after the previous batch
+    :return: ``(records, header, account)`` the last two being in effect
+        after the batch
+    """
+    records = list(QifParser._iter_parsed(
+        lines, date_format, num_sep[0], num_sep[1], header, account, parsers))
+    for rtype, header, record_account, item in records:
+        if rtype == 'account':
+            account = item
+    return records, header, account
+
+
+async def iter_records(stream, date_format=None, num_sep=None, context=False,
+                       encoding='utf-8', executor=None,
+                       batch_lines=DEFAULT_BATCH_LINES,
+                       sniff_lines=DEFAULT_SNIFF_LINES):
+    """
+    Parse qif data read from an asyncio stream, yielding the records of a
+    batch of lines as soon as they have been read.
+
+    When ``date_format`` or ``num_sep`` are not given they are guessed from
+    the first ``sniff_lines`` lines of the stream (see
+    QifParser.sniffFormats), or from all of them, held until the end of the
+    stream, when these are not enough.
+
+    :param stream: async iterable of bytes or str chunks (lines or blocks),
+        or an object with a ``read(size)`` coroutine
+    :param context: if True yield ``(rtype, header, account, item)`` tuples,
+        as QifParser.iter_records
+    :param encoding: encoding of bytes chunks
+    :param executor: concurrent.futures executor parsing the batches, the
+        event loop being free meanwhile; batches are parsed in the loop
+        if None. Parsers aren't picklable: use a thread pool
+    :param batch_lines: number of lines read before parsing the records
+        they complete
+    :return: async generator of Transaction, Investment, Account, ...
+        objects
+    """
+    loop = asyncio.get_running_loop()
+    parsers = None
+    header = account = None
+    lines = []
+    sniffing = not date_format or num_sep is None
+    sniff_all = False
+
+    async def parse(batch):
+        nonlocal parsers, header, account
+        if parsers is None:
+            parsers = QifParser.recordParsers(date_format, *num_sep)
+        args = (batch, date_format, num_sep, header, account, parsers)
+        if executor is not None:
+            res = await loop.run_in_executor(executor, _parse_batch, *args)
+        else:
+            res = _parse_batch(*args)
+            # let the other tasks run between batches
+            await asyncio.sleep(0)
+        records, header, account = res
+        return records
+
+    async for new_lines in _iter_lines(stream, encoding):
+        lines.extend(new_lines)
+        if sniffing:
+            if sniff_all or len(lines) < sniff_lines:
+                continue
+            try:
+                date_format, num_sep = QifParser.sniffFormats(
+                    lines, date_format, num_sep, max_lines=sniff_lines)[:2]
+            except (QifParserInvalidDate, QifParserInvalidNumber):
+                # guess from all the lines once the stream is read
+                sniff_all = True
+                continue
+            sniffing = False
+        if len(lines) < batch_lines:
+            continue
+        # records of the batch end with its last terminator
+        end = len(lines)
+        while end and lines[end - 1] != '^':
+            end -= 1
+        if not end:
+            continue
+        batch = lines[:end]
+        del lines[:end]
+        for record in await parse(batch):
+            yield record if context else record[-1]
+    if not lines:
+        return
+    if sniffing:
+        date_format, num_sep = QifParser.sniffFormats(
+            lines, date_format, num_sep, max_lines=sniff_lines,
+            fallback=True)[:2]
+    for record in await parse(lines):
+        yield record if context else record[-1]
+
+
+async def parse(stream, date_format=None, num_sep=None, encoding='utf-8',
+                executor=None, batch_lines=DEFAULT_BATCH_LINES):
+    """
+    Parse qif data read from an asyncio stream into a Qif object, see
+    iter_records
+    """
+    records = []
+    async for record in iter_records(stream, date_format, num_sep, True,
+                                     encoding, executor, batch_lines):
+        records.append(record)
+    if not records:
+        raise QifParserException('Data is empty')
+    return QifParser.buildQif(records)
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar storage of transactions: one typed array per field instead of one
+object per transaction, for aggregate work over large files.
+
+Dates are stored as ordinals, amounts as integers in units of
+``10 ** -scale`` and strings as ids into a shared StringPool. Unless given,
+the scale starts at DEFAULT_SCALE and grows to the decimals of the amounts
+appended. NumPy is used for totals and filters when it is installed; it is
+imported on first use.
+"""
+from array import array
+from datetime import date
+from decimal import Decimal
+
+_NOT_IMPORTED = object()
+numpy = _NOT_IMPORTED
+
+DEFAULT_SCALE = 2
+NO_VALUE = -1  # id of a missing string
+NO_DATE = 0  # ordinal of a missing date
+
+# array typecode and NumPy dtype of the columns
+_ID_TYPE = _DATE_TYPE = ('i', 'int32')
+_AMOUNT_TYPE = ('q', 'int64')
+
+
+def get_numpy():
+    """
+    Imports NumPy on first use, keeping it out of the import of qifparse
+
+    :return: the numpy module, or None when it isn't installed
+    """
+    global numpy
+    if numpy is _NOT_IMPORTED:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+    return numpy
+
+
+class StringPool(object):
+    """
+    Interned strings referenced by integer ids
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value):
+        if value is None:
+            return NO_VALUE
+        try:
+            return self.ids[value]
+        except KeyError:
+            ident = self.ids[value] = len(self.values)
+            self.values.append(value)
+            return ident
+
+    def get(self, ident):
+        if ident == NO_VALUE:
+            return None
+        return self.values[ident]
+
+    def find(self, value):
+        """
+        :return: the id of value, None if the pool doesn't contain it
+        """
+        if value is None:
+            return NO_VALUE
+        return self.ids.get(value)
+
+
+class Table(object):
+    """
+    Parallel typed arrays, one per entry of ``_columns``
+    """
+    # (name, (array typecode, numpy dtype)) of the columns
+    _columns = ()
+    # columns holding ids into the string pool
+    _string_columns = ()
+
+    def __init__(self, scale=None, strings=None):
+        """
+        :param scale: decimals of the amounts, ValueError being raised for
+            amounts having more; grows as needed from DEFAULT_SCALE if None
+        """
+        self.fixed_scale = scale is not None
+        self.scale = DEFAULT_SCALE if scale is None else scale
+        self.strings = StringPool() if strings is None else strings
+        for name, types in self._columns:
+            setattr(self, name, array(types[0]))
+
+    def __len__(self):
+        return len(getattr(self, self._columns[0][0]))
+
+    def to_scaled(self, amount):
+        """
+        :return: amount as an integer in units of 10 ** -scale
+        """
+        if amount is None:
+            return 0
+        if isinstance(amount, float):
+            amount = repr(amount)
+        value = Decimal(amount).scaleb(self.scale)
+        integral = value.to_integral_value()
+        if value != integral:
+            if self.fixed_scale:
+                raise ValueError("%s has more than %d decimals" %
+                                 (amount, self.scale))
+            self.rescale(self.scale - value.normalize().as_tuple().exponent)
+            return self.to_scaled(amount)
+        return int(integral)
+
+    def rescale(self, scale):
+        """
+        Store the amounts with more decimals
+        """
+        factor = 10 ** (scale - self.scale)
+        self.amount = array(self.amount.typecode,
+                            [value * factor for value in self.amount])
+        self.scale = scale
+
+    def from_scaled(self, value):
+        return Decimal(int(value)).scaleb(-self.scale)
+
+    def column(self, name):
+        """
+        :return: a NumPy array sharing memory with the column, or the column
+            itself if NumPy is not installed. Release NumPy arrays before
+            appending rows.
+        """
+        values = getattr(self, name)
+        numpy = get_numpy()
+        if numpy is None:
+            return values
+        dtype = dict(self._columns)[name][1]
+        if not len(values):
+            return numpy.zeros(0, dtype=dtype)
+        return numpy.frombuffer(values, dtype=dtype)
+
+    def row(self, index):
+        """
+        :return: dict with the decoded values of a row
+        """
+        res = {}
+        for name, _ in self._columns:
+            value = getattr(self, name)[index]
+            if name in self._string_columns:
+                value = self.strings.get(value)
+            elif name == 'date':
+                value = date.fromordinal(value) if value != NO_DATE else None
+            elif name == 'amount':
+                value = self.from_scaled(value)
+            res[name] = value
+        return res
+
+    def total(self, rows=None):
+        """
+        :param rows: indexes of the rows to sum, all of them if None
+        :return: sum of the amount column as a Decimal
+        """
+        numpy = get_numpy()
+        if numpy is not None:
+            amounts = self.column('amount')
+            if rows is not None:
+                amounts = amounts[numpy.asarray(rows, dtype='intp')]
+            return self.from_scaled(amounts.sum(dtype='int64'))
+        if rows is None:
+            return self.from_scaled(sum(self.amount))
+        amounts = self.amount
+        return self.from_scaled(sum(amounts[row] for row in rows))
+
+    def totals_by(self, name, rows=None):
+        """
+        Sum the amounts grouping by a string column
+        :return: dict mapping the values of the column to Decimal totals
+        """
+        if name not in self._string_columns:
+            raise ValueError("%s is not a string column" % name)
+        get = self.strings.get
+        numpy = get_numpy()
+        if numpy is not None:
+            keys = self.column(name)
+            amounts = self.column('amount')
+            if rows is not None:
+                rows = numpy.asarray(rows, dtype='intp')
+                keys, amounts = keys[rows], amounts[rows]
+            unique, inverse = numpy.unique(keys, return_inverse=True)
+            sums = numpy.zeros(len(unique), dtype='int64')
+            numpy.add.at(sums, inverse.ravel(), amounts)
+            return dict((get(int(key)), self.from_scaled(value))
+                        for key, value in zip(unique, sums))
+        keys = getattr(self, name)
+        amounts = self.amount
+        if rows is None:
+            rows = range(len(keys))
+        sums = {}
+        for row in rows:
+            key = keys[row]
+            sums[key] = sums.get(key, 0) + amounts[row]
+        return dict((get(key), self.from_scaled(value))
+                    for key, value in sums.items())
+
+
+class SplitTable(Table):
+    """
+    Splits of the transactions of a TransactionTable, ``parent`` being the
+    index of the transaction row
+    """
+    _columns = (
+        ('parent', _ID_TYPE),
+        ('amount', _AMOUNT_TYPE),
+        ('category', _ID_TYPE),
+        ('to_account', _ID_TYPE),
+    )
+    _string_columns = ('category', 'to_account')
+    # TransactionTable the splits belong to, sharing their scale
+    transactions = None
+
+    def rescale(self, scale):
+        if self.transactions is not None:
+            self.transactions.rescale(scale)
+        else:
+            super(SplitTable, self).rescale(scale)
+
+    def append(self, parent, split):
+        add = self.strings.add
+        # before looking up the amount column, which rescale() replaces
+        amount = self.to_scaled(split.amount)
+        self.parent.append(parent)
+        self.amount.append(amount)
+        self.category.append(add(split.category))
+        self.to_account.append(add(split.to_account))
+
+
+class TransactionTable(Table):
+    """
+    Transactions, investments and memorized transactions of a qif file
+    """
+    _columns = (
+        ('date', _DATE_TYPE),
+        ('amount', _AMOUNT_TYPE),
+        ('payee', _ID_TYPE),
+        ('category', _ID_TYPE),
+        ('to_account', _ID_TYPE),
+        ('account', _ID_TYPE),
+        ('header', _ID_TYPE),
+    )
+    _string_columns = ('payee', 'category', 'to_account', 'account',
+                       'header')
+
+    def __init__(self, scale=None, strings=None):
+        super(TransactionTable, self).__init__(scale, strings)
+        self.splits = SplitTable(scale, self.strings)
+        self.splits.transactions = self
+
+    def rescale(self, scale):
+        super(TransactionTable, self).rescale(scale)
+        Table.rescale(self.splits, scale)
+
+    @classmethod
+    def from_qif(cls, qif_obj, scale=None):
+        table = cls(scale)
+        table.extend(qif_obj.iter_transactions())
+        return table
+
+    def extend(self, transactions):
+        """
+        :param transactions: iterable of ``(account, header, item)`` tuples
+        """
+        for account, header, item in transactions:
+            self.append(item, account, header)
+
+    def append(self, item, account=None, header=None):
+        add = self.strings.add
+        row = len(self.date)
+        tdate = getattr(item, 'date', None)
+        amount = self.to_scaled(item.amount)
+        self.date.append(tdate.toordinal() if tdate else NO_DATE)
+        self.amount.append(amount)
+        self.payee.append(add(getattr(item, 'payee', None)))
+        self.category.append(add(getattr(item, 'category', None)))
+        self.to_account.append(add(item.to_account))
+        self.account.append(add(account.name if account is not None
+                                else None))
+        self.header.append(add(header))
+        for split in getattr(item, '_splits', ()):
+            self.splits.append(row, split)
+        return row
+
+    def select(self, start=None, end=None, account=None, category=None,
+               payee=None):
+        """
+        Indexes of the rows matching all the given filters
+        :param start: first date included
+        :param end: last date included
+        :param account: account name
+        :param category: category name
+        :param payee: payee name
+        """
+        numpy = get_numpy()
+        conditions = []
+        if start is not None or end is not None:
+            # rows without a date are outside any date range
+            conditions.append(('date', '!=', NO_DATE))
+        if start is not None:
+            conditions.append(('date', '>=', start.toordinal()))
+        if end is not None:
+            conditions.append(('date', '<=', end.toordinal()))
+        for name, value in (('account', account), ('category', category),
+                            ('payee', payee)):
+            if value is not None:
+                ident = self.strings.find(value)
+                if ident is None:
+                    return numpy.zeros(0, 'intp') if numpy is not None else []
+                conditions.append((name, '==', ident))
+        if numpy is not None:
+            mask = numpy.ones(len(self), dtype=bool)
+            for name, operator, value in conditions:
+                column = self.column(name)
+                if operator == '>=':
+                    mask &= column >= value
+                elif operator == '<=':
+                    mask &= column <= value
+                elif operator == '!=':
+                    mask &= column != value
+                else:
+                    mask &= column == value
+            return numpy.flatnonzero(mask)
+        rows = range(len(self))
+        for name, operator, value in conditions:
+            column = getattr(self, name)
+            if operator == '>=':
+                rows = [row for row in rows if column[row] >= value]
+            elif operator == '<=':
+                rows = [row for row in rows if column[row] <= value]
+            elif operator == '!=':
+                rows = [row for row in rows if column[row] != value]
+            else:
+                rows = [row for row in rows if column[row] == value]
+        return list(rows)
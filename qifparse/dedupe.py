@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Fingerprints of transactions and merge of overlapping imports.
+
+A fingerprint is a digest of the normalized values of the fields telling a
+transaction apart (FINGERPRINT_FIELDS): dates are compared by day, numbers
+by value (``31.00`` is ``31``), strings whatever the case and the spacing,
+and splits whatever their order. Memos, categories and cleared flags are
+left out, as they are often edited after an import. Fingerprints are
+stable across processes and versions of Python, so they can be stored.
+
+merge() adds to a Qif object the transactions of another one it doesn't
+already have, in a single pass over both. A fingerprint is matched as
+many times as it occurs: two equal transactions of the same day in the new
+file are both dropped only if the first one has them both too.
+"""
+import hashlib
+from collections import Counter, namedtuple
+from decimal import Decimal
+
+from qifparse.qif import (
+    Account,
+    Investment,
+    MemorizedTransaction,
+    Transaction,
+    _get_attribute,
+)
+
+# fields fingerprinted for each entry class, splits being added for the
+# classes having some
+FINGERPRINT_FIELDS = {
+    Transaction: ('date', 'amount', 'payee', 'num'),
+    MemorizedTransaction: ('mtype', 'amount', 'payee'),
+    Investment: ('date', 'action', 'security', 'quantity', 'price',
+                 'amount'),
+}
+
+# separators of the fields and of the splits in the fingerprinted text
+_FIELD_SEP = u'\x1f'
+_SPLIT_SEP = u'\x1e'
+
+MergeResult = namedtuple('MergeResult', 'added duplicates')
+
+_field_types = {}
+
+
+def _fields(cls):
+    """
+    :return: ``(names, ftypes, has_splits)`` for an entry class, lazy
+        classes included
+    """
+    try:
+        return _field_types[cls]
+    except KeyError:
+        pass
+    for base in cls.__mro__:
+        if base in FINGERPRINT_FIELDS:
+            break
+    else:
+        raise ValueError("can't fingerprint entries of type %s" %
+                         cls.__name__)
+    ftypes = dict((field.name, field.ftype) for field in base._fields)
+    names = FINGERPRINT_FIELDS[base]
+    res = _field_types[cls] = (names, [ftypes[name] for name in names],
+                               base._split_class is not None)
+    return res
+
+
+def _number(value):
+    if value is None:
+        return u''
+    if not isinstance(value, Decimal):
+        value = Decimal(repr(value))
+    # normalize() of a zero keeps its sign
+    return u'%s' % (value.normalize() if value else Decimal(0))
+
+
+def _normalize(value, ftype):
+    if value is None:
+        return u''
+    if ftype == 'datetime':
+        return u'%d' % value.toordinal()
+    if ftype == 'float':
+        return _number(value)
+    return u' '.join((u'%s' % value).split()).lower()
+
+
+def _split_target(split):
+    if split.to_account:
+        return u'[%s]' % _normalize(split.to_account, 'string')
+    return _normalize(split.category, 'string')
+
+
+def fingerprint_text(item):
+    """
+    :return: the normalized text of item that fingerprint() digests
+    """
+    names, ftypes, has_splits = _fields(type(item))
+    parts = [type(item).__name__]
+    parts.extend(map(_normalize, map(getattr, [item] * len(names), names),
+                     ftypes))
+    if has_splits:
+        try:
+            splits = _get_attribute(item, '_splits')
+        except AttributeError:
+            splits = ()
+        parts.extend(sorted(
+            u'%s%s%s' % (_split_target(split), _SPLIT_SEP,
+                         _number(split.amount))
+            for split in splits))
+    return _FIELD_SEP.join(parts)
+
+
+def fingerprint(item):
+    """
+    :return: the fingerprint of a Transaction, MemorizedTransaction or
+        Investment, as 20 bytes
+    """
+    return hashlib.sha1(fingerprint_text(item).encode('utf-8')).digest()
+
+
+def _copy_account(account):
+    return Account(**dict((field.name, getattr(account, field.name))
+                          for field in Account._fields))
+
+
+def merge(qif_obj, other, key=fingerprint):
+    """
+    Add to qif_obj the transactions, accounts, categories and classes of
+    other that it doesn't have. Transactions are compared by account name
+    and key, accounts, categories and classes by name. The transactions
+    added are the objects of other, in new accounts for the accounts qif_obj
+    doesn't have.
+    :param key: function giving the fingerprint of a transaction
+    :return: MergeResult, the numbers of transactions added and dropped
+    """
+    seen = Counter(
+        (account.name if account is not None else None, key(item))
+        for account, header, item in qif_obj.iter_transactions())
+    for category in other.get_categories():
+        if not qif_obj.get_categories(category.name):
+            qif_obj.add_category(category)
+    for cls in other.get_classes():
+        if not qif_obj.get_classes(cls.name):
+            qif_obj.add_class(cls)
+    accounts = {}
+    added = duplicates = 0
+    for account, header, item in other.iter_transactions():
+        name = account.name if account is not None else None
+        item_key = (name, key(item))
+        if seen[item_key]:
+            seen[item_key] -= 1
+            duplicates += 1
+            continue
+        added += 1
+        if account is None:
+            qif_obj.add_transaction(item, header=header)
+            continue
+        target = accounts.get(name)
+        if target is None:
+            existing = qif_obj.get_accounts(name)
+            if existing:
+                target = existing[0]
+            else:
+                target = _copy_account(account)
+                qif_obj.add_account(target)
+            accounts[name] = target
+        target.add_transaction(item, header=header)
+    # accounts without transactions
+    for account in other.get_accounts():
+        if account.name not in accounts and \
+                not qif_obj.get_accounts(account.name):
+            accounts[account.name] = _copy_account(account)
+            qif_obj.add_account(accounts[account.name])
+    return MergeResult(added, duplicates)
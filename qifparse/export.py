@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+Export of transactions as fixed size record batches: the columns of up to
+``batch_size`` transactions at once, with the columns of their splits,
+instead of one dict per transaction.
+
+Batches are written as Parquet or Arrow IPC files when pyarrow is
+installed, and as CSV or JSON lines files otherwise. Dates are exported as
+days, as in qifparse.columnar; transactions get an ``id``, their position
+in the export, referenced by the ``transaction`` column of the splits.
+"""
+import csv
+import io
+import os
+from collections import namedtuple, OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from itertools import repeat
+from json.encoder import encode_basestring
+from operator import attrgetter, itemgetter
+
+import six
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from qifparse.qif import Qif, _get_attribute
+from qifparse.parser import TRANSACTION_RECORD_TYPES
+
+DEFAULT_BATCH_SIZE = 65536
+# decimals of the amounts of the Arrow columns
+DEFAULT_SCALE = 4
+
+TRANSACTION_COLUMNS = ('id', 'date', 'amount', 'payee', 'category',
+                       'to_account', 'memo', 'account', 'type')
+SPLIT_COLUMNS = ('transaction', 'amount', 'category', 'to_account', 'memo')
+
+FORMATS = ('parquet', 'arrow', 'csv', 'jsonl')
+_ARROW_FORMATS = ('parquet', 'arrow')
+
+# columns of a batch of transactions and of their splits: OrderedDicts
+# mapping the names of TRANSACTION_COLUMNS and SPLIT_COLUMNS to lists
+RecordBatch = namedtuple('RecordBatch', 'transactions splits')
+
+
+def _iter_transactions(source):
+    if isinstance(source, Qif):
+        return source.iter_transactions()
+    return ((account, header, item)
+            for rtype, header, account, item in source
+            if rtype in TRANSACTION_RECORD_TYPES)
+
+
+def _header_type(header):
+    if header and header.startswith('!Type:'):
+        return header[6:]
+    return header
+
+
+def _splits(item):
+    try:
+        return _get_attribute(item, '_splits')
+    except AttributeError:
+        return ()
+
+
+def _values(items, name):
+    """
+    :return: the list of the values of the field name of items, None for
+        the items without such a field
+    """
+    return list(map(getattr, items, repeat(name), repeat(None)))
+
+
+def _batch(start, records, types):
+    """
+    :param records: list of ``(account, header, item)``
+    :param types: dict caching the types of the headers
+    """
+    items = list(map(itemgetter(2), records))
+    for header in set(map(itemgetter(1), records)):
+        if header not in types:
+            types[header] = _header_type(header)
+    transactions = OrderedDict([
+        ('id', list(range(start, start + len(items)))),
+        ('date', [value.date() if isinstance(value, datetime) else value
+                  for value in _values(items, 'date')]),
+        ('amount', list(map(attrgetter('amount'), items))),
+        ('payee', _values(items, 'payee')),
+        ('category', _values(items, 'category')),
+        ('to_account', list(map(attrgetter('to_account'), items))),
+        ('memo', list(map(attrgetter('memo'), items))),
+        ('account', [None if account is None else account.name
+                     for account in map(itemgetter(0), records)]),
+        ('type', list(map(types.__getitem__,
+                          map(itemgetter(1), records)))),
+    ])
+    parents = []
+    splits = []
+    for ident, item_splits in enumerate(map(_splits, items), start):
+        if item_splits:
+            parents.extend(repeat(ident, len(item_splits)))
+            splits.extend(item_splits)
+    split_columns = OrderedDict([('transaction', parents)])
+    for name in SPLIT_COLUMNS[1:]:
+        split_columns[name] = list(map(attrgetter(name), splits))
+    return RecordBatch(transactions, split_columns)
+
+
+def iter_batches(source, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield a RecordBatch for every batch_size transactions of source
+    :param source: a Qif object, or the records yielded by
+        ``QifParser.iter_records(..., context=True)`` to export a file
+        while it is parsed
+    """
+    types = {}
+    records = []
+    start = 0
+    for record in _iter_transactions(source):
+        records.append(record)
+        if len(records) == batch_size:
+            yield _batch(start, records, types)
+            start += len(records)
+            records = []
+    if records:
+        yield _batch(start, records, types)
+
+
+def write_csv(batches, fh, splits_fh=None):
+    """
+    Write batches to CSV files, with a header line; missing values are
+    empty
+    :param fh: text file for the transactions, opened with ``newline=''``
+        (binary file on Python 2)
+    :param splits_fh: text file for the splits, None not to write them
+    """
+    writer = csv.writer(fh)
+    writer.writerow(TRANSACTION_COLUMNS)
+    if splits_fh is not None:
+        splits_writer = csv.writer(splits_fh)
+        splits_writer.writerow(SPLIT_COLUMNS)
+    # csv writes None as an empty field, and dates and numbers as str() does
+    for batch in batches:
+        writer.writerows(zip(*batch.transactions.values()))
+        if splits_fh is not None:
+            splits_writer.writerows(zip(*batch.splits.values()))
+
+
+def _json_values(name, values):
+    """
+    :return: the JSON texts of the values of the column name
+    """
+    if name in ('id', 'transaction'):
+        return list(map(str, values))
+    if name == 'amount':
+        # the text of a Decimal is a valid JSON number, with all its digits
+        return ['null' if value is None else str(value) for value in values]
+    if name == 'date':
+        return ['null' if value is None else '"%s"' % value.isoformat()
+                for value in values]
+    return ['null' if value is None else encode_basestring(value)
+            for value in values]
+
+
+def _write_jsonl(fh, columns):
+    template = '{%s}\n' % ', '.join(
+        '%s: %%s' % encode_basestring(name) for name in columns)
+    rows = zip(*[_json_values(name, values)
+                 for name, values in columns.items()])
+    fh.write(''.join(map(template.__mod__, rows)))
+
+
+def write_jsonl(batches, fh, splits_fh=None):
+    """
+    Write batches as JSON lines, one object per transaction and split;
+    amounts are JSON numbers with all the digits of their Decimal
+    :param fh: text file for the transactions
+    :param splits_fh: text file for the splits, None not to write them
+    """
+    for batch in batches:
+        _write_jsonl(fh, batch.transactions)
+        if splits_fh is not None:
+            _write_jsonl(splits_fh, batch.splits)
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is needed for Arrow and Parquet exports")
+
+
+def arrow_schemas(scale=DEFAULT_SCALE):
+    """
+    :return: ``(transactions, splits)``, the pyarrow schemas of the batches
+    """
+    _require_pyarrow()
+    string = pyarrow.string()
+    amount = pyarrow.decimal128(38, scale)
+    types = {
+        'id': pyarrow.int64(),
+        'transaction': pyarrow.int64(),
+        'date': pyarrow.date32(),
+        'amount': amount,
+    }
+    return tuple(
+        pyarrow.schema([(name, types.get(name, string)) for name in names])
+        for names in (TRANSACTION_COLUMNS, SPLIT_COLUMNS))
+
+
+def _decimal(value):
+    if value is None or isinstance(value, Decimal):
+        return value
+    # amounts set by hand can be floats or ints
+    return Decimal(repr(value))
+
+
+def to_arrow(batch, scale=DEFAULT_SCALE):
+    """
+    :return: ``(transactions, splits)``, the pyarrow RecordBatches of batch
+    """
+    res = []
+    for schema, columns in zip(arrow_schemas(scale), batch):
+        arrays = []
+        for field in schema:
+            values = columns[field.name]
+            if field.name == 'amount':
+                values = list(map(_decimal, values))
+            arrays.append(pyarrow.array(values, type=field.type))
+        res.append(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+    return tuple(res)
+
+
+def write_arrow(batches, path, splits_path=None, format='parquet',
+                scale=DEFAULT_SCALE):
+    """
+    Write batches to a Parquet or an Arrow IPC file, one row group or
+    record batch per batch
+    :param splits_path: file for the splits, None not to write them
+    :param format: 'parquet' or 'arrow'
+    """
+    _require_pyarrow()
+    if format == 'parquet':
+        new_writer = pyarrow.parquet.ParquetWriter
+    elif format == 'arrow':
+        new_writer = pyarrow.ipc.new_file
+    else:
+        raise ValueError("unknown format: %s" % format)
+    schemas = arrow_schemas(scale)
+    writer = new_writer(path, schemas[0])
+    splits_writer = None
+    try:
+        if splits_path is not None:
+            splits_writer = new_writer(splits_path, schemas[1])
+        for batch in batches:
+            transactions, splits = to_arrow(batch, scale)
+            writer.write_batch(transactions)
+            if splits_writer is not None:
+                splits_writer.write_batch(splits)
+    finally:
+        writer.close()
+        if splits_writer is not None:
+            splits_writer.close()
+
+
+def _open(path):
+    """
+    :return: a file for write_csv and write_jsonl: binary on Python 2, where
+        the csv module and the JSON texts are byte strings, text without
+        newline translation otherwise
+    """
+    if six.PY2:
+        return open(path, 'wb')
+    return io.open(path, 'w', newline='')
+
+
+def export(source, path, splits_path=None, format=None,
+           batch_size=DEFAULT_BATCH_SIZE, scale=DEFAULT_SCALE):
+    """
+    Export the transactions of source, by batches of batch_size
+    :param source: a Qif object or the records of
+        ``QifParser.iter_records(..., context=True)``
+    :param splits_path: file for the splits, None not to export them
+    :param format: one of FORMATS; by default guessed from the extension of
+        path, else Parquet when pyarrow is installed and CSV otherwise
+    :param scale: decimals of the amounts, for Parquet and Arrow
+    :return: the number of transactions exported
+    """
+    if format is None:
+        format = os.path.splitext(path)[1][1:].lower()
+        if format not in FORMATS:
+            format = 'parquet' if pyarrow is not None else 'csv'
+    if format not in FORMATS:
+        raise ValueError("unknown format: %s" % format)
+    counts = []
+
+    def counted(batches):
+        for batch in batches:
+            counts.append(len(batch.transactions['id']))
+            yield batch
+    batches = counted(iter_batches(source, batch_size))
+    if format in _ARROW_FORMATS:
+        write_arrow(batches, path, splits_path, format, scale)
+        return sum(counts)
+    with _open(path) as fh:
+        splits_fh = None
+        try:
+            if splits_path is not None:
+                splits_fh = _open(splits_path)
+            if format == 'csv':
+                write_csv(batches, fh, splits_fh)
+            else:
+                write_jsonl(batches, fh, splits_fh)
+        finally:
+            if splits_fh is not None:
+                splits_fh.close()
+    return sum(counts)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Index of the records of a qif file: byte offsets, header in effect and
+content hash of every record. Given the index of a previous version of a
+file, QifParser.parse_delta only parses the records added or changed since.
+"""
+import hashlib
+import itertools
+import json
+import re
+from collections import namedtuple, Counter
+
+INDEX_VERSION = 1
+ACCOUNT_HEADER = '!Account'
+# headers of the lists whose records don't belong to accounts
+LIST_HEADERS = ('!Type:Cat', '!Type:Class')
+
+# a record ends with a line holding only "^"
+_TERMINATOR = re.compile(br'(?<![^\r\n])[ \t]*\^[ \t]*(?:\r\n|\r|\n|$)')
+_FIRST_LINE = re.compile(br'\s*([^\r\n]*)')
+
+# start and end: byte offsets of the record, blank lines before it included
+# header: last header line seen, the one of the record included
+# account: position in the index of the account record in effect, -1 if none
+# or if the record doesn't belong to accounts
+# digest: hash of the bytes of the record
+IndexEntry = namedtuple('IndexEntry', 'start end header account digest')
+
+# records: ``(rtype, header, account, item)`` tuples of the records added or
+# changed, removed: the IndexEntry of the records gone since the previous
+# index, index: the RecordIndex of the current file
+Delta = namedtuple('Delta', 'records removed index')
+
+
+def digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def prefix_digest(data, size):
+    """
+    Hash of the first size bytes of data, without copying them
+    """
+    view = memoryview(data)
+    try:
+        return digest(view[:size])
+    finally:
+        view.release()
+
+
+def scan_records(data, encoding, start=0, header=None, account=-1,
+                 position=0):
+    """
+    Find the records of data, without decoding them
+    :param header: header line in effect at start
+    :param account: position of the account in effect at start
+    :param position: position in the index of the first record
+    :return: generator of IndexEntry, the last one without terminator if
+        data doesn't end with one
+    """
+    size = len(data)
+    ends = (match.end() for match in _TERMINATOR.finditer(data, start))
+    for end in itertools.chain(ends, [size]):
+        if end <= start:
+            continue
+        record = data[start:end]
+        first = record[:1]
+        if first == b'!' or first == b'^' or first.isspace():
+            line = _FIRST_LINE.match(record).group(1).strip()
+            if not line or line == b'^':
+                # blank record
+                start = end
+                continue
+            if line.startswith(b'!'):
+                header = line.decode(encoding)
+        if header == ACCOUNT_HEADER:
+            account = position
+        yield IndexEntry(start, end, header,
+                         -1 if header in LIST_HEADERS else account,
+                         digest(record))
+        position += 1
+        start = end
+
+
+class RecordIndex(object):
+    """
+    Index of the records of a version of a qif file, along with the formats
+    used to parse it
+    """
+
+    def __init__(self, entries=(), size=0, prefix=None, encoding=None,
+                 date_format=None, num_sep=None):
+        """
+        :param size: length of the indexed data, up to the last record
+            terminator
+        :param prefix: hash of the first size bytes
+        """
+        self.entries = list(entries)
+        self.size = size
+        self.prefix = prefix
+        self.encoding = encoding
+        self.date_format = date_format
+        self.num_sep = tuple(num_sep) if num_sep is not None else None
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def build(cls, data, encoding, date_format=None, num_sep=None,
+              entries=None):
+        """
+        :param entries: the IndexEntry of data if already known
+        """
+        if entries is None:
+            entries = list(scan_records(data, encoding))
+        size = len(data)
+        if entries and not _TERMINATOR.search(data, entries[-1].start):
+            # the last record isn't complete yet
+            size = entries[-1].start
+        return cls(entries, size, prefix_digest(data, size), encoding,
+                   date_format, num_sep)
+
+    def keys(self, entries=None):
+        """
+        :return: list of the keys identifying the records, made of the
+            digests of the record and of its account and of its header
+        """
+        entries = self.entries if entries is None else entries
+        return [(entry.digest, entry.header,
+                 entries[entry.account].digest if entry.account >= 0
+                 else None)
+                for entry in entries]
+
+    def is_prefix_of(self, data):
+        """
+        :return: True if data starts with the indexed data, i.e. if records
+            have only been appended since
+        """
+        return len(data) >= self.size and \
+            prefix_digest(data, self.size) == self.prefix
+
+    def diff(self, data, encoding=None):
+        """
+        Index data, a newer version of the indexed file
+        :param encoding: encoding of data, the one of this index if None
+        :return: ``(entries, changed, removed)``: the IndexEntry of data,
+            the positions of those that are not in this index and the
+            entries of this index that are not in data
+        """
+        encoding = encoding or self.encoding
+        if encoding == self.encoding and self.is_prefix_of(data):
+            # only the records after the indexed ones need to be scanned
+            kept = [entry for entry in self.entries if entry.end <= self.size]
+            removed = self.entries[len(kept):]
+            header = kept[-1].header if kept else None
+            account = next((entry.account for entry in reversed(kept)
+                            if entry.header not in LIST_HEADERS), -1)
+            entries = kept + list(scan_records(
+                data, encoding, self.size, header, account, len(kept)))
+            return entries, list(range(len(kept), len(entries))), removed
+        entries = list(scan_records(data, encoding))
+        keys = self.keys(entries)
+        previous = Counter(self.keys())
+        changed = []
+        for position, key in enumerate(keys):
+            if previous[key]:
+                previous[key] -= 1
+            else:
+                changed.append(position)
+        current = Counter(keys)
+        removed = []
+        for entry, key in zip(self.entries, self.keys()):
+            if current[key]:
+                current[key] -= 1
+            else:
+                removed.append(entry)
+        return entries, changed, removed
+
+    def save(self, fh):
+        """
+        Write the index as JSON to a text file
+        """
+        headers = []
+        ids = {}
+        entries = []
+        for entry in self.entries:
+            if entry.header not in ids:
+                ids[entry.header] = len(headers)
+                headers.append(entry.header)
+            entries.append((entry.start, entry.end, ids[entry.header],
+                            entry.account, entry.digest))
+        json.dump({
+            'version': INDEX_VERSION,
+            'size': self.size,
+            'prefix': self.prefix,
+            'encoding': self.encoding,
+            'date_format': self.date_format,
+            'num_sep': self.num_sep,
+            'headers': headers,
+            'entries': entries,
+        }, fh, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, fh):
+        state = json.load(fh)
+        if state.get('version') != INDEX_VERSION:
+            raise ValueError("unsupported index version: %r" %
+                             state.get('version'))
+        headers = state['headers']
+        entries = [IndexEntry(start, end, headers[header], account, hdigest)
+                   for start, end, header, account, hdigest
+                   in state['entries']]
+        return cls(entries, state['size'], state['prefix'],
+                   state['encoding'], state['date_format'], state['num_sep'])
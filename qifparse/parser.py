@@ -1,18 +1,27 @@
 # -*- coding: utf-8 -*-
 import six
+import contextlib
+import functools
+import itertools
+import locale
 import logging
+import mmap
+import os
+import time
+from collections import namedtuple, OrderedDict
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from qifparse.qif import (
     Transaction,
     MemorizedTransaction,
-    AmountSplit,
     Account,
     Investment,
     Category,
     Class,
     Qif,
+    lazy_class,
 )
+from qifparse.index import RecordIndex, Delta
 import re
 
 logger = logging.getLogger("qifparse")
@@ -20,6 +29,20 @@ logger = logging.getLogger("qifparse")
 DEFAULT_DATE_FORMAT = 'dmy'
 DEFAULT_DECIMAL_SEP = '.'
 DEFAULT_THOUSANDS_SEP = ''
+# how much of a stream is looked at when guessing formats
+DEFAULT_SNIFF_SAMPLES = 1000
+DEFAULT_SNIFF_LINES = 50000
+DEFAULT_DATE_CACHE_SIZE = 4096
+# bytes decoded at once when reading mapped files
+DEFAULT_BLOCK_SIZE = 1 << 20
+# bytes of small files sent at once to a worker by parse_many
+DEFAULT_TASK_SIZE = 1 << 20
+# shared values kept by the parsers of a worker between files
+MAX_SHARED_STRINGS = 100000
+# file name suffix of the snapshots of parse_cached
+SNAPSHOT_SUFFIX = '.snapshot'
+# unknown lines logged one by one by a RecordParser, the others are counted
+MAX_UNKNOWN_LINE_WARNINGS = 10
 
 NON_INVST_ACCOUNT_TYPES = [
     '!Type:Cash',
@@ -31,6 +54,32 @@ NON_INVST_ACCOUNT_TYPES = [
     '!Type:Invoice',  # Quicken for business only
 ]
 
+HEADER_TYPES = {
+    '!Type:Cat': 'category',
+    '!Account': 'account',
+    '!Type:Invst': 'investment',
+    '!Type:Class': 'class',
+    '!Type:Memorized': 'memorized',
+}
+HEADER_TYPES.update((header, 'transaction')
+                    for header in NON_INVST_ACCOUNT_TYPES)
+
+TRANSACTION_RECORD_TYPES = ('transaction', 'investment', 'memorized')
+
+RECORD_CLASSES = {
+    'category': Category,
+    'account': Account,
+    'transaction': Transaction,
+    'investment': Investment,
+    'class': Class,
+    'memorized': MemorizedTransaction,
+}
+
+# names that can be given to select the fields of the transaction records
+PROJECTED_FIELDS = frozenset(
+    [field.name for rtype in TRANSACTION_RECORD_TYPES
+     for field in RECORD_CLASSES[rtype]._fields] + ['splits'])
+
 
 class QifParserException(Exception):
     pass
@@ -44,10 +93,788 @@ class QifParserInvalidNumber(QifParserException):
     pass
 
 
+class QifParserInvalidValue(QifParserException):
+    """
+    A value refused by the entry it is set to, e.g. an unknown account type
+    """
+    pass
+
+
+# errors making a record be skipped by a lenient parse
+RECORD_ERRORS = (QifParserException, ValueError)
+
+RecordError = namedtuple('RecordError', 'line header lines reason')
+
+
+class ErrorReport(object):
+    """
+    What a lenient parse skipped: the records that could not be parsed,
+    each with the number of its first line in the file, its header, its
+    lines and the reason, and the unknown lines, counted by record type and
+    letter. Pass an instance as the ``errors`` argument of QifParser.parse,
+    parse_path or iter_records to parse in lenient mode.
+    """
+
+    def __init__(self, max_errors=None):
+        """
+        :param max_errors: number of bad records after which the parse fails
+            anyway, None for no limit
+        """
+        self.max_errors = max_errors
+        self.records = []
+        # (record type name, letter): [count, first line seen]
+        self.unknown_lines = OrderedDict()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def quarantine(self, line, header, lines, reason):
+        self.records.append(RecordError(line, header, lines, reason))
+        if self.max_errors is not None and \
+                len(self.records) > self.max_errors:
+            raise QifParserException(
+                "Too many invalid records (%d), the last one at line %d: %s"
+                % (len(self.records), line, reason))
+
+    def unknown_line(self, entry_class, line):
+        key = (entry_class.__name__, line[0])
+        seen = self.unknown_lines.get(key)
+        if seen is None:
+            self.unknown_lines[key] = [1, line]
+        else:
+            seen[0] += 1
+
+    @property
+    def skipped_lines(self):
+        return sum(count for count, _ in self.unknown_lines.values())
+
+    def __str__(self):
+        res = ['%d invalid records, %d unknown lines' % (
+            len(self.records), self.skipped_lines)]
+        for error in self.records:
+            res.append('line %d (%s): %s' % (error.line, error.header,
+                                             error.reason))
+        for (name, letter), (count, line) in self.unknown_lines.items():
+            res.append('%d unknown %s lines of %s records, e.g. %r' % (
+                count, letter, name, line))
+        return '\n'.join(res)
+
+
+class _Lookahead(object):
+    """
+    Replayable prefix of a line iterator: every iteration first yields the
+    lines already peeked and then pulls new ones from the source, up to
+    ``limit`` lines
+    """
+
+    def __init__(self, lines, limit=None):
+        self.lines = iter(lines)
+        self.buffer = []
+        self.limit = limit
+
+    def __iter__(self):
+        for line in self.buffer:
+            yield line
+        while self.limit is None or len(self.buffer) < self.limit:
+            try:
+                line = next(self.lines)
+            except StopIteration:
+                return
+            self.buffer.append(line)
+            yield line
+
+    def rest(self):
+        """all the lines, the peeked ones included"""
+        return itertools.chain(self.buffer, self.lines)
+
+
+_DATE_SEPARATORS = re.compile(r'\W+')
+
+# position of (year, month, day) among the parts of a date
+DATE_FIELDS_ORDER = {
+    'dmy': (2, 1, 0),
+    'mdy': (2, 0, 1),
+    'ymd': (0, 1, 2),
+}
+
+
+def _decode_qif_date(qdate, order, date_format):
+    # manage y2k (e.g. 1/1'3 -> 1/1/2003)
+    if qdate[-2:-1] == "'":
+        #e.g. 1/1'3
+        norm_qdate = qdate.replace("'", "/200")
+    elif qdate[-3:-2] == "'":
+        # e.g. 1/1'12
+        norm_qdate = qdate.replace("'", "/20")
+    else:
+        # e.g. 1/1'2012
+        norm_qdate = qdate.replace("'", "/")
+
+    norm_qdate = norm_qdate.strip()
+
+    try:
+        (n1, n2, n3) = parts = _DATE_SEPARATORS.split(norm_qdate)
+    except ValueError as err:
+        raise QifParserInvalidDate("Invalid date: %s (normalized to %s): %s" % (qdate, norm_qdate, err))
+
+    year, month, day = order
+    try:
+        return datetime(int(parts[year]), int(parts[month]), int(parts[day]))
+    except ValueError as err:
+        raise QifParserInvalidDate("Invalid date: %s (splitted to (%s, %s ,%s), %s): %s" %
+                                   (qdate, n1, n2, n3, date_format, err))
+
+
+DateCacheInfo = namedtuple('DateCacheInfo', 'hits misses maxsize currsize')
+
+
+class DateParser(object):
+    """
+    Date decoder for a known date format.
+
+    Bank exports repeat the same few dates over and over, so the last
+    ``maxsize`` distinct date strings are kept in a LRU cache; hit and miss
+    counts are available from ``cache_info()``.
+    """
+
+    def __init__(self, date_format=DEFAULT_DATE_FORMAT,
+                 maxsize=DEFAULT_DATE_CACHE_SIZE):
+        if date_format not in DATE_FIELDS_ORDER:
+            raise QifParserInvalidDate("unsupported date_format: %s" % date_format)
+        self.date_format = date_format
+        self.order = DATE_FIELDS_ORDER[date_format]
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, qdate):
+        cache = self.cache
+        try:
+            # most recently used last; OrderedDict.move_to_end is Python 3
+            value = cache[qdate] = cache.pop(qdate)
+        except KeyError:
+            self.misses += 1
+            value = cache[qdate] = _decode_qif_date(qdate, self.order,
+                                                    self.date_format)
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+        else:
+            self.hits += 1
+        return value
+
+    def cache_info(self):
+        return DateCacheInfo(self.hits, self.misses, self.maxsize,
+                             len(self.cache))
+
+    def cache_clear(self):
+        self.cache.clear()
+        self.hits = self.misses = 0
+
+
+def number_parser(decimal_sep=DEFAULT_DECIMAL_SEP,
+                  thousands_sep=DEFAULT_THOUSANDS_SEP, scale=None):
+    """
+    Build a number decoder specialised for the given separators.
+
+    Numbers in the usual shape are converted in a single step; anything
+    else goes through QifParser.parseQifNumber, so both accept the same
+    values.
+
+    :param scale: if given the decoder returns integers in units of
+        ``10 ** -scale`` (e.g. cents with ``scale=2``) instead of Decimal
+        objects, and rejects values with more significant decimals
+    :return: callable taking a number string
+    """
+    if decimal_sep == thousands_sep:
+        raise QifParserException(
+                "Cannot parse number if decimal_sep is the same as thousands_sep (%s)" % decimal_sep)
+
+    def parse_generic(qnumber):
+        try:
+            value = QifParser.parseQifNumber(qnumber, decimal_sep=decimal_sep,
+                                             thousands_sep=thousands_sep)
+        except InvalidOperation as err:
+            raise QifParserInvalidNumber("Invalid number: %s: %s" % (qnumber, err))
+        if scale is None:
+            return value
+        value = value.scaleb(scale)
+        if value != value.to_integral_value():
+            raise QifParserInvalidNumber(
+                "%s has more than %d decimals" % (qnumber, scale))
+        return int(value)
+
+    # Without thousands separator int() and Decimal() validate the integer
+    # part themselves, as parseQifNumber does. The thousands blocks are only
+    # checked by a pattern when the separator is there at all.
+    if not thousands_sep and scale is None:
+        dot = decimal_sep == '.'
+
+        def parse_number(qnumber):
+            int_p, sep, frac_p = qnumber.partition(decimal_sep)
+            if frac_p.isdigit() and int_p[-1:].isdigit():
+                try:
+                    return Decimal(qnumber if dot else int_p + '.' + frac_p)
+                except InvalidOperation:
+                    pass
+            return parse_generic(qnumber)
+        return parse_number
+
+    if not thousands_sep:
+        def parse_scaled(qnumber):
+            int_p, sep, frac_p = qnumber.partition(decimal_sep)
+            if len(frac_p) <= scale and int_p[-1:].isdigit() and \
+                    (frac_p.isdigit() or not frac_p):
+                try:
+                    # the sign of the integer part holds for the decimals too
+                    return int(int_p + frac_p.ljust(scale, '0'))
+                except ValueError:
+                    pass
+            return parse_generic(qnumber)
+        return parse_scaled
+
+    match = re.compile(r'-?\d{1,3}(?:%s\d{3})*(?:%s(\d*))?$' % (
+        re.escape(thousands_sep), re.escape(decimal_sep))).match
+
+    if scale is None:
+        def parse_grouped(qnumber):
+            m = match(qnumber)
+            if m is None:
+                return parse_generic(qnumber)
+            if m.group(1) is None:
+                qnumber += decimal_sep + '0'
+            return Decimal(qnumber.replace(thousands_sep, '').replace(
+                decimal_sep, '.'))
+        return parse_grouped
+
+    def parse_grouped_scaled(qnumber):
+        m = match(qnumber)
+        if m is None or len(m.group(1) or '') > scale:
+            return parse_generic(qnumber)
+        int_p, sep, frac_p = qnumber.replace(thousands_sep, '').partition(
+            decimal_sep)
+        return int(int_p + frac_p.ljust(scale, '0'))
+    return parse_grouped_scaled
+
+
+class RecordParser(object):
+    """
+    Table driven parser for one kind of entry.
+
+    The dispatch table is built from the ``_fields`` declared on the entry
+    class in qifparse.qif, so that reading and writing share one schema:
+    every line costs a single dict lookup on its first letter.
+    """
+
+    def __init__(self, entry_class, parse_date, parse_number, strings=None,
+                 factory=None, unknown_line=None, lazy=False, fields=None):
+        """
+        :param strings: dict used to share a single copy of the values of
+            the INTERNED_FIELDS, can be shared between parsers
+        :param factory: callable creating the objects the fields are stored
+            into, entry_class and its split class if None
+        :param unknown_line: function(entry_class, line) called on the lines
+            of unknown letters, which are logged if None
+        :param lazy: create entries of the lazy_class of entry_class, which
+            decode their dates and numbers on first access (unless factory
+            is given)
+        :param fields: names of the fields of entry_class to store, the
+            lines of the others being skipped, with 'splits' to build the
+            splits; all of them if None
+        """
+        self.entry_class = entry_class
+        self.factory = factory
+        self.lazy = lazy and factory is None
+        # decoder of every lazy field, by name
+        self.decoders = {}
+        self.new_item = self.item_factory(entry_class)
+        self.unknown_line = unknown_line or self.warn_unknown_line
+        self.unknown_lines = 0
+        self.parse_date = parse_date
+        self.parse_number = parse_number
+        self.strings = {} if strings is None else strings
+        self.setters = self.build_setters(entry_class, fields)
+        split_class = entry_class._split_class
+        if split_class is not None:
+            if fields is None or 'splits' in fields:
+                self.add_split_setters(split_class)
+            else:
+                self.skip_split_lines(split_class)
+        # header lines are part of the first record of a section
+        self.setters['!'] = _skip_line
+
+    def __call__(self, lines):
+        """
+        :param lines: stripped, non empty lines of a single record
+        """
+        item = self.new_item()
+        setters = self.setters
+        try:
+            for line in lines:
+                setter = setters.get(line[0])
+                if setter is None:
+                    # don't recognise this line; ignore it
+                    self.unknown_line(self.entry_class, line)
+                    continue
+                setter(item, line[1:])
+        except RuntimeError as exc:
+            # raised by the entries validating their values
+            raise QifParserInvalidValue("%s: %s" % (line, exc))
+        return item
+
+    def warn_unknown_line(self, entry_class, line):
+        self.unknown_lines += 1
+        if self.unknown_lines <= MAX_UNKNOWN_LINE_WARNINGS:
+            logger.warning("Skipping unknown line:\n%s", line)
+            if self.unknown_lines == MAX_UNKNOWN_LINE_WARNINGS:
+                logger.warning("Further unknown lines of %s records are "
+                               "skipped silently", entry_class.__name__)
+
+    def item_factory(self, entry_class):
+        """
+        :return: callable creating the entries of entry_class
+        """
+        if not self.lazy:
+            return self.factory or entry_class
+        cls = lazy_class(entry_class)
+        decoders = self.decoders
+
+        def new_item():
+            item = cls()
+            item._raw = {}
+            item._decode = decoders
+            return item
+        return new_item
+
+    def build_setters(self, entry_class, wanted=None):
+        """
+        :param wanted: names of the fields to store, all if None
+        """
+        by_letter = {}
+        for field in entry_class._fields:
+            by_letter.setdefault(field.first_letter, []).append(field)
+        setters = {}
+        for letter, fields in by_letter.items():
+            setters[letter] = self.field_setter(fields, wanted)
+        override = ENTRY_SETTERS.get(entry_class, {})
+        setters.update(override)
+        return setters
+
+    def field_setter(self, fields, wanted=None):
+        """
+        Build the function storing the value of a line into an entry.
+        A letter can be shared by a 'string' and a 'reference' field, as for
+        'L' in transactions: values in square brackets go to the latter.
+        :param wanted: names of the fields to store, the values of the
+            others being skipped; all if None
+        """
+        references = [f.name for f in fields if f.ftype == 'reference']
+        others = [f for f in fields if f.ftype != 'reference']
+        if wanted is not None:
+            kept = [f for f in fields if f.name in wanted]
+            if not kept:
+                return _skip_line
+            if len(kept) < len(fields) and references and others:
+                return self.partial_setter(kept[0])
+        if references and others:
+            reference, other = references[0], self.value_setter(others[0])
+            strings = self.strings
+
+            def set_field(item, value):
+                if value.startswith('['):
+                    value = value[1:-1]
+                    setattr(item, reference, strings.setdefault(value, value))
+                else:
+                    other(item, value)
+            return set_field
+        return self.value_setter(fields[0])
+
+    def partial_setter(self, field):
+        """
+        Build the function storing the value of a line into the field of a
+        letter shared by a reference and another field, skipping the values
+        of the other one
+        """
+        set_value = self.value_setter(field)
+        if field.ftype == 'reference':
+            def set_field(item, value):
+                if value.startswith('['):
+                    set_value(item, value)
+        else:
+            def set_field(item, value):
+                if not value.startswith('['):
+                    set_value(item, value)
+        return set_field
+
+    def value_setter(self, field):
+        name = field.name
+        ftype = field.ftype
+        strings = self.strings
+        if ftype == 'string' and name in INTERNED_FIELDS:
+            def set_field(item, value):
+                setattr(item, name, strings.setdefault(value, value))
+        elif ftype == 'string':
+            def set_field(item, value):
+                setattr(item, name, value)
+        elif ftype == 'multilinestring':
+            def set_field(item, value):
+                lines = getattr(item, name)
+                if not lines:
+                    lines = []
+                    setattr(item, name, lines)
+                lines.append(value)
+        elif ftype in ('float', 'datetime') and self.lazy:
+            self.decoders[name] = self.parse_number if ftype == 'float' \
+                else self.parse_date
+
+            def set_field(item, value):
+                item._raw[name] = value
+        elif ftype == 'float':
+            parse_number = self.parse_number
+
+            def set_field(item, value):
+                setattr(item, name, parse_number(value))
+        elif ftype == 'integer':
+            def set_field(item, value):
+                setattr(item, name, int(value))
+        elif ftype == 'datetime':
+            parse_date = self.parse_date
+
+            def set_field(item, value):
+                setattr(item, name, parse_date(value))
+        elif ftype == 'reference':
+            def set_field(item, value):
+                if value.startswith('['):
+                    value = value[1:-1]
+                setattr(item, name, strings.setdefault(value, value))
+        elif ftype == 'boolean':
+            def set_field(item, value):
+                setattr(item, name, True)
+        else:
+            raise QifParserException("unsupported field type: %s" % ftype)
+        return set_field
+
+    def skip_split_lines(self, split_class):
+        """
+        Skip the lines of the splits instead of building them
+        """
+        for field in split_class._fields:
+            self.setters.setdefault(field.first_letter, _skip_line)
+
+    def add_split_setters(self, split_class):
+        """
+        Split lines are those whose letter is not already used by the
+        parent entry: the letter of the first split field starts a new split,
+        the others are stored in the last one.
+        """
+        start_letter = split_class._fields[0].first_letter
+        new_split = self.item_factory(split_class)
+        for letter, setter in self.build_setters(split_class).items():
+            if letter in self.setters:
+                continue
+            if letter == start_letter:
+                def set_field(item, value, setter=setter):
+                    split = new_split()
+                    item.splits.append(split)
+                    setter(split, value)
+            else:
+                def set_field(item, value, setter=setter):
+                    if not item.splits:
+                        item.splits.append(new_split())
+                    setter(item.splits[-1], value)
+            self.setters[letter] = set_field
+
+
+def _skip_line(item, value):
+    pass
+
+
+def _set_income_category(item, value):
+    item.income = True
+    item.expense = False  # if ommitted is True
+
+
+# fields whose values repeat a lot across records: a single copy of each
+# value is kept
+INTERNED_FIELDS = frozenset([
+    'payee', 'category', 'cleared', 'action', 'security', 'mtype',
+])
+
+# setters overriding the ones derived from the fields declaration
+ENTRY_SETTERS = {
+    Category: {'I': _set_income_category},
+}
+
+
+_LINE_BREAK = re.compile(br'\r\n?|\n')
+_NOT_SPACE = re.compile(br'\S')
+
+
+def _decode_lines(data, encoding):
+    """
+    Decode raw bytes into stripped lines, whatever the line separators
+    """
+    text = data.decode(encoding)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return [x.strip() for x in text.split('\n')]
+
+
+def _iter_mapped_lines(data, encoding, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Decode the lines of a bytes-like object, e.g. a mmap, one block of
+    about block_size bytes at a time
+    :return: generator of stripped lines
+    """
+    size = len(data)
+    start = 0
+    while start < size:
+        match = _LINE_BREAK.search(data, min(start + block_size, size))
+        end = match.end() if match else size
+        lines = _decode_lines(data[start:end], encoding)
+        if match:
+            # the empty string after the line break ending the block
+            lines.pop()
+        for line in lines:
+            yield line
+        start = end
+
+
+@contextlib.contextmanager
+def _map_file(path):
+    """
+    Map a qif file in memory, read only
+    """
+    with open(path, 'rb') as fh:
+        if not os.fstat(fh.fileno()).st_size:
+            raise QifParserException('Data is empty')
+        data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if _NOT_SPACE.search(data) is None:
+                raise QifParserException('Data is empty')
+            yield data
+        finally:
+            data.close()
+
+
+class _FieldBag(object):
+    """
+    Stand-in for the entries parsed in worker processes: the fields end up
+    in a plain __dict__, much cheaper to send back than the entries
+    """
+
+    def __getattr__(self, name):
+        if name == 'splits':
+            self.splits = []
+            return self.splits
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return None
+
+
+def _restore_entry(entry_class, fields):
+    """
+    Build an entry from the fields of a _FieldBag
+    """
+    item = entry_class()
+    for name, value in fields.items():
+        if name == 'splits':
+            split_class = entry_class._split_class
+            value = [_restore_entry(split_class, split) for split in value]
+        try:
+            setattr(item, name, value)
+        except RuntimeError as exc:
+            raise QifParserInvalidValue("%s: %s" % (name, exc))
+    return item
+
+
+def _pack_records(records, placeholder=None):
+    """
+    Turn records parsed with _FieldBag entries into plain data
+    :return: list of ``(rtype, header, account, fields)`` records, fields
+        being the dict of the values set. account is the index of the
+        account record in the list, -1 for placeholder, the account in
+        effect at start, and None for records outside accounts.
+    """
+    res = []
+    accounts = {id(placeholder): -1, id(None): None}
+    for rtype, header, account, item in records:
+        fields = item.__dict__
+        if 'splits' in fields:
+            fields['splits'] = [split.__dict__ for split in fields['splits']]
+        if rtype == 'account':
+            accounts[id(item)] = len(res)
+        res.append((rtype, header, accounts[id(account)], fields))
+    return res
+
+
+def _parse_shard(path, start, end, encoding, header, has_account,
+                 date_format, decimal_sep, thousands_sep):
+    """
+    Parse the bytes between start and end of a file in a worker process
+    :return: list of records, see _pack_records
+    """
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        data = fh.read(end - start)
+    lines = _decode_lines(data, encoding)
+    placeholder = _FieldBag() if has_account else None
+    parsers = QifParser.recordParsers(date_format, decimal_sep,
+                                      thousands_sep, factory=_FieldBag)
+    return _pack_records(QifParser._iter_parsed(
+        lines, date_format, decimal_sep, thousands_sep,
+        header=header, account=placeholder, parsers=parsers), placeholder)
+
+
+def _process_pool(workers):
+    """
+    :return: a concurrent.futures ProcessPoolExecutor; the module is imported
+        on first use, as Python 2 only has it with the futures backport
+    """
+    try:
+        from concurrent.futures import ProcessPoolExecutor
+    except ImportError:
+        raise RuntimeError("concurrent.futures is needed to parse in a pool "
+                           "of processes (futures package on Python 2)")
+    return ProcessPoolExecutor(workers)
+
+
+# record parsers of a worker process by formats, kept from file to file
+_worker_parsers = {}
+# record parsers of the parse* methods of QifParser, by formats
+_chunk_parsers = {}
+
+
+def _warm_parsers(date_format, decimal_sep, thousands_sep,
+                  cache=_worker_parsers, factory=_FieldBag):
+    key = (date_format, decimal_sep, thousands_sep)
+    try:
+        parsers = cache[key]
+    except KeyError:
+        parsers = cache[key] = QifParser.recordParsers(
+            date_format, decimal_sep, thousands_sep, factory=factory)
+    strings = parsers['transaction'].strings
+    if len(strings) > MAX_SHARED_STRINGS:
+        strings.clear()
+    return parsers
+
+
+def _iter_file_records(path, encoding, date_format, num_sep, get_parsers):
+    """
+    Parse a whole file, formats being guessed when not given
+    :param get_parsers: callable returning the record parsers for the
+        date format and separators
+    :return: generator of ``(rtype, header, account, item)`` records
+    """
+    with open(path, 'rb') as fh:
+        lines = _decode_lines(fh.read(), encoding)
+    if not any(lines):
+        raise QifParserException('Data is empty')
+    if not date_format or num_sep is None:
+        date_format, num_sep, _ = QifParser.sniffFormats(
+            lines, date_format, num_sep, fallback=True)
+    decimal_sep, thousands_sep = num_sep
+    return QifParser._iter_parsed(
+        lines, date_format, decimal_sep, thousands_sep,
+        parsers=get_parsers(date_format, decimal_sep, thousands_sep))
+
+
+# errors reported per file by parse_many instead of stopping it; Qif
+# objects raise RuntimeError for entries they can't hold, e.g. investments
+# outside accounts
+FILE_ERRORS = (QifParserException, EnvironmentError, UnicodeError,
+               RuntimeError)
+
+
+def _parse_files(paths, encoding, date_format, num_sep):
+    """
+    Parse whole files in a worker process
+    :return: list of ``(path, records, error, elapsed)``, records (see
+        _pack_records) being None when error, the exception raised, is set
+    """
+    res = []
+    for path in paths:
+        start = time.time()
+        try:
+            records = _pack_records(_iter_file_records(
+                path, encoding, date_format, num_sep, _warm_parsers))
+        except FILE_ERRORS as exc:
+            res.append((path, None, exc, time.time() - start))
+        else:
+            res.append((path, records, None, time.time() - start))
+    return res
+
+
+# qif: the Qif object of the file, None if it couldn't be parsed
+# error: the exception raised parsing the file (QifParserInvalidDate,
+# QifParserInvalidNumber, ..., or IOError), None on success
+# size: size of the file in bytes, elapsed: seconds spent parsing it
+FileResult = namedtuple('FileResult', 'path qif error size elapsed')
+
+
+class BatchResult(object):
+    """
+    Outcome of QifParser.parse_many: the FileResult of every file, in the
+    order of the paths given, and the aggregate throughput
+    """
+
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    @property
+    def errors(self):
+        return [result for result in self.results if result.error is not None]
+
+    @property
+    def size(self):
+        return sum(result.size for result in self.results)
+
+    @property
+    def files_per_second(self):
+        return len(self.results) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.size / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return '%d files (%d errors), %d bytes in %.2fs: %.1f files/s, ' \
+            '%.2f MB/s' % (len(self.results), len(self.errors), self.size,
+                           self.elapsed, self.files_per_second,
+                           self.bytes_per_second / 1e6)
+
+
 class QifParser(object):
 
     @classmethod
-    def parse(cls_, file_handle, date_format=None, num_sep=None):
+    def parse(cls_, file_handle, date_format=None, num_sep=None, stats=None,
+              errors=None, lazy=False, fields=None):
+        """
+        :param stats: a ParseStats to fill with the measures of the parse
+        :param errors: an ErrorReport for a lenient parse: the records that
+            can't be parsed are skipped and reported there instead of
+            raising an exception, and so are the samples fitting no format
+            while guessing formats
+        :param lazy: keep the text of the date and number fields and decode
+            it on first access: entries are instances of the lazy_class of
+            the entry classes, and invalid values raise an exception when
+            accessed instead of while parsing
+        :param fields: names of the fields of the transactions, investments
+            and memorized transactions to store, e.g. ``('date', 'amount',
+            'category')``, with 'splits' to build their splits: the lines
+            of the other fields are skipped. Entries missing required fields
+            can't be written.
+        """
         if isinstance(file_handle, type('')):
             raise RuntimeError(
                 six.u("parse() takes in a file handle, not a string"))
@@ -55,320 +882,768 @@ class QifParser(object):
         # Since it is not in our control how the file is opened we can't rely on
         # universal newlines feature
 
-        data = '\n'.join(x.strip() for x in file_handle)
+        if stats is None:
+            lines = [x.strip() for x in file_handle]
+        else:
+            lines = list(stats.read_lines(file_handle))
 
-        if len(data) == 0:
+        if not any(lines):
             raise QifParserException('Data is empty')
+        if stats is not None:
+            stats.start('guess')
+        lenient = errors is not None
         if not date_format:
-            date_format = cls_.guessDateFormat(cls_.getDateSamples(data))
+            date_format = cls_.guessDateFormat(cls_.getDateSamples(lines),
+                                               stop_early=True,
+                                               lenient=lenient)
         if num_sep is None:
-            decimal_sep, thousands_sep = cls_.guessNumberFormat(cls_.getNumberSamples(data))
+            decimal_sep, thousands_sep = cls_.guessNumberFormat(
+                cls_.getNumberSamples(lines), stop_early=True,
+                lenient=lenient)
         else:
             decimal_sep, thousands_sep = num_sep
-        qif_obj = Qif()
-        chunks = data.split('\n^\n')
-        last_type = None
+        if stats is not None:
+            stats.stop()
+        return cls_.buildQif(cls_._iter_parsed(
+            lines, date_format, decimal_sep, thousands_sep, stats=stats,
+            errors=errors, lazy=lazy, fields=fields), stats)
+
+    @classmethod
+    def iter_records(cls_, file_handle, date_format=None, num_sep=None,
+                     context=False, sniff_lines=DEFAULT_SNIFF_LINES,
+                     stats=None, errors=None, lazy=False, fields=None):
+        """
+        Parse a qif file lazily, yielding one entry per ``^`` terminated
+        record as soon as it has been read.
+
+        Only the lines of the current record are kept in memory. When
+        ``date_format`` or ``num_sep`` are not given they are guessed from
+        the first ``sniff_lines`` lines of the stream (see sniffFormats),
+        or from all of them, held in memory, when these are not enough.
+
+        :param context: if True yield ``(rtype, header, account, item)``
+            tuples, where ``rtype`` is the kind of record ('transaction',
+            'account', ...), ``header`` the last ``!`` header line seen and
+            ``account`` the Account the item belongs to (or None)
+        :param stats: a ParseStats to fill with the measures of the parse,
+            complete once the generator is exhausted
+        :param errors: an ErrorReport for a lenient parse, see parse()
+        :param lazy: decode dates and numbers on first access, see parse()
+        :param fields: names of the fields of the transaction records to
+            store, see parse()
+        :return: generator of Transaction, Investment, Account, ... objects
+        """
+        if isinstance(file_handle, type('')):
+            raise RuntimeError(
+                six.u("iter_records() takes in a file handle, not a string"))
+        if stats is None:
+            lines = (x.strip() for x in file_handle)
+        else:
+            lines = stats.read_lines(file_handle)
+        if not date_format or num_sep is None:
+            date_format, num_sep, lines = cls_._sniffFormats(
+                lines, date_format, num_sep, sniff_lines, stats,
+                errors is not None)
+        decimal_sep, thousands_sep = num_sep
+        records = cls_._iter_parsed(lines, date_format,
+                                    decimal_sep, thousands_sep, stats=stats,
+                                    errors=errors, lazy=lazy, fields=fields)
+        if context:
+            return records
+        return (record[-1] for record in records)
+
+    @classmethod
+    def parse_path(cls_, path, date_format=None, num_sep=None,
+                   encoding=None, block_size=DEFAULT_BLOCK_SIZE, stats=None,
+                   errors=None, lazy=False, fields=None):
+        """
+        Parse the qif file at path, the result being the same as parse().
+
+        The file is mapped in memory and decoded one block of block_size
+        bytes at a time, so that the decoded text of the whole file is never
+        held at once. Line endings can be ``\\n``, ``\\r\\n`` or ``\\r``. The
+        encoding must be ASCII compatible (e.g. utf-8, latin-1) and defaults
+        to the preferred encoding of the locale, as for open().
+
+        :param stats: a ParseStats to fill with the measures of the parse
+        :param errors: an ErrorReport for a lenient parse, see parse()
+        :param lazy: decode dates and numbers on first access, see parse()
+        :param fields: names of the fields of the transaction records to
+            store, see parse()
+        """
+        if encoding is None:
+            encoding = locale.getpreferredencoding(False)
+        with _map_file(path) as data:
+            lines = _iter_mapped_lines(data, encoding, block_size)
+            if stats is not None:
+                lines = stats.read_lines(lines, len(data))
+            if not date_format or num_sep is None:
+                date_format, num_sep, lines = cls_._sniffFormats(
+                    lines, date_format, num_sep, DEFAULT_SNIFF_LINES, stats,
+                    errors is not None)
+            decimal_sep, thousands_sep = num_sep
+            return cls_.buildQif(cls_._iter_parsed(
+                lines, date_format, decimal_sep, thousands_sep, stats=stats,
+                errors=errors, lazy=lazy, fields=fields), stats)
+
+    @classmethod
+    def parse_delta(cls_, path, index=None, date_format=None, num_sep=None,
+                    encoding=None):
+        """
+        Parse only the records of the file at path that have been added or
+        changed since index, a RecordIndex of a previous version of the file
+        (or all of them if index is None).
+
+        When the previous version is a prefix of the file, only the appended
+        bytes are scanned; otherwise records are matched by content hash.
+        The formats and encoding of index are used unless given.
+
+        :return: a qifparse.index.Delta: the ``(rtype, header, account,
+            item)`` tuples of the new records, in file order, the index
+            entries of the records removed and the index of the file, to be
+            saved for the next call
+        """
+        if index is not None:
+            encoding = encoding or index.encoding
+            date_format = date_format or index.date_format
+            if num_sep is None:
+                num_sep = index.num_sep
+        if encoding is None:
+            encoding = locale.getpreferredencoding(False)
+        with _map_file(path) as data:
+            if not date_format or num_sep is None:
+                date_format, num_sep, _ = cls_.sniffFormats(
+                    _iter_mapped_lines(data, encoding), date_format,
+                    num_sep, fallback=True)
+            if index is None:
+                entries = None
+                changed = None
+                removed = []
+            else:
+                entries, changed, removed = index.diff(data, encoding)
+            new_index = RecordIndex.build(data, encoding, date_format,
+                                          num_sep, entries)
+            if changed is None:
+                changed = range(len(new_index))
+            records = list(cls_._parseEntries(
+                data, new_index, changed, date_format, num_sep))
+        return Delta(records, removed, new_index)
+
+    @classmethod
+    def _parseEntries(cls_, data, index, positions, date_format, num_sep):
+        """
+        Parse the records of data at the given positions of its index
+        :return: generator of ``(rtype, header, account, item)``
+        """
+        entries = index.entries
+        decimal_sep, thousands_sep = num_sep
+        parsers = cls_.recordParsers(date_format, decimal_sep, thousands_sep)
+        accounts = {-1: None}
+
+        def get_account(position):
+            if position not in accounts:
+                entry = entries[position]
+                chunk = _decode_lines(data[entry.start:entry.end],
+                                      index.encoding)
+                accounts[position] = parsers['account'](
+                    [line for line in chunk if line and line != '^'])
+            return accounts[position]
+
+        # consecutive records are parsed at once
+        runs = []
+        for position in positions:
+            if runs and runs[-1][-1] == position - 1:
+                runs[-1].append(position)
+            else:
+                runs.append([position])
+        for run in runs:
+            first = entries[run[0]]
+            account = None
+            if first.account != run[0]:
+                account = get_account(first.account)
+            lines = _decode_lines(data[first.start:entries[run[-1]].end],
+                                  index.encoding)
+            header = first.header if first.header in HEADER_TYPES else None
+            records = cls_._iter_parsed(
+                lines, date_format, decimal_sep, thousands_sep,
+                header=header, account=account, parsers=parsers)
+            for position, record in zip(run, records):
+                if record[0] == 'account':
+                    accounts[position] = record[-1]
+                yield record
+
+    @classmethod
+    def parse_cached(cls_, path, cache_path=None, date_format=None,
+                     num_sep=None, encoding=None, verify=True):
+        """
+        Parse the qif file at path as parse_path(), keeping a binary
+        snapshot of the result in cache_path (see qifparse.snapshot).
+
+        The snapshot is loaded instead of parsing the file as long as it
+        has been saved for the same size and content of the file and the
+        same options; otherwise the file is parsed and the snapshot saved
+        again.
+
+        :param cache_path: defaults to path followed by SNAPSHOT_SUFFIX
+        :param verify: check the hash of the file content even when its
+            size and modification time are those of the snapshot
+        """
+        from qifparse import snapshot
+        if cache_path is None:
+            cache_path = path + SNAPSHOT_SUFFIX
+        if encoding is None:
+            encoding = locale.getpreferredencoding(False)
+        options = dict(date_format=date_format, num_sep=num_sep,
+                       encoding=encoding)
+        try:
+            with open(cache_path, 'rb') as fh:
+                if snapshot.matches(snapshot.read_source(fh), path, verify,
+                                    **options):
+                    fh.seek(0)
+                    return snapshot.load(fh)
+        except (EnvironmentError, ValueError):
+            pass
+        source = snapshot.source_key(path, **options)
+        qif_obj = cls_.parse_path(path, date_format, num_sep, encoding)
+        temp_path = cache_path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as fh:
+                snapshot.save(qif_obj, fh, source)
+            os.rename(temp_path, cache_path)
+        except (EnvironmentError, ValueError) as exc:
+            logger.warning("Can't save the snapshot of %s: %s", path, exc)
+        return qif_obj
+
+    @classmethod
+    def parse_parallel(cls_, path, workers=None, date_format=None,
+                       num_sep=None, encoding=None):
+        """
+        Parse a qif file splitting it into shards parsed by a pool of
+        ``workers`` processes, the result being the same as parse().
+
+        Shards are cut after record terminators and each one is given the
+        header and account in effect where it starts. The encoding must be
+        ASCII compatible (e.g. utf-8, latin-1).
+        """
+        if encoding is None:
+            encoding = locale.getpreferredencoding(False)
+        if workers is None:
+            import multiprocessing
+            workers = multiprocessing.cpu_count()
+        with _map_file(path) as data:
+            if not date_format or num_sep is None:
+                date_format, num_sep, _ = cls_.sniffFormats(
+                    _iter_mapped_lines(data, encoding), date_format,
+                    num_sep, fallback=True)
+            shards = cls_._findShards(data, workers, encoding)
+        decimal_sep, thousands_sep = num_sep
+        executor = _process_pool(workers)
+        try:
+            futures = [executor.submit(
+                _parse_shard, path, start, end, encoding, header,
+                has_account, date_format, decimal_sep, thousands_sep)
+                for start, end, header, has_account in shards]
+            return cls_.buildQif(cls_._mergeShards(
+                future.result() for future in futures))
+        finally:
+            executor.shutdown()
+
+    @classmethod
+    def _findShards(cls_, data, count, encoding):
+        """
+        Cut the raw content of a file in about ``count`` shards ending with
+        a record terminator
+        :return: list of ``(start, end, header, has_account)`` where header
+            is the last header line before start and has_account tells if
+            an account has been defined before start
+        """
+        size = len(data)
+        cuts = [0]
+        for index in range(1, count):
+            cut = cls_._nextRecord(data, max(size * index // count, cuts[-1]))
+            if cut >= size:
+                break
+            if cut > cuts[-1]:
+                cuts.append(cut)
+        cuts.append(size)
+        shards = []
+        for start, end in zip(cuts, cuts[1:]):
+            header = None
+            has_account = False
+            pos = data.rfind(b'\n!', 0, start)
+            if start and (pos != -1 or data[:1] == b'!'):
+                pos += 1
+                eol = data.find(b'\n', pos)
+                header = data[pos:eol].strip().decode(encoding)
+                has_account = data[:8] == b'!Account' or \
+                    data.rfind(b'\n!Account', 0, start) != -1
+            shards.append((start, end, header, has_account))
+        return shards
+
+    @classmethod
+    def _nextRecord(cls_, data, pos):
+        """
+        :return: the offset of the first line after the next ``^`` line
+            found from pos
+        """
+        size = len(data)
+        while True:
+            pos = data.find(b'\n^', max(pos - 1, 0))
+            if pos == -1:
+                return size
+            eol = data.find(b'\n', pos + 1)
+            if eol == -1:
+                eol = size
+            if data[pos + 1:eol].strip() == b'^':
+                return eol + 1
+            pos = eol
+
+    @classmethod
+    def _mergeShards(cls_, results):
+        """
+        Chain the records returned by _parse_shard as entries, giving the
+        records of a shard attached to the account in effect where it starts
+        the last Account of the previous shards
+        """
         last_account = None
-        transactions_header = None
-        parsers = {
-            'category': cls_.parseCategory,
-            'account': cls_.parseAccount,
-            'transaction': cls_.parseTransaction,
-            'investment': cls_.parseInvestment,
-            'class': cls_.parseClass,
-            'memorized': cls_.parseMemorizedTransaction
-        }
+        for records in results:
+            accounts = {-1: last_account, None: None}
+            for index, (rtype, header, account, fields) in \
+                    enumerate(records):
+                item = _restore_entry(RECORD_CLASSES[rtype], fields)
+                if rtype == 'account':
+                    accounts[index] = last_account = item
+                yield rtype, header, accounts[account], item
+
+    @classmethod
+    def parse_many(cls_, paths, workers=None, date_format=None, num_sep=None,
+                   encoding=None, task_size=DEFAULT_TASK_SIZE):
+        """
+        Parse many qif files in a pool of ``workers`` processes.
+
+        Files are handed out largest first, as workers become free; small
+        files are grouped in tasks of about task_size bytes. Workers keep
+        their record parsers from file to file. Formats are guessed for
+        each file when not given. A file that can't be read or parsed
+        doesn't stop the others: its error is reported in its result.
+        With a single worker, files are parsed in the calling process.
+
+        :param encoding: encoding of the files, ASCII compatible (e.g.
+            utf-8, latin-1), defaults to the preferred encoding of the
+            locale, as for open()
+        :return: a BatchResult
+        """
+        if encoding is None:
+            encoding = locale.getpreferredencoding(False)
+        if workers is None:
+            import multiprocessing
+            workers = multiprocessing.cpu_count()
+        start = time.time()
+        sizes = {}
+        for path in paths:
+            try:
+                sizes[path] = os.path.getsize(path)
+            except EnvironmentError:
+                sizes[path] = 0
+        tasks = []
+        task = []
+        task_bytes = 0
+        for path in sorted(sizes, key=sizes.get, reverse=True):
+            task.append(path)
+            task_bytes += sizes[path]
+            if task_bytes >= task_size:
+                tasks.append(task)
+                task = []
+                task_bytes = 0
+        if task:
+            tasks.append(task)
+        results = {}
+        if workers == 1:
+            # no pool: the entries are built directly, without copies
+            get_parsers = functools.partial(_warm_parsers, cache={},
+                                            factory=None)
+            for path in itertools.chain(*tasks):
+                file_start = time.time()
+                qif_obj = error = None
+                try:
+                    qif_obj = cls_.buildQif(_iter_file_records(
+                        path, encoding, date_format, num_sep, get_parsers))
+                except FILE_ERRORS as exc:
+                    error = exc
+                results[path] = FileResult(path, qif_obj, error, sizes[path],
+                                           time.time() - file_start)
+            return BatchResult([results[path] for path in paths],
+                               time.time() - start)
+        executor = _process_pool(workers)
+        from concurrent.futures import as_completed
+        try:
+            futures = [executor.submit(_parse_files, task, encoding,
+                                       date_format, num_sep)
+                       for task in tasks]
+            for future in as_completed(futures):
+                for path, records, error, elapsed in future.result():
+                    qif_obj = None
+                    if error is None:
+                        build_start = time.time()
+                        try:
+                            qif_obj = cls_.buildQif(
+                                cls_._mergeShards([records]))
+                        except FILE_ERRORS as exc:
+                            error = exc
+                        elapsed += time.time() - build_start
+                    results[path] = FileResult(path, qif_obj, error,
+                                               sizes[path], elapsed)
+        finally:
+            executor.shutdown()
+        return BatchResult([results[path] for path in paths],
+                           time.time() - start)
+
+    @classmethod
+    def parseColumns(cls_, file_handle, date_format=None, num_sep=None,
+                     scale=None):
+        """
+        Parse the transactions of a qif file straight into a
+        qifparse.columnar.TransactionTable, without building a Qif object
+        :param scale: number of decimals kept for the amounts, as many as
+            they have if None
+        """
+        from qifparse.columnar import TransactionTable
+        table = TransactionTable(scale)
+        records = cls_.iter_records(file_handle, date_format, num_sep,
+                                    context=True)
+        table.extend((account, header, item)
+                     for rtype, header, account, item in records
+                     if rtype in TRANSACTION_RECORD_TYPES)
+        return table
+
+    @classmethod
+    def sniffFormats(cls_, lines, date_format=None, num_sep=None,
+                     max_samples=DEFAULT_SNIFF_SAMPLES,
+                     max_lines=DEFAULT_SNIFF_LINES, lenient=False,
+                     fallback=False):
+        """
+        Guess date and number formats from a bounded prefix of ``lines``.
+
+        Guessing stops as soon as a single candidate is left, after
+        ``max_samples`` samples or after ``max_lines`` lines, whichever
+        comes first.
+
+        :param lines: iterable of stripped lines
+        :param lenient: ignore the samples fitting none of the formats
+        :param fallback: when a format can't be guessed from the prefix,
+            guess it from all the lines as parse() does, holding them in
+            memory, instead of raising an exception
+        :return: ``(date_format, (decimal_sep, thousands_sep), lines)``
+            where the last item iterates over all the lines again, the
+            peeked ones included
+        """
+        prefix = _Lookahead(lines, max_lines)
+        if not date_format:
+            try:
+                date_format = cls_.guessDateFormat(
+                    cls_.getDateSamples(prefix), max_samples=max_samples,
+                    stop_early=True, lenient=lenient)
+            except QifParserInvalidDate:
+                if not fallback:
+                    raise
+                prefix.limit = None
+                date_format = cls_.guessDateFormat(
+                    cls_.getDateSamples(prefix), stop_early=True,
+                    lenient=lenient)
+        if num_sep is None:
+            try:
+                num_sep = cls_.guessNumberFormat(
+                    cls_.getNumberSamples(prefix), max_samples=max_samples,
+                    stop_early=True, lenient=lenient)
+            except QifParserInvalidNumber:
+                if not fallback:
+                    raise
+                prefix.limit = None
+                num_sep = cls_.guessNumberFormat(
+                    cls_.getNumberSamples(prefix), stop_early=True,
+                    lenient=lenient)
+        return date_format, num_sep, prefix.rest()
+
+    @classmethod
+    def _sniffFormats(cls_, lines, date_format, num_sep, max_lines, stats,
+                      lenient=False):
+        """
+        sniffFormats(), timed as 'guess' when stats is not None
+        """
+        if stats is None:
+            return cls_.sniffFormats(lines, date_format, num_sep,
+                                     max_lines=max_lines, lenient=lenient,
+                                     fallback=True)
+        stats.start('guess')
+        try:
+            return cls_.sniffFormats(lines, date_format, num_sep,
+                                     max_lines=max_lines, lenient=lenient,
+                                     fallback=True)
+        finally:
+            stats.stop()
+
+    @classmethod
+    def buildQif(cls_, records, stats=None):
+        """
+        Assemble a Qif object from the ``(rtype, header, account, item)``
+        tuples produced by ``iter_records(..., context=True)``
+        :param stats: a ParseStats timing the assembly as 'build'
+        """
+        if stats is not None:
+            stats.start('build')
+            try:
+                return cls_.buildQif(records)
+            finally:
+                stats.stop()
+        qif_obj = Qif()
+        for rtype, header, account, item in records:
+            if rtype == 'account':
+                qif_obj.add_account(item)
+            elif rtype in TRANSACTION_RECORD_TYPES:
+                if account is not None:
+                    account.add_transaction(item, header=header)
+                else:
+                    qif_obj.add_transaction(item, header=header)
+            elif rtype == 'category':
+                qif_obj.add_category(item)
+            elif rtype == 'class':
+                qif_obj.add_class(item)
+        return qif_obj
+
+    @classmethod
+    def _iter_chunks(cls_, lines):
+        """
+        Group stripped lines into records, dropping blank lines and the
+        ``^`` terminators
+        """
+        chunk = []
+        for line in lines:
+            if line == '^':
+                if chunk:
+                    yield chunk
+                    chunk = []
+            elif line:
+                chunk.append(line)
+        if chunk:
+            yield chunk
+
+    @classmethod
+    def _iter_numbered_chunks(cls_, lines):
+        """
+        _iter_chunks() yielding ``(line_number, chunk)``, line_number being
+        the number of the first line of the record, starting at 1
+        """
+        chunk = []
+        start = None
+        for number, line in enumerate(lines, 1):
+            if line == '^':
+                if chunk:
+                    yield start, chunk
+                    chunk = []
+            elif line:
+                if not chunk:
+                    start = number
+                chunk.append(line)
+        if chunk:
+            yield start, chunk
+
+    @classmethod
+    def _iter_parsed(cls_, lines, date_format, decimal_sep, thousands_sep,
+                     header=None, account=None, parsers=None, stats=None,
+                     errors=None, lazy=False, fields=None):
+        """
+        :param header: header line in effect before the first line, when
+            parsing only a part of a file
+        :param account: Account in effect before the first line
+        :param parsers: record parsers to use instead of recordParsers()
+        :param stats: a ParseStats timing the splitting of the lines and the
+            parsing of the records
+        :param errors: an ErrorReport to quarantine the invalid records in
+            instead of raising an exception
+        :param lazy: decode dates and numbers on first access
+        :param fields: names of the fields of the transaction records to
+            store, see recordParsers
+        """
+        if parsers is None:
+            parsers = cls_.recordParsers(
+                date_format, decimal_sep, thousands_sep, stats=stats,
+                unknown_line=errors.unknown_line if errors is not None
+                else None, lazy=lazy, fields=fields)
+        if errors is not None:
+            for record in cls_._iter_lenient(lines, parsers, errors, header,
+                                             account, stats):
+                yield record
+            return
+        last_type = HEADER_TYPES[header] if header else None
+        last_account = account
+        chunks = cls_._iter_chunks(lines)
+        if stats is not None:
+            chunks = stats.timed_iter('split', chunks)
         for chunk in chunks:
-            if not chunk:
-                continue
-            first_line = chunk.split('\n')[0]
-            if first_line == '!Type:Cat':
-                last_type = 'category'
-            elif first_line == '!Account':
-                last_type = 'account'
-            elif first_line in NON_INVST_ACCOUNT_TYPES:
-                last_type = 'transaction'
-                transactions_header = first_line
-            elif first_line == '!Type:Invst':
-                last_type = 'investment'
-                transactions_header = first_line
-            elif first_line == '!Type:Class':
-                last_type = 'class'
-            elif first_line == '!Type:Memorized':
-                last_type = 'memorized'
-                transactions_header = first_line
-            elif chunk.startswith('!'):
-                raise QifParserException(six.u("Header not recognized: %s") % repr(first_line))
+            first_line = chunk[0]
+            if first_line.startswith('!'):
+                if first_line not in HEADER_TYPES:
+                    raise QifParserException(six.u("Header not recognized: %s") % repr(first_line))
+                last_type = HEADER_TYPES[first_line]
+                header = first_line
+            elif last_type is None:
+                raise QifParserException(six.u("Record found before any header: %s") % repr(first_line))
             # if no header is recognized then
             # we use the previous one
-            item = parsers[last_type](chunk, date_format, decimal_sep, thousands_sep)
+            item = parsers[last_type](chunk)
             if last_type == 'account':
-                qif_obj.add_account(item)
                 last_account = item
-            elif last_type == 'transaction'\
-                    or last_type == 'memorized' or last_type == 'investment':
-                if last_account:
-                    last_account.add_transaction(item,
-                                                 header=transactions_header)
+            if last_type in TRANSACTION_RECORD_TYPES:
+                yield last_type, header, last_account, item
+            else:
+                yield last_type, header, None, item
+
+    @classmethod
+    def _iter_lenient(cls_, lines, parsers, errors, header, account, stats):
+        """
+        _iter_parsed() quarantining the records that can't be parsed, with
+        the records of unknown sections, into errors
+        """
+        last_type = HEADER_TYPES[header] if header else None
+        last_account = account
+        invalid = len(errors.records)
+        chunks = cls_._iter_numbered_chunks(lines)
+        if stats is not None:
+            chunks = stats.timed_iter('split', chunks)
+        for number, chunk in chunks:
+            first_line = chunk[0]
+            if first_line.startswith('!'):
+                last_type = HEADER_TYPES.get(first_line)
+                header = first_line
+            if last_type is None:
+                if header is None:
+                    reason = "Record found before any header"
                 else:
-                    qif_obj.add_transaction(item,
-                                            header=transactions_header)
-            elif last_type == 'category':
-                qif_obj.add_category(item)
-            elif last_type == 'class':
-                qif_obj.add_class(item)
-        return qif_obj
+                    reason = "Header not recognized: %r" % header
+                errors.quarantine(number, header, chunk, reason)
+                continue
+            try:
+                item = parsers[last_type](chunk)
+            except RECORD_ERRORS as exc:
+                errors.quarantine(number, header, chunk, six.text_type(exc))
+                continue
+            if last_type == 'account':
+                last_account = item
+            if last_type in TRANSACTION_RECORD_TYPES:
+                yield last_type, header, last_account, item
+            else:
+                yield last_type, header, None, item
+        invalid = len(errors.records) - invalid
+        if invalid:
+            logger.warning("Skipped %d invalid records, the first one at "
+                           "line %d", invalid, errors.records[-invalid].line)
+
+    @classmethod
+    def recordParsers(cls_, date_format=DEFAULT_DATE_FORMAT,
+                      decimal_sep=DEFAULT_DECIMAL_SEP,
+                      thousands_sep=DEFAULT_THOUSANDS_SEP, factory=None,
+                      stats=None, unknown_line=None, lazy=False,
+                      fields=None):
+        """
+        Build the RecordParser of every record type for the given formats
+        :param stats: a ParseStats counting and timing the records parsed,
+            the dates and the numbers
+        :param unknown_line: function(entry_class, line) called on the
+            unknown lines, see RecordParser
+        :param lazy: decode dates and numbers on first access, see
+            RecordParser
+        :param fields: names of the fields to store for the transactions,
+            investments and memorized transactions, with 'splits' to build
+            their splits; all of them if None. Accounts, categories and
+            classes are parsed whole.
+        :return: dict mapping record types ('transaction', ...) to parsers
+        """
+        if fields is not None:
+            fields = frozenset(fields)
+            unknown = fields - PROJECTED_FIELDS
+            if unknown:
+                raise QifParserException(
+                    "unknown fields: %s" % ', '.join(sorted(unknown)))
+        parse_date = DateParser(date_format)
+        parse_number = number_parser(decimal_sep, thousands_sep)
+        if stats is None:
+            strings = {}
+        else:
+            parse_date, parse_number, strings = stats.instrument(
+                parse_date, parse_number)
+        parsers = dict((rtype, RecordParser(
+            entry_class, parse_date, parse_number, strings, factory,
+            unknown_line, lazy,
+            fields if rtype in TRANSACTION_RECORD_TYPES else None))
+            for rtype, entry_class in RECORD_CLASSES.items())
+        if stats is not None:
+            parsers = dict((rtype, stats.record_parser(rtype, parser))
+                           for rtype, parser in parsers.items())
+        return parsers
+
+    @classmethod
+    def _parseChunk(cls_, rtype, chunk, date_format, decimal_sep,
+                    thousands_sep):
+        parser = _warm_parsers(date_format, decimal_sep, thousands_sep,
+                               cache=_chunk_parsers, factory=None)[rtype]
+        # every chunk gets its own warnings about unknown lines
+        parser.unknown_lines = 0
+        return parser([line for line in chunk.split('\n') if line])
 
     @classmethod
     def parseClass(cls_, chunk,
                    date_format=DEFAULT_DATE_FORMAT,
                    decimal_sep=DEFAULT_DECIMAL_SEP,
                    thousands_sep=DEFAULT_THOUSANDS_SEP):
-        curItem = Class()
-        lines = chunk.split('\n')
-        for line in lines:
-            if not len(line) or line[0] == '\n' or \
-                    line.startswith('!Type:Class'):
-                continue
-            elif line[0] == 'N':
-                curItem.name = line[1:]
-            elif line[0] == 'D':
-                curItem.description = line[1:]
-        return curItem
+        return cls_._parseChunk('class', chunk, date_format,
+                                decimal_sep, thousands_sep)
 
     @classmethod
     def parseCategory(cls_, chunk,
                       date_format=DEFAULT_DATE_FORMAT,
                       decimal_sep=DEFAULT_DECIMAL_SEP,
                       thousands_sep=DEFAULT_THOUSANDS_SEP):
-        """
-        """
-        curItem = Category()
-        lines = chunk.split('\n')
-        for line in lines:
-            if not len(line) or line[0] == '\n' or line.startswith('!Type'):
-                continue
-            elif line[0] == 'E':
-                curItem.expense_category = True
-            elif line[0] == 'I':
-                curItem.income_category = True
-                curItem.expense_category = False  # if ommitted is True
-            elif line[0] == 'T':
-                curItem.tax_related = True
-            elif line[0] == 'D':
-                curItem.description = line[1:]
-            elif line[0] == 'B':
-                curItem.budget_amount = line[1:]
-            elif line[0] == 'R':
-                curItem.tax_schedule_info = line[1:]
-            elif line[0] == 'N':
-                curItem.name = line[1:]
-        return curItem
+        return cls_._parseChunk('category', chunk, date_format,
+                                decimal_sep, thousands_sep)
 
     @classmethod
     def parseAccount(cls_, chunk,
                      date_format=DEFAULT_DATE_FORMAT,
                      decimal_sep=DEFAULT_DECIMAL_SEP,
                      thousands_sep=DEFAULT_THOUSANDS_SEP):
-        """
-        """
-        curItem = Account()
-        lines = chunk.split('\n')
-        for line in lines:
-            if not len(line) or line[0] == '\n' or line.startswith('!Account'):
-                continue
-            elif line[0] == 'N':
-                curItem.name = line[1:]
-            elif line[0] == 'D':
-                curItem.description = line[1:]
-            elif line[0] == 'T':
-                curItem.account_type = line[1:]
-            elif line[0] == 'L':
-                curItem.credit_limit = line[1:]
-            elif line[0] == '/':
-                curItem.balance_date = cls_.parseQifDateTime(line[1:], date_format)
-            elif line[0] == '$':
-                curItem.balance_amount = line[1:]
-            else:
-                logger.warn('Line not recognized: %s' % line)
-        return curItem
+        return cls_._parseChunk('account', chunk, date_format,
+                                decimal_sep, thousands_sep)
 
     @classmethod
     def parseMemorizedTransaction(cls_, chunk,
                                   date_format=DEFAULT_DATE_FORMAT,
                                   decimal_sep=DEFAULT_DECIMAL_SEP,
                                   thousands_sep=DEFAULT_THOUSANDS_SEP):
-        """
-        """
-
-        curItem = MemorizedTransaction()
-        lines = chunk.split('\n')
-        for line in lines:
-            if not len(line) or line[0] == '\n' or \
-                    line.startswith('!Type:Memorized'):
-                continue
-            elif line[0] == 'T':
-                curItem.amount = cls_.parseQifNumber(line[1:], decimal_sep=decimal_sep, thousands_sep=thousands_sep)
-            elif line[0] == 'C':
-                curItem.cleared = line[1:]
-            elif line[0] == 'P':
-                curItem.payee = line[1:]
-            elif line[0] == 'M':
-                curItem.memo = line[1:]
-            elif line[0] == 'K':
-                curItem.mtype = line[1:]
-            elif line[0] == 'A':
-                if not curItem.address:
-                    curItem.address = []
-                curItem.address.append(line[1:])
-            elif line[0] == 'L':
-                cat = line[1:]
-                if cat.startswith('['):
-                    curItem.to_account = cat[1:-1]
-                else:
-                    curItem.category = cat
-            elif line[0] == 'S':
-                curItem.splits.append(AmountSplit())
-                split = curItem.splits[-1]
-                cat = line[1:]
-                if cat.startswith('['):
-                    split.to_account = cat[1:-1]
-                else:
-                    split.category = cat
-            elif line[0] == 'E':
-                split = curItem.splits[-1]
-                split.memo = line[1:-1]
-            elif line[0] == 'A':
-                split = curItem.splits[-1]
-                if not split.address:
-                    split.address = []
-                split.address.append(line[1:])
-            elif line[0] == '$':
-                split = curItem.splits[-1]
-                split.amount = cls_.parseQifNumber(line[1:-1], decimal_sep=decimal_sep, thousands_sep=thousands_sep)
-            else:
-                # don't recognise this line; ignore it
-                logger.warn("Skipping unknown line:\n" + str(line))
-        return curItem
+        return cls_._parseChunk('memorized', chunk, date_format,
+                                decimal_sep, thousands_sep)
 
     @classmethod
     def parseTransaction(cls_, chunk,
                          date_format=DEFAULT_DATE_FORMAT,
                          decimal_sep=DEFAULT_DECIMAL_SEP,
                          thousands_sep=DEFAULT_THOUSANDS_SEP):
-        """
-        """
-
-        curItem = Transaction()
-
-        lines = chunk.split('\n')
-        for line in lines:
-            if not len(line) or line[0] == '\n' or line.startswith('!Type'):
-                continue
-            elif line[0] == 'D':
-                curItem.date = cls_.parseQifDateTime(line[1:], date_format)
-            elif line[0] == 'N':
-                curItem.num = line[1:]
-            elif line[0] == 'T':
-                curItem.amount = cls_.parseQifNumber(line[1:], decimal_sep=decimal_sep, thousands_sep=thousands_sep)
-            elif line[0] == 'C':
-                curItem.cleared = line[1:]
-            elif line[0] == 'P':
-                curItem.payee = line[1:]
-            elif line[0] == 'M':
-                curItem.memo = line[1:]
-            elif line[0] == '1':
-                curItem.first_payment_date = line[1:]
-            elif line[0] == '2':
-                curItem.years_of_loan = line[1:]
-            elif line[0] == '3':
-                curItem.num_payments_done = line[1:]
-            elif line[0] == '4':
-                curItem.periods_per_year = line[1:]
-            elif line[0] == '5':
-                curItem.interests_rate = line[1:]
-            elif line[0] == '6':
-                curItem.current_loan_balance = line[1:]
-            elif line[0] == '7':
-                curItem.original_loan_amount = line[1:]
-            elif line[0] == 'A':
-                if not curItem.address:
-                    curItem.address = []
-                curItem.address.append(line[1:])
-            elif line[0] == 'L':
-                cat = line[1:]
-                if cat.startswith('['):
-                    curItem.to_account = cat[1:-1]
-                else:
-                    curItem.category = cat
-            elif line[0] == 'S':
-                curItem.splits.append(AmountSplit())
-                split = curItem.splits[-1]
-                cat = line[1:]
-                if cat.startswith('['):
-                    split.to_account = cat[1:-1]
-                else:
-                    split.category = cat
-            elif line[0] == 'E':
-                split = curItem.splits[-1]
-                split.memo = line[1:]
-            elif line[0] == 'A':
-                split = curItem.splits[-1]
-                if not split.address:
-                    split.address = []
-                split.address.append(line[1:])
-            elif line[0] == '$':
-                split = curItem.splits[-1]
-                split.amount = cls_.parseQifNumber(line[1:], decimal_sep=decimal_sep, thousands_sep=thousands_sep)
-            else:
-                # don't recognise this line; ignore it
-                logger.warn("Skipping unknown line:\n" + str(line))
-        return curItem
+        return cls_._parseChunk('transaction', chunk, date_format,
+                                decimal_sep, thousands_sep)
 
     @classmethod
     def parseInvestment(cls_, chunk,
                         date_format=DEFAULT_DATE_FORMAT,
                         decimal_sep=DEFAULT_DECIMAL_SEP,
                         thousands_sep=DEFAULT_THOUSANDS_SEP):
-        """
-        """
-
-        curItem = Investment()
-
-        lines = chunk.split('\n')
-        for line in lines:
-            if not len(line) or line[0] == '\n' or line.startswith('!Type'):
-                continue
-            elif line[0] == 'D':
-                curItem.date = cls_.parseQifDateTime(line[1:], date_format)
-            elif line[0] == 'T':
-                curItem.amount = cls_.parseQifNumber(line[1:], decimal_sep=decimal_sep, thousands_sep=thousands_sep)
-            elif line[0] == 'N':
-                curItem.action = line[1:]
-            elif line[0] == 'Y':
-                curItem.security = line[1:]
-            elif line[0] == 'I':
-                curItem.price = cls_.parseQifNumber(line[1:], decimal_sep=decimal_sep, thousands_sep=thousands_sep)
-            elif line[0] == 'Q':
-                curItem.quantity = cls_.parseQifNumber(line[1:], decimal_sep=decimal_sep, thousands_sep=thousands_sep)
-            elif line[0] == 'C':
-                curItem.cleared = line[1:]
-            elif line[0] == 'M':
-                curItem.memo = line[1:]
-            elif line[0] == 'P':
-                curItem.first_line = line[1:]
-            elif line[0] == 'L':
-                curItem.to_account = line[2:-1]
-            elif line[0] == '$':
-                curItem.amount_transfer = cls_.parseQifNumber(line[1:], decimal_sep=decimal_sep, thousands_sep=thousands_sep)
-            elif line[0] == 'O':
-                curItem.commission = cls_.parseQifNumber(line[1:], decimal_sep=decimal_sep, thousands_sep=thousands_sep)
-        return curItem
+        return cls_._parseChunk('investment', chunk, date_format,
+                                decimal_sep, thousands_sep)
 
     @classmethod
     def getSamples(cls, data, data_type):
+        if isinstance(data, six.string_types):
+            data = data.split('\n')
         skip = False
-        for line in data.split('\n'):
+        for line in data:
             if line.startswith('!'):
                 skip = False
             if line.startswith('!Account'):
@@ -381,14 +1656,27 @@ class QifParser(object):
         return cls.getSamples(data, 'D')
 
     @classmethod
-    def guessDateFormat(cls, samples):
+    def guessDateFormat(cls, samples, max_samples=None, stop_early=False,
+                        lenient=False):
+        """
+        :param max_samples: look at no more than this number of samples
+        :param stop_early: stop as soon as only one format is left
+        :param lenient: ignore the samples fitting none of the formats left
+        """
         possible_date_formats = ['dmy', 'mdy', 'ymd']
-        for sample in samples:
-            for date_format in possible_date_formats[:]:
+        for sample in itertools.islice(samples, max_samples):
+            invalid = []
+            for date_format in possible_date_formats:
                 try:
                     cls.parseQifDateTime(sample, date_format=date_format)
                 except QifParserInvalidDate:
-                    possible_date_formats.remove(date_format)
+                    invalid.append(date_format)
+            if lenient and len(invalid) == len(possible_date_formats):
+                continue
+            for date_format in invalid:
+                possible_date_formats.remove(date_format)
+            if stop_early and len(possible_date_formats) == 1:
+                break
         if len(possible_date_formats) == 0:
             raise QifParserInvalidDate("Inconsistent or invalid date values")
         elif len(possible_date_formats) > 1:
@@ -402,46 +1690,29 @@ class QifParser(object):
         :param qdate: date string
         :return: parsed datetime object
         """
-        # manage y2k (e.g. 1/1'3 -> 1/1/2003)
-        if qdate[-2] == "'":
-            #e.g. 1/1'3
-            norm_qdate = qdate.replace("'", "/200")
-        elif qdate[-3] == "'":
-            # e.g. 1/1'12
-            norm_qdate = qdate.replace("'", "/20")
-        else:
-            # e.g. 1/1'2012
-            norm_qdate = qdate.replace("'", "/")
-
-        norm_qdate = norm_qdate.strip()
-
-        try:
-            (n1, n2, n3) = re.split(r'\W+', norm_qdate)
-        except ValueError as err:
-            raise QifParserInvalidDate("Invalid date: %s (normalized to %s): %s" % (qdate, norm_qdate, err))
-
-        try:
-            if date_format == 'dmy':
-                return datetime(int(n3), int(n2), int(n1))
-            elif date_format == 'mdy':
-                return datetime(int(n3), int(n1), int(n2))
-            elif date_format == 'ymd':
-                return datetime(int(n1), int(n2), int(n3))
-            else:
-                raise QifParserInvalidDate("unsupported date_format: %s" % date_format)
-        except ValueError as err:
-            raise QifParserInvalidDate("Invalid date: %s (splitted to (%s, %s ,%s), %s): %s" %
-                                       (qdate, n1, n2, n3, date_format, err))
+        if date_format not in DATE_FIELDS_ORDER:
+            raise QifParserInvalidDate("unsupported date_format: %s" % date_format)
+        return _decode_qif_date(qdate, DATE_FIELDS_ORDER[date_format], date_format)
 
     @classmethod
     def getNumberSamples(cls, data):
         return cls.getSamples(data, 'T')
 
     @classmethod
-    def guessNumberFormat(cls, samples):
+    def guessNumberFormat(cls, samples, max_samples=None, stop_early=False,
+                          lenient=False):
+        """
+        :param max_samples: look at no more than this number of samples
+        :param stop_early: stop as soon as only one format is left
+        :param lenient: ignore the samples fitting none of the formats left
+        """
         possible_num_sep = [('.', ''), ('.', ','), (',', ''), (',', '.')]
 
-        for sample in samples:
+        for sample in itertools.islice(samples, max_samples):
+            if lenient and not any(
+                    cls._fitsNumberFormat(sample, num_sep)
+                    for num_sep in possible_num_sep):
+                continue
             for decimal_sep, thousands_sep in possible_num_sep[:]:
                 try:
                     cls.parseQifNumber(sample, decimal_sep=decimal_sep, thousands_sep=thousands_sep)
@@ -451,6 +1722,8 @@ class QifParser(object):
                     if len(possible_num_sep) == 0:
                         raise QifParserInvalidNumber("Inconsistent or invalid number values: \
                         '%s' doesn't fit to last remaining separators: (%s %s): %s" % (sample, decimal_sep, thousands_sep, err))
+            if stop_early and len(possible_num_sep) == 1:
+                break
         if len(possible_num_sep) > 1:
             possible_decimal_seps = set([x[0] for x in possible_num_sep])
             if len(possible_decimal_seps) == 1:
@@ -463,6 +1736,15 @@ class QifParser(object):
 please specify. (possible formats: %s""" % repr(possible_num_sep))
         return possible_num_sep[0]
 
+    @classmethod
+    def _fitsNumberFormat(cls, sample, num_sep):
+        try:
+            cls.parseQifNumber(sample, decimal_sep=num_sep[0],
+                               thousands_sep=num_sep[1])
+        except (QifParserInvalidNumber, InvalidOperation):
+            return False
+        return True
+
     @classmethod
     def parseQifNumber(cls, qnumber,
                        decimal_sep=DEFAULT_DECIMAL_SEP,
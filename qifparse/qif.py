@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 import six
+import itertools
+import operator
+from collections import namedtuple
 from datetime import datetime
 from qifparse import DEFAULT_DATETIME_FORMAT
 
@@ -13,6 +16,9 @@ ACCOUNT_TYPES = [
     'Invst',
 ]
 
+# lines joined in a single write by write_blocks
+DEFAULT_WRITE_CHUNK = 1000
+
 MEMORIZED_TRANSACTION_TYPES = [
     'C',  # Check
     'D',  # Deposit
@@ -21,6 +27,15 @@ MEMORIZED_TRANSACTION_TYPES = [
     'E',  # Electronic payee
 ]
 
+# a reference of a transaction or split: field is 'to_account', 'category'
+# or 'class', name the referenced name and target the Account, Category or
+# Class with that name (None if there isn't any)
+Reference = namedtuple('Reference', 'item field name target')
+
+
+def _index(index, key, item):
+    index.setdefault(key, []).append(item)
+
 
 class Qif(object):
     def __init__(self):
@@ -30,21 +45,41 @@ class Qif(object):
         self._transactions = {}
         self._transaction_headers = []
         self._last_header = None
+        # lookup tables, filled as items are added: the name, type and
+        # flags of an item must be set before adding it
+        self._accounts_by_name = {}
+        self._accounts_by_type = {}
+        self._categories_by_name = {}
+        self._income_categories = []
+        self._expense_categories = []
+        self._classes_by_name = {}
+        # built by get_transaction_index, dropped when transactions change
+        self._transaction_index = None
+        self._transaction_index_changes = None
 
     def add_account(self, item):
         if not isinstance(item, Account):
             raise RuntimeError(six.u("item not recognized"))
         self._accounts.append(item)
+        self._transaction_index = None
+        _index(self._accounts_by_name, item.name, item)
+        _index(self._accounts_by_type, item.account_type, item)
 
     def add_category(self, item):
         if not isinstance(item, Category):
             raise RuntimeError(six.u("item not recognized"))
         self._categories.append(item)
+        _index(self._categories_by_name, item.name, item)
+        if item.income:
+            self._income_categories.append(item)
+        if item.expense:
+            self._expense_categories.append(item)
 
     def add_class(self, item):
         if not isinstance(item, Class):
             raise RuntimeError(six.u("item not recognized"))
         self._classes.append(item)
+        _index(self._classes_by_name, item.name, item)
 
     def add_transaction(self, item, header=None):
         if not isinstance(item, Transaction)\
@@ -60,17 +95,16 @@ class Qif(object):
         if not header:
             raise RuntimeError(six.u("no header provided yet"))
         self._transactions[header].append(item)
+        self._transaction_index = None
 
     def get_accounts(self, name=None, atype=None):
         if not name and not atype:
             return tuple(self._accounts)
-        res = []
-        for acc in self._accounts:
-            valid_name = (not name or acc.name == name) and True or False
-            valid_type = (not atype or acc.account_type == atype) \
-                and True or False
-            if valid_name and valid_type:
-                res.append(acc)
+        if not name:
+            return tuple(self._accounts_by_type.get(atype, ()))
+        res = self._accounts_by_name.get(name, ())
+        if atype:
+            res = [acc for acc in res if acc.account_type == atype]
         return tuple(res)
 
     def get_categories(self, name=None, income=None, expense=None):
@@ -79,22 +113,66 @@ class Qif(object):
                 six.u("item can be either income or expense, not both"))
         if not name and not income and not expense:
             return tuple(self._categories)
-        res = []
-        for cat in self._categories:
-            valid_name = (not name or cat.name == name) and True or False
-            valid_income = (not income or
-                            cat.income == income) and True or False
-            valid_expense = (not expense or
-                             cat.expense == expense) and True or False
-            if valid_name and valid_income and valid_expense:
-                res.append(cat)
+        if not name:
+            if income:
+                return tuple(self._income_categories)
+            return tuple(self._expense_categories)
+        res = self._categories_by_name.get(name, ())
+        if income:
+            res = [cat for cat in res if cat.income]
+        elif expense:
+            res = [cat for cat in res if cat.expense]
         return tuple(res)
 
     def get_classes(self, name=None):
         if not name:
             return tuple(self._classes)
-        res = [klass for klass in self._classes if klass.name == name]
-        return tuple(res)
+        return tuple(self._classes_by_name.get(name, ()))
+
+    def resolve_references(self):
+        """
+        Look up the accounts, categories and classes referenced by the
+        ``L`` and ``S`` lines of every transaction and split, each distinct
+        name being looked up once
+        :return: list of Reference, in the order of iter_transactions
+        """
+        targets = {
+            'to_account': self._accounts_by_name,
+            'category': self._categories_by_name,
+            'class': self._classes_by_name,
+        }
+        resolved = {}
+        res = []
+
+        def add(item, field, name):
+            key = (field, name)
+            try:
+                target = resolved[key]
+            except KeyError:
+                found = targets[field].get(name)
+                target = resolved[key] = found[0] if found else None
+            res.append(Reference(item, field, name, target))
+
+        for account, header, item in self.iter_transactions():
+            try:
+                splits = _get_attribute(item, '_splits')
+            except AttributeError:
+                splits = ()
+            for entry in itertools.chain((item,), splits):
+                # "category/class" or "[account]/class"
+                to_account = entry.to_account
+                if to_account:
+                    to_account, sep, klass = to_account.partition('/')
+                    add(entry, 'to_account', to_account)
+                    if klass:
+                        add(entry, 'class', klass)
+                category = getattr(entry, 'category', None)
+                if category:
+                    category, sep, klass = category.partition('/')
+                    add(entry, 'category', category)
+                    if klass:
+                        add(entry, 'class', klass)
+        return res
 
     def get_transactions(self, recursive=False):
         if not recursive:
@@ -106,26 +184,198 @@ class Qif(object):
                 tr.extend(acc._transactions.values())
             return tuple(tr)
 
-    def __str__(self):
-        res = []
+    def iter_transactions(self, recursive=True):
+        """
+        Yield ``(account, header, item)`` for every transaction, in the
+        same order as get_transactions; account is None for the
+        transactions outside accounts
+        """
+        for header in self._transaction_headers:
+            for item in self._transactions[header]:
+                yield None, header, item
+        if recursive:
+            for acc in self._accounts:
+                for header, transactions in acc._transactions.items():
+                    for item in transactions:
+                        yield acc, header, item
+
+    def get_transaction_index(self):
+        """
+        :return: the qifparse.query.TransactionIndex of the transactions,
+            built again if transactions have been added since the last call
+        """
+        from qifparse.query import TransactionIndex
+        changes = sum(acc._changes for acc in self._accounts)
+        if self._transaction_index is None or \
+                changes != self._transaction_index_changes:
+            self._transaction_index = TransactionIndex(
+                self.iter_transactions())
+            self._transaction_index_changes = changes
+        return self._transaction_index
+
+    def query(self, account=None, start=None, end=None, payee=None,
+              category=None, min_amount=None, max_amount=None):
+        """
+        Transactions matching all the given filters, in the order of
+        iter_transactions
+        :param account: account name
+        :param start: first date included
+        :param end: last date included
+        :param payee: payee, or payee prefix followed by ``*``
+        :param category: category, or category prefix followed by ``*``
+            (e.g. ``food:*``), of the transaction or of one of its splits
+        :param min_amount: lowest amount included
+        :param max_amount: highest amount included
+        """
+        index = self.get_transaction_index()
+        rows = index.rows
+        return tuple(rows[position][2] for position in index.select(
+            account, start, end, payee, category, min_amount, max_amount))
+
+    def get_totals(self, by='category', rollup=False, scale=None):
+        """
+        Total amounts of the transactions, splits counting instead of the
+        transaction they belong to, see qifparse.aggregate.totals
+        :param by: 'category', 'account', 'month' or a tuple of them
+        :param rollup: also add subcategories to their parent categories
+        """
+        from qifparse.aggregate import totals
+        return totals(self, by=by, rollup=rollup, scale=scale)
+
+    def get_columns(self, scale=None):
+        """
+        :param scale: decimals of the amounts, as many as they have if None
+        :return: the transactions as a qifparse.columnar.TransactionTable
+        """
+        from qifparse.columnar import TransactionTable
+        return TransactionTable.from_qif(self, scale=scale)
+
+    def save_snapshot(self, fh, source=None):
+        """
+        Write a binary snapshot of the object to a binary file, see
+        qifparse.snapshot
+        :param source: qifparse.snapshot.SourceKey of the parsed file
+        """
+        from qifparse import snapshot
+        snapshot.save(self, fh, source)
+
+    @classmethod
+    def load_snapshot(cls, fh, source=None):
+        """
+        Read a Qif object from a snapshot written by save_snapshot
+        :param source: if given, raise ValueError unless the snapshot has
+            been saved with this qifparse.snapshot.SourceKey
+        """
+        from qifparse import snapshot
+        return snapshot.load(fh, source)
+
+    def export(self, path, splits_path=None, format=None, **options):
+        """
+        Export the transactions by record batches to a Parquet, Arrow, CSV
+        or JSON lines file, see qifparse.export.export
+        :return: the number of transactions exported
+        """
+        from qifparse import export
+        return export.export(self, path, splits_path, format, **options)
+
+    def merge(self, other, **options):
+        """
+        Add the transactions, accounts, categories and classes of the Qif
+        object other that this one doesn't have yet, transactions being
+        compared by fingerprint, see qifparse.dedupe.merge
+        :return: MergeResult, the numbers of transactions added and dropped
+        """
+        from qifparse import dedupe
+        return dedupe.merge(self, other, **options)
+
+    def iter_blocks(self):
+        """
+        Yield the lines of the qif file as lists, one per header or entry
+        """
         if self._categories:
-            res.append('!Type:Cat')
+            yield ['!Type:Cat']
             for cat in self._categories:
-                res.append(str(cat))
+                yield cat.get_lines()
         for acc in self._accounts:
-            res.append(str(acc))
+            for block in acc.iter_blocks():
+                yield block
         if self._classes:
-            res.append('!Type:Class')
+            yield ['!Type:Class']
             for cat in self._classes:
-                res.append(str(cat))
-        if self._transactions:
-            for header in self._transaction_headers:
-                transactions = self._transactions[header]
-                res.append(header)
-                for tr in transactions:
-                    res.append(str(tr))
-        res.append('')
-        return '\n'.join(res)
+                yield cat.get_lines()
+        for header in self._transaction_headers:
+            yield [header]
+            for tr in self._transactions[header]:
+                yield tr.get_lines()
+
+    def dump_iter(self):
+        """
+        Yield the lines of the qif file, without line separators
+        """
+        return itertools.chain.from_iterable(self.iter_blocks())
+
+    def write(self, fp, chunk_size=DEFAULT_WRITE_CHUNK):
+        """
+        Write the qif file to a text file object, about chunk_size lines
+        at a time
+        """
+        write_blocks(fp, self.iter_blocks(), chunk_size)
+
+    def __str__(self):
+        out = six.StringIO()
+        self.write(out)
+        return out.getvalue()
+
+
+def write_blocks(fp, blocks, chunk_size=DEFAULT_WRITE_CHUNK):
+    """
+    Write lists of lines to a text file object, each line followed by a new
+    line, joining them by chunks of about chunk_size lines
+    """
+    chunk = []
+    for block in blocks:
+        chunk.extend(block)
+        if len(chunk) >= chunk_size:
+            chunk.append('')
+            fp.write('\n'.join(chunk))
+            chunk = []
+    if chunk:
+        chunk.append('')
+        fp.write('\n'.join(chunk))
+
+
+def iter_record_blocks(records):
+    """
+    Yield the lines of a qif file made of records as lists, without
+    building the Qif object: headers are written when they change.
+    :param records: iterable of ``(rtype, header, account, item)`` tuples,
+        as produced by ``QifParser.iter_records(..., context=True)``
+    """
+    last_header = None
+    for rtype, header, account, item in records:
+        if isinstance(item, Account):
+            header = '!Account'
+            yield item.get_lines(transactions=False)
+        else:
+            if header != last_header:
+                yield [header]
+            yield item.get_lines()
+        last_header = header
+
+
+def dump_records(records):
+    """
+    Yield the lines of a qif file made of records, see iter_record_blocks
+    """
+    return itertools.chain.from_iterable(iter_record_blocks(records))
+
+
+def write_records(fp, records, chunk_size=DEFAULT_WRITE_CHUNK):
+    """
+    Write records to a text file object as they come, see
+    iter_record_blocks
+    """
+    write_blocks(fp, iter_record_blocks(records), chunk_size)
 
 
 class Field(object):
@@ -139,52 +389,182 @@ class Field(object):
         self.custom_print_format = custom_print_format
 
 
+# number of formatted dates kept by format_date
+DATE_CACHE_SIZE = 4096
+_date_strings = {}
+
+
+def format_date(value, date_format):
+    """
+    value.strftime(date_format), remembering the last results
+    """
+    key = (value, date_format)
+    try:
+        return _date_strings[key]
+    except KeyError:
+        if len(_date_strings) >= DATE_CACHE_SIZE:
+            _date_strings.clear()
+        res = _date_strings[key] = value.strftime(date_format)
+        return res
+
+
+def _escape(letter):
+    return letter.replace('%', '%%')
+
+
+# how build_serializer writes the value of a field: a line formatted from
+# the value alone, a line per item, a date, the letter alone, or a custom
+# format of the letter and the value
+_LINE, _LINES, _DATE, _FLAG, _CUSTOM = range(5)
+
+_LINE_FORMATS = {
+    'string': '%s',
+    'float': '%.2f',
+    'integer': '%d',
+    'reference': '[%s]',
+}
+
+
+def build_serializer(entry_class):
+    """
+    Build the function returning the list of the lines of an entry of
+    entry_class, from a tuple of ``(kind, line format, letter)`` computed
+    once per field of its ``_fields``
+    """
+    steps = []
+    for field in entry_class._fields:
+        letter = field.first_letter
+        if field.custom_print_format:
+            kind, line_format = _CUSTOM, field.custom_print_format
+        elif field.ftype == 'multilinestring':
+            kind, line_format = _LINES, _escape(letter) + '%s'
+        elif field.ftype == 'datetime':
+            kind, line_format = _DATE, letter
+        elif field.ftype == 'boolean':
+            kind, line_format = _FLAG, letter
+        else:
+            kind = _LINE
+            line_format = _escape(letter) + _LINE_FORMATS[field.ftype]
+        steps.append((kind, line_format, letter))
+    steps = tuple(steps)
+    names = [field.name for field in entry_class._fields]
+    required = [index for index, field in enumerate(entry_class._fields)
+                if field.required]
+    if len(names) > 1:
+        values = operator.attrgetter(*names)
+    else:
+        def values(entry):
+            return tuple(getattr(entry, name) for name in names)
+    terminated = not entry_class._sub_entry
+    compress = itertools.compress
+
+    def get_lines(self):
+        vals = values(self)
+        for index in required:
+            if not vals[index]:
+                raise RuntimeError(six.u("required field '%s' not yet set"
+                                         % names[index]))
+        res = []
+        append = res.append
+        # only the fields set, the others being skipped by compress
+        for (kind, line_format, letter), val in compress(zip(steps, vals),
+                                                         vals):
+            if kind is _LINE:
+                append(line_format % (val,))
+            elif kind is _DATE:
+                append(line_format + format_date(val, self.date_format))
+            elif kind is _LINES:
+                for line in val:
+                    append(line_format % (line,))
+            elif kind is _FLAG:
+                append(line_format)
+            else:
+                append(line_format % (letter, val))
+        if terminated:
+            append('^')
+        return res
+    return get_lines
+
+
+_get_attribute = object.__getattribute__
+
+
+def _field_names(fields):
+    return tuple(field.name for field in fields)
+
+
 class BaseEntry(object):
+    # Entries store only the fields that have been set: the others fall
+    # back to their default through __getattr__. Transactions, investments
+    # and splits, which come in large numbers, also use __slots__.
+    __slots__ = ('date_format',)
 
     _fields = []
     _sub_entry = False
+    _split_class = None
+    _field_defaults = {}
 
     def __init__(self, **kwargs):
-        self.date_format = DEFAULT_DATETIME_FORMAT
-        for field in self._fields:
-            val = kwargs.get(field.name, field.default)
-            setattr(self, field.name, val)
+        if kwargs:
+            for field in self._fields:
+                if field.name in kwargs:
+                    setattr(self, field.name, kwargs[field.name])
+
+    @classmethod
+    def _defaults(cls):
+        defaults = cls.__dict__.get('_field_defaults')
+        if defaults is None:
+            defaults = dict((field.name, field.default)
+                            for field in cls._fields)
+            defaults['date_format'] = DEFAULT_DATETIME_FORMAT
+            cls._field_defaults = defaults
+        return defaults
+
+    def __getattr__(self, name):
+        # _field_defaults is computed below for the classes of this module
+        try:
+            return self._field_defaults[name]
+        except KeyError:
+            pass
+        try:
+            return self._defaults()[name]
+        except KeyError:
+            raise AttributeError("'%s' object has no attribute '%s'" %
+                                 (type(self).__name__, name))
+
+    @classmethod
+    def _serializer(cls):
+        serializer = cls.__dict__.get('_field_serializer')
+        if serializer is None:
+            serializer = cls._field_serializer = build_serializer(cls)
+        return serializer
+
+    def get_lines(self):
+        """
+        :return: list of the lines of the entry, without line separators
+        """
+        return self._serializer()(self)
 
     def __str__(self):
-        res = []
-        for field in self._fields:
-            val = getattr(self, field.name)
-            if not field.required and not val:
-                continue
-            elif field.required and not val:
-                raise RuntimeError(
-                    six.u("required field '%s' not yet set" % field.name))
-            if field.custom_print_format:
-                cformat = field.custom_print_format
-                res.append(cformat % (field.first_letter, val))
-            elif field.ftype == 'string':
-                res.append('%s%s' % (field.first_letter, val))
-            elif field.ftype == 'multilinestring':
-                for line in val:
-                    res.append('%s%s' % (field.first_letter, line))
-            elif field.ftype == 'float':
-                res.append('%s%.2f' % (field.first_letter, val))
-            elif field.ftype == 'integer':
-                res.append('%s%d' % (field.first_letter, val))
-            elif field.ftype == 'datetime':
-                sdate = val.strftime(self.date_format)
-                res.append('%s%s' % (field.first_letter, sdate))
-            elif field.ftype == 'reference':
-                res.append('%s[%s]' % (field.first_letter, val))
-            elif field.ftype == 'boolean':
-                res.append('%s' % field.first_letter)
-        if not self._sub_entry:
-            res.append('^')
-        return '\n'.join(res)
+        return '\n'.join(self.get_lines())
+
+
+class AmountSplit(BaseEntry):
+    _fields = [
+        Field('category', 'string', 'S'),
+        Field('to_account', 'reference', 'S'),
+        Field('amount', 'float', '$'),
+        Field('percent', 'string', '%'),
+        Field('address', 'multilinestring', 'A'),
+        Field('memo', 'string', 'E'),
+    ]
+    __slots__ = _field_names(_fields)
+    _sub_entry = True
 
 
 class Transaction(BaseEntry):
     _sub_entry = True
+    _split_class = AmountSplit
     _fields = [
         Field('date', 'datetime', 'D', required=True, default=datetime.now()),
         Field('num', 'string', 'N'),
@@ -198,19 +578,31 @@ class Transaction(BaseEntry):
         Field('small_business_expense', 'boolean', 'X'),
         Field('to_account', 'reference', 'L'),
     ]
-
-    def __init__(self, **kwargs):
-        super(Transaction, self).__init__(**kwargs)
-        self.splits = []
-
-    def __str__(self):
-        res = []
-        fields = super(Transaction, self).__str__()
-        res.append(fields)
-        for split in self.splits:
-            res.append(str(split))
+    __slots__ = _field_names(_fields) + ('_splits',)
+
+    def get_splits(self):
+        # the list is only created when needed
+        try:
+            return self._splits
+        except AttributeError:
+            self._splits = []
+            return self._splits
+
+    def set_splits(self, splits):
+        self._splits = splits
+
+    splits = property(get_splits, set_splits)
+
+    def get_lines(self):
+        res = super(Transaction, self).get_lines()
+        try:
+            splits = _get_attribute(self, '_splits')
+        except AttributeError:
+            splits = ()
+        for split in splits:
+            res.extend(split.get_lines())
         res.append('^')
-        return '\n'.join(res)
+        return res
 
 
 class MemorizedTransaction(Transaction):
@@ -226,6 +618,10 @@ class MemorizedTransaction(Transaction):
         Field('current_loan_balance', 'string', '6'),
         Field('original_loan_amount', 'string', '7'),
     ])
+    __slots__ = _field_names(
+        field for field in _fields
+        if field.name not in Transaction.__slots__ + ('mtype',)) + \
+        ('_mtype',)
 
     def set_mtype(self, type):
         if type and type not in MEMORIZED_TRANSACTION_TYPES:
@@ -239,18 +635,6 @@ class MemorizedTransaction(Transaction):
     mtype = property(get_mtype, set_mtype)
 
 
-class AmountSplit(BaseEntry):
-    _fields = [
-        Field('category', 'string', 'S'),
-        Field('to_account', 'reference', 'S'),
-        Field('amount', 'float', '$'),
-        Field('percent', 'string', '%'),
-        Field('address', 'multilinestring', 'A'),
-        Field('memo', 'string', 'M'),
-    ]
-    _sub_entry = True
-
-
 class Investment(BaseEntry):
     _fields = [
         Field('date', 'datetime', 'D', required=True, default=datetime.now()),
@@ -266,6 +650,7 @@ class Investment(BaseEntry):
         Field('amount_transfer', 'float', '$'),
         Field('commission', 'float', 'O'),
     ]
+    __slots__ = _field_names(_fields)
 
 
 class Account(BaseEntry):
@@ -282,6 +667,8 @@ class Account(BaseEntry):
         super(Account, self).__init__(**kwargs)
         self._transactions = {}
         self._last_header = None
+        # number of transactions added, see Qif.get_transaction_index
+        self._changes = 0
 
     def add_transaction(self, item, header=None):
         if not isinstance(item, Transaction) and \
@@ -297,6 +684,7 @@ class Account(BaseEntry):
         if not header:
             raise RuntimeError(six.u("no header provided yet"))
         self._transactions[header].append(item)
+        self._changes += 1
 
     def set_type(self, type):
         if type and type not in ACCOUNT_TYPES:
@@ -312,18 +700,27 @@ class Account(BaseEntry):
     def get_transactions(self):
         return tuple(self._transactions.values())
 
-    def __str__(self):
-        res = []
-        res.append('!Account')
-        fields = super(Account, self).__str__()
-        res.append(fields)
-        if self._transactions:
-            for header in self._transactions.keys():
-                transactions = self._transactions[header]
+    def iter_blocks(self, transactions=True):
+        """
+        Yield the lines of the account as lists, one per header or entry
+        :param transactions: also yield the transactions of the account
+        """
+        yield self.get_lines(transactions=False)
+        if transactions:
+            for header, items in self._transactions.items():
+                yield [header]
+                for tr in items:
+                    yield tr.get_lines()
+
+    def get_lines(self, transactions=True):
+        res = ['!Account']
+        res.extend(super(Account, self).get_lines())
+        if transactions:
+            for header, items in self._transactions.items():
                 res.append(header)
-                for tr in transactions:
-                    res.append(str(tr))
-        return '\n'.join(res)
+                for tr in items:
+                    res.extend(tr.get_lines())
+        return res
 
 
 class Category(BaseEntry):
@@ -343,3 +740,76 @@ class Class(BaseEntry):
         Field('name', 'string', 'N', required=True),
         Field('description', 'string', 'D'),
     ]
+
+
+for _entry_class in (AmountSplit, Transaction, MemorizedTransaction,
+                     Investment, Account, Category, Class):
+    _entry_class._defaults()
+
+
+class LazyFields(object):
+    """
+    Base of the lazy entry classes (see lazy_class): the text of the date and
+    number fields is kept in ``_raw`` as read and decoded by the functions
+    of ``_decode`` on first access, the decoded value being stored instead.
+    A value that can't be decoded raises the exception of the decoder when
+    accessed.
+    """
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        try:
+            raw = _get_attribute(self, '_raw')
+            value = raw[name]
+        except (AttributeError, KeyError):
+            return super(LazyFields, self).__getattr__(name)
+        value = _get_attribute(self, '_decode')[name](value)
+        setattr(self, name, value)
+        del raw[name]
+        return value
+
+    def decode(self):
+        """
+        Decode all the fields still raw
+        """
+        for name in list(self._raw):
+            getattr(self, name)
+
+    def __reduce__(self):
+        # pickled decoded, as an entry of the eager class: the lazy class
+        # can't be looked up by its name and the decoders are closures
+        self.decode()
+        cls = self._eager_class
+        slots = {}
+        for klass in cls.__mro__:
+            for name in klass.__dict__.get('__slots__', ()):
+                try:
+                    slots[name] = _get_attribute(self, name)
+                except AttributeError:
+                    pass
+        return _new_entry, (cls,), (getattr(self, '__dict__', None), slots)
+
+
+def _new_entry(cls):
+    return cls.__new__(cls)
+
+
+_lazy_classes = {}
+
+
+def lazy_class(entry_class):
+    """
+    :return: the subclass of entry_class decoding its date and number fields
+        on first access, with the same name
+    """
+    try:
+        return _lazy_classes[entry_class]
+    except KeyError:
+        pass
+    lazy = _lazy_classes[entry_class] = type(
+        entry_class.__name__, (LazyFields, entry_class), {
+            '__slots__': ('_raw', '_decode'),
+            '__module__': entry_class.__module__,
+            '_eager_class': entry_class,
+        })
+    return lazy
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Indexes over the transactions of a Qif object, to select transactions by
+account, date, payee, category and amount without scanning all of them.
+
+The indexes are built on first use and thrown away by the Qif object when
+transactions or accounts are added.
+"""
+from bisect import bisect_left, bisect_right
+
+
+class SortedIndex(object):
+    """
+    Positions of the rows sorted by a key, for range lookups; rows without
+    a key are left out
+    """
+
+    def __init__(self, keys):
+        pairs = sorted((key, position) for position, key in enumerate(keys)
+                       if key is not None)
+        self.keys = [key for key, position in pairs]
+        self.positions = [position for key, position in pairs]
+
+    def range(self, low=None, high=None):
+        """
+        :return: positions of the rows with low <= key <= high
+        """
+        start = 0 if low is None else bisect_left(self.keys, low)
+        end = len(self.keys) if high is None else \
+            bisect_right(self.keys, high)
+        return self.positions[start:end]
+
+
+class InvertedIndex(object):
+    """
+    Positions of the rows by value, a row having any number of values
+    """
+
+    def __init__(self, values):
+        self.rows = {}
+        for position, row_values in enumerate(values):
+            for value in row_values:
+                positions = self.rows.setdefault(value, [])
+                # a row can have the same value twice (e.g. in its splits)
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+        self._sorted_values = None
+
+    def get(self, value):
+        """
+        :param value: exact value, or prefix followed by ``*``
+        :return: positions of the rows having value
+        """
+        if not value.endswith('*'):
+            return self.rows.get(value, [])
+        prefix = value[:-1]
+        if self._sorted_values is None:
+            self._sorted_values = sorted(self.rows)
+        values = self._sorted_values
+        res = []
+        for index in range(bisect_left(values, prefix), len(values)):
+            if not values[index].startswith(prefix):
+                break
+            res.extend(self.rows[values[index]])
+        return res
+
+
+def _ordinal(value):
+    return value.toordinal() if value is not None else None
+
+
+def _categories(item):
+    """
+    Categories of a transaction and of its splits
+    """
+    category = getattr(item, 'category', None)
+    if category:
+        yield category
+    for split in getattr(item, '_splits', ()):
+        if split.category:
+            yield split.category
+
+
+class TransactionIndex(object):
+    """
+    Indexes over the ``(account, header, item)`` rows of
+    Qif.iter_transactions, each built on first use
+    """
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self._indexes = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def index(self, name):
+        try:
+            return self._indexes[name]
+        except KeyError:
+            pass
+        items = [item for account, header, item in self.rows]
+        if name == 'date':
+            index = SortedIndex(_ordinal(getattr(item, 'date', None))
+                                for item in items)
+        elif name == 'amount':
+            index = SortedIndex(item.amount for item in items)
+        elif name == 'account':
+            index = InvertedIndex(
+                (account.name,) if account is not None else ()
+                for account, header, item in self.rows)
+        elif name == 'payee':
+            index = InvertedIndex(
+                (item.payee,) if getattr(item, 'payee', None) else ()
+                for item in items)
+        elif name == 'category':
+            index = InvertedIndex(_categories(item) for item in items)
+        else:
+            raise ValueError("no index on %s" % name)
+        self._indexes[name] = index
+        return index
+
+    def select(self, account=None, start=None, end=None, payee=None,
+               category=None, min_amount=None, max_amount=None):
+        """
+        Positions of the rows matching all the given filters, in order
+        :param account: account name
+        :param start: first date included
+        :param end: last date included
+        :param payee: payee, or payee prefix followed by ``*``
+        :param category: category, or category prefix followed by ``*``
+            (e.g. ``food:*``), of the transaction or of one of its splits
+        :param min_amount: lowest amount included
+        :param max_amount: highest amount included
+        """
+        candidates = []
+        if account is not None:
+            candidates.append(self.index('account').get(account))
+        if start is not None or end is not None:
+            candidates.append(self.index('date').range(
+                _ordinal(start), _ordinal(end)))
+        if payee is not None:
+            candidates.append(self.index('payee').get(payee))
+        if category is not None:
+            candidates.append(self.index('category').get(category))
+        if min_amount is not None or max_amount is not None:
+            candidates.append(self.index('amount').range(
+                min_amount, max_amount))
+        if not candidates:
+            return list(range(len(self.rows)))
+        candidates.sort(key=len)
+        res = set(candidates[0])
+        for positions in candidates[1:]:
+            if not res:
+                break
+            res.intersection_update(positions)
+        return sorted(res)
@@ -0,0 +1,611 @@
+# -*- coding: utf-8 -*-
+"""
+Binary snapshots of Qif objects, to load a parsed file again much faster
+than parsing it.
+
+The entries of each class are stored by columns, one per attribute:
+strings as ids into a pool of interned strings, decimals as scaled
+integers, dates as ordinals and booleans as bytes, each in a typed array.
+Other values are stored as JSON, the types JSON lacks (decimals, dates,
+lists) being tagged: loading a snapshot never runs code, whoever wrote it.
+A snapshot can record the key of the file it has been parsed from (size, modification time and hash of the content, and
+the parsing options), so that it is used only as long as the file hasn't
+changed.
+
+Layout: ``MAGIC``, the length and the CRC-32 of the header as 4 bytes
+little endian integers, the header as JSON, then the arrays the header
+refers to. The header records the size and the CRC-32 of the arrays, so
+that truncated or corrupt snapshots are refused with a ValueError.
+"""
+import hashlib
+import gc
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import deque, namedtuple
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation
+from itertools import compress, count, repeat
+from operator import attrgetter, is_not, methodcaller
+
+import six
+
+from qifparse.qif import (
+    Qif,
+    Transaction,
+    MemorizedTransaction,
+    AmountSplit,
+    Account,
+    Investment,
+    Category,
+    Class,
+    LazyFields,
+    _get_attribute,
+)
+
+MAGIC = b'QIFSNAP\x00'
+SNAPSHOT_VERSION = 3
+
+# order in which the tables are written and read back
+ENTRY_CLASSES = (Account, Category, Class, Transaction, MemorizedTransaction,
+                 Investment, AmountSplit)
+_CLASSES_BY_NAME = dict((cls.__name__, cls) for cls in ENTRY_CLASSES)
+# attributes holding the structure of the Qif object, not values
+_STRUCTURE_ATTRIBUTES = ('_transactions', '_splits')
+
+_INT64 = 1 << 63
+_MIDNIGHT = time()
+_DIGEST_BLOCK = 1 << 20
+
+# errors raised decoding a snapshot whose header is damaged
+_DECODE_ERRORS = (LookupError, TypeError, AttributeError, EOFError,
+                  struct.error, InvalidOperation)
+
+# size in bytes and modification time of a file, hash of its content and
+# the options it has been parsed with
+SourceKey = namedtuple('SourceKey', 'size mtime digest options')
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(_DIGEST_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _options(options):
+    # as read back from JSON, e.g. tuples as lists
+    return json.loads(json.dumps(options))
+
+
+def source_key(path, **options):
+    """
+    :param options: the options the file is parsed with, e.g.
+        ``date_format``
+    :return: the SourceKey of the file at path
+    """
+    stat = os.stat(path)
+    return SourceKey(stat.st_size, stat.st_mtime, file_digest(path),
+                     _options(options))
+
+
+def matches(key, path, verify=True, **options):
+    """
+    Tell if the snapshot with the given SourceKey is the one of the file at
+    path parsed with options
+    :param verify: check the hash of the content when the size and the
+        modification time match, instead of trusting them
+    """
+    if key is None:
+        return False
+    try:
+        stat = os.stat(path)
+    except EnvironmentError:
+        return False
+    if stat.st_size != key.size or _options(options) != key.options:
+        return False
+    if stat.st_mtime == key.mtime and not verify:
+        return True
+    return file_digest(path) == key.digest
+
+
+def _storage_names(cls):
+    """
+    Names of the slots of an entry class, holding the field values
+    """
+    names = []
+    for klass in reversed(cls.__mro__):
+        for name in klass.__dict__.get('__slots__', ()):
+            if name not in _STRUCTURE_ATTRIBUTES and name not in names:
+                names.append(name)
+    return names
+
+
+def _slot_column(cls, items, name):
+    """
+    :return: ``(rows, values)``: the positions of the items having the
+        slot set and its values
+    """
+    defaults = cls._defaults()
+    if name in defaults:
+        # an unset slot falls back to the default, so does a slot set to it
+        default = defaults[name]
+        values = list(map(attrgetter(name), items))
+        rows = list(compress(count(),
+                             map(is_not, values, repeat(default))))
+        if len(rows) < len(values):
+            values = list(map(values.__getitem__, rows))
+        else:
+            rows = None
+        return rows, values
+    get = getattr(cls, name).__get__
+    rows = []
+    values = []
+    for row, item in enumerate(items):
+        try:
+            value = get(item)
+        except AttributeError:
+            continue
+        rows.append(row)
+        values.append(value)
+    return rows if len(rows) < len(items) else None, values
+
+
+def _dict_columns(items):
+    """
+    :return: list of ``(name, rows, values)`` for the attributes of the
+        __dict__ of the items
+    """
+    columns = {}
+    order = []
+    for row, item in enumerate(items):
+        for name, value in item.__dict__.items():
+            if name in _STRUCTURE_ATTRIBUTES:
+                continue
+            if name not in columns:
+                columns[name] = ([], [])
+                order.append(name)
+            rows, values = columns[name]
+            rows.append(row)
+            values.append(value)
+    res = []
+    for name in order:
+        rows, values = columns[name]
+        res.append((name, rows if len(rows) < len(items) else None, values))
+    return res
+
+
+def _to_json(value):
+    """
+    :return: value as JSON data, values of the types JSON lacks being
+        ``[tag, data]`` lists
+    :raise ValueError: for values of other types
+    """
+    if value is None or isinstance(
+            value, (bool, float, six.text_type) + six.integer_types):
+        return value
+    if isinstance(value, Decimal):
+        return ['decimal', str(value)]
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            raise ValueError("can't store datetimes with a time zone: %r" %
+                             value)
+        return ['datetime', [value.year, value.month, value.day, value.hour,
+                             value.minute, value.second, value.microsecond]]
+    if isinstance(value, date):
+        return ['date', value.toordinal()]
+    if isinstance(value, list):
+        return ['list', list(map(_to_json, value))]
+    raise ValueError("can't store values of type %s in a snapshot" %
+                     type(value).__name__)
+
+
+_JSON_TAGS = {
+    'decimal': Decimal,
+    'datetime': lambda fields: datetime(*fields),
+    'date': date.fromordinal,
+    'list': lambda items: list(map(_from_json, items)),
+}
+
+
+def _from_json(data):
+    """
+    Value written by _to_json
+    """
+    if isinstance(data, list):
+        tag, value = data
+        return _JSON_TAGS[tag](value)
+    return data
+
+
+class _Writer(object):
+    """
+    Arrays and interned strings of a snapshot being written
+    """
+
+    def __init__(self):
+        self.blobs = []
+        self.strings = {}
+
+    def add(self, data):
+        """
+        :param data: an array, or bytes
+        :return: the position of data in the blobs
+        """
+        self.blobs.append(data)
+        return len(self.blobs) - 1
+
+    def string_ids(self, values):
+        ids = self.strings
+        for value in dict.fromkeys(values):
+            if value not in ids:
+                if '\x00' in value:
+                    raise ValueError("can't store strings holding NUL "
+                                     "characters: %r" % value)
+                ids[value] = len(ids)
+        return array('i', map(ids.__getitem__, values))
+
+    def encode(self, values):
+        """
+        :return: the description of a column holding values
+        """
+        types = set(map(type, values))
+        if types <= set([six.text_type]):
+            return {'kind': 'string', 'ids': self.add(self.string_ids(values))}
+        if types == set([bool]):
+            return {'kind': 'bool', 'values': self.add(array('b', values))}
+        if types <= set(six.integer_types) and \
+                all(-_INT64 <= value < _INT64 for value in values):
+            return {'kind': 'int', 'values': self.add(array('q', values))}
+        if types == set([Decimal]):
+            column = self.encode_decimals(values)
+            if column is not None:
+                return column
+        if types == set([datetime]) and all(
+                value.time() == _MIDNIGHT and value.tzinfo is None
+                for value in values):
+            return {'kind': 'date', 'values': self.add(
+                array('i', [value.toordinal() for value in values]))}
+        if types == set([list]) and all(values) and all(
+                isinstance(line, six.text_type) and '\n' not in line
+                for value in values for line in value):
+            return {'kind': 'lines', 'ids': self.add(self.string_ids(
+                ['\n'.join(value) for value in values]))}
+        return {'kind': 'json', 'values': self.add(json.dumps(
+            list(map(_to_json, values)), separators=(',', ':'))
+            .encode('utf-8'))}
+
+    def encode_decimals(self, values):
+        """
+        Decimals as integers scaled by a power of ten, shared by the column
+        if they all have the same exponent
+        :return: the description of the column, None if some values can't
+            be stored as scaled 64 bits integers
+        """
+        exponents = list(map(attrgetter('exponent'),
+                             map(methodcaller('as_tuple'), values)))
+        distinct = set(exponents)
+        # 'n', 'N' or 'F' for NaN and infinity
+        if not all(isinstance(exponent, six.integer_types) and
+                   -128 <= exponent < 128 for exponent in distinct):
+            return None
+        # -0 would come back as 0
+        if any(value.is_signed() for value in values if not value):
+            return None
+        if len(distinct) == 1:
+            scaled = list(map(int, map(methodcaller('scaleb', -exponents[0]),
+                                       values)))
+        else:
+            scaled = [int(value.scaleb(-exponent))
+                      for value, exponent in zip(values, exponents)]
+        if scaled and not -_INT64 <= min(scaled) <= max(scaled) < _INT64:
+            return None
+        scaled = array('q', scaled)
+        exponents = array('b', exponents)
+        column = {'kind': 'decimal', 'values': self.add(scaled)}
+        if exponents and exponents.count(exponents[0]) == len(exponents):
+            column['exponent'] = exponents[0]
+        else:
+            column['exponents'] = self.add(exponents)
+        return column
+
+    def table(self, cls, items):
+        if '__slots__' not in cls.__dict__:
+            # the raw fields of lazy entries are not in their __dict__ yet
+            for item in items:
+                if isinstance(item, LazyFields):
+                    item.decode()
+        columns = [(name,) + _slot_column(cls, items, name)
+                   for name in _storage_names(cls)]
+        if '__slots__' not in cls.__dict__:
+            columns.extend(_dict_columns(items))
+        res = []
+        for name, rows, values in columns:
+            if not values:
+                continue
+            column = self.encode(values)
+            column['name'] = name
+            if rows is not None:
+                column['rows'] = self.add(array('i', rows))
+            res.append(column)
+        return {'count': len(items), 'columns': res}
+
+
+def save(qif_obj, fh, source=None):
+    """
+    Write a snapshot of a Qif object to a binary file
+    :param source: SourceKey of the file the object has been parsed from
+    """
+    tables = dict((cls, []) for cls in ENTRY_CLASSES)
+    groups = []
+    positions = {}
+    for position, acc in enumerate(qif_obj._accounts):
+        tables[Account].append(acc)
+        positions[id(acc)] = position
+    tables[Category].extend(qif_obj._categories)
+    tables[Class].extend(qif_obj._classes)
+    owned = [(-1, header, qif_obj._transactions[header])
+             for header in qif_obj._transaction_headers]
+    for acc in qif_obj._accounts:
+        owned.extend((positions[id(acc)], header, items)
+                     for header, items in acc._transactions.items())
+    for owner, header, items in owned:
+        # a list can hold entries of several classes
+        for item in items:
+            # lazy entries are stored as the class they derive from
+            cls = getattr(type(item), '_eager_class', type(item))
+            if cls not in tables or cls in (Account, Category, Class):
+                raise ValueError("can't store transactions of type %s" %
+                                 cls.__name__)
+            if groups and groups[-1][:3] == [owner, header, cls.__name__]:
+                groups[-1][3] += 1
+            else:
+                groups.append([owner, header, cls.__name__, 1])
+            tables[cls].append(item)
+    writer = _Writer()
+    header = {
+        'version': SNAPSHOT_VERSION,
+        'byteorder': sys.byteorder,
+        'source': source._asdict() if source is not None else None,
+        'groups': groups,
+        'last_header': qif_obj._last_header,
+        'tables': {},
+    }
+    for cls in ENTRY_CLASSES:
+        items = tables[cls]
+        table = header['tables'][cls.__name__] = writer.table(cls, items)
+        if cls._split_class is None:
+            continue
+        split_rows = array('i')
+        split_counts = array('i')
+        for row, item in enumerate(items):
+            try:
+                item_splits = _get_attribute(item, '_splits')
+            except AttributeError:
+                continue
+            if item_splits:
+                split_rows.append(row)
+                split_counts.append(len(item_splits))
+                tables[cls._split_class].extend(item_splits)
+        table['split_rows'] = writer.add(split_rows)
+        table['split_counts'] = writer.add(split_counts)
+    strings = sorted(writer.strings, key=writer.strings.get)
+    header['strings'] = writer.add('\x00'.join(strings).encode('utf-8'))
+    header['string_count'] = len(strings)
+    offset = 0
+    crc = 0
+    blobs = []
+    for index, blob in enumerate(writer.blobs):
+        typecode = 'bytes'
+        if isinstance(blob, array):
+            typecode = blob.typecode
+            blob = writer.blobs[index] = blob.tobytes()
+        blobs.append((typecode, offset, len(blob)))
+        offset += len(blob)
+        crc = zlib.crc32(blob, crc)
+    header['blobs'] = blobs
+    header['size'] = offset
+    header['crc32'] = crc & 0xffffffff
+    encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    fh.write(MAGIC)
+    fh.write(struct.pack('<II', len(encoded),
+                         zlib.crc32(encoded) & 0xffffffff))
+    fh.write(encoded)
+    for blob in writer.blobs:
+        fh.write(blob)
+
+
+def _read_header(fh):
+    if fh.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a qif snapshot")
+    data = fh.read(8)
+    if len(data) < 8:
+        raise ValueError("truncated qif snapshot")
+    size, crc = struct.unpack('<II', data)
+    data = fh.read(size)
+    if len(data) < size:
+        raise ValueError("truncated qif snapshot")
+    if zlib.crc32(data) & 0xffffffff != crc:
+        raise ValueError("corrupt qif snapshot: wrong header checksum")
+    header = json.loads(data.decode('utf-8'))
+    if not isinstance(header, dict):
+        raise ValueError("corrupt qif snapshot")
+    if header.get('version') != SNAPSHOT_VERSION:
+        raise ValueError("unsupported snapshot version: %r" %
+                         header.get('version'))
+    return header
+
+
+def _check_data(header, data):
+    """
+    Raise ValueError unless data are the arrays described by header
+    """
+    if len(data) != header['size']:
+        raise ValueError("truncated or corrupt qif snapshot: %d bytes of "
+                         "arrays instead of %d" % (len(data), header['size']))
+    if zlib.crc32(data) & 0xffffffff != header['crc32']:
+        raise ValueError("corrupt qif snapshot: wrong checksum")
+
+
+def _source(header):
+    try:
+        source = header['source']
+        return SourceKey(**source) if source is not None else None
+    except _DECODE_ERRORS as exc:
+        raise ValueError("corrupt qif snapshot: %r" % exc)
+
+
+def read_source(fh):
+    """
+    :return: the SourceKey stored in a snapshot, None if there isn't any,
+        reading only the header
+    """
+    return _source(_read_header(fh))
+
+
+class _Reader(object):
+    """
+    Arrays and interned strings of a snapshot being read
+    """
+
+    def __init__(self, header, data):
+        self.data = data
+        self.blobs = header['blobs']
+        self.swap = header['byteorder'] != sys.byteorder
+        self.strings = self.blob(header['strings']).decode('utf-8') \
+            .split('\x00') if header['string_count'] else []
+
+    def blob(self, index):
+        typecode, offset, size = self.blobs[index]
+        data = self.data[offset:offset + size]
+        if typecode == 'bytes':
+            return data
+        res = array(str(typecode))
+        res.frombytes(data)
+        if self.swap:
+            res.byteswap()
+        return res
+
+    def decode(self, column):
+        kind = column['kind']
+        if kind == 'string':
+            return list(map(self.strings.__getitem__,
+                            self.blob(column['ids'])))
+        if kind == 'lines':
+            strings = self.strings
+            return [strings[ident].split('\n')
+                    for ident in self.blob(column['ids'])]
+        if kind == 'json':
+            return list(map(_from_json, json.loads(
+                self.blob(column['values']).decode('utf-8'))))
+        values = self.blob(column['values'])
+        if kind == 'bool':
+            return list(map(bool, values))
+        if kind == 'int':
+            return values.tolist()
+        if kind == 'date':
+            # the same datetime object for the same day, as when parsing
+            days = dict((ordinal, datetime.fromordinal(ordinal))
+                        for ordinal in set(values))
+            return list(map(days.__getitem__, values))
+        if kind == 'decimal':
+            if 'exponent' in column:
+                decimals = map(Decimal, values)
+                if column['exponent']:
+                    decimals = map(methodcaller('scaleb', column['exponent']),
+                                   decimals)
+                return list(decimals)
+            return [Decimal(value).scaleb(exponent) for value, exponent
+                    in zip(values, self.blob(column['exponents']))]
+        raise ValueError("unknown column kind: %s" % kind)
+
+    def table(self, cls, table):
+        count = table['count']
+        slotted = '__slots__' in cls.__dict__
+        if slotted:
+            new = object.__new__
+            items = list(map(new, repeat(cls, count)))
+        else:
+            items = [cls() for row in range(count)]
+        slots = _storage_names(cls)
+        for column in table['columns']:
+            name = column['name']
+            values = self.decode(column)
+            targets = items
+            if 'rows' in column:
+                targets = map(items.__getitem__, self.blob(column['rows']))
+            if name in slots:
+                deque(map(getattr(cls, name).__set__, targets, values), 0)
+            else:
+                for item, value in zip(targets, values):
+                    item.__dict__[name] = value
+        return items
+
+
+def load(fh, source=None):
+    """
+    Read a Qif object from a snapshot written by save()
+    :param source: if given, raise ValueError unless the snapshot has been
+        saved with this SourceKey
+    :return: the Qif object
+    """
+    header = _read_header(fh)
+    try:
+        if source is not None and _source(header) != source:
+            raise ValueError("the snapshot is not the one of the source")
+        data = fh.read()
+        _check_data(header, data)
+        reader = _Reader(header, data)
+        # entries don't make reference cycles: don't look for some while
+        # creating them by the million
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return _build(header, reader)
+        finally:
+            if enabled:
+                gc.enable()
+    except _DECODE_ERRORS as exc:
+        raise ValueError("corrupt qif snapshot: %r" % exc)
+
+
+def _build(header, reader):
+    tables = {}
+    splits = []
+    for cls in ENTRY_CLASSES:
+        table = header['tables'][cls.__name__]
+        tables[cls] = reader.table(cls, table)
+        if cls._split_class is not None:
+            splits.append((tables[cls], reader.blob(table['split_rows']),
+                           reader.blob(table['split_counts'])))
+    position = 0
+    split_items = tables[AmountSplit]
+    for items, rows, counts in splits:
+        for row, count in zip(rows, counts):
+            items[row]._splits = split_items[position:position + count]
+            position += count
+    qif_obj = Qif()
+    accounts = tables[Account]
+    for acc in accounts:
+        qif_obj.add_account(acc)
+    for cat in tables[Category]:
+        qif_obj.add_category(cat)
+    for klass in tables[Class]:
+        qif_obj.add_class(klass)
+    positions = dict((name, 0) for name in _CLASSES_BY_NAME)
+    for owner, header_line, class_name, count in header['groups']:
+        start = positions[class_name]
+        items = tables[_CLASSES_BY_NAME[class_name]][start:start + count]
+        positions[class_name] = start + count
+        target = qif_obj if owner == -1 else accounts[owner]
+        if header_line not in target._transactions:
+            target._transactions[header_line] = []
+            if owner == -1:
+                qif_obj._transaction_headers.append(header_line)
+        target._transactions[header_line].extend(items)
+    qif_obj._last_header = header['last_header']
+    return qif_obj
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in measures of a parse: time spent in each phase, records parsed by
+type, size of the data read and hit rates of the caches.
+
+Pass a ParseStats object as the ``stats`` argument of QifParser.parse,
+parse_path or iter_records. Without it the parsers run unchanged: the
+timing wrappers are only set up for an instrumented parse.
+"""
+import time
+
+# the clock with the best resolution
+_clock = getattr(time, 'perf_counter', time.time)
+
+# phases of a parse, in order; each is timed apart from the phases running
+# inside it: 'records' is the parsing of the fields of the records except
+# the decoding of dates and numbers
+PHASES = ('read', 'guess', 'split', 'records', 'dates', 'numbers', 'build')
+RECORD_TYPES = ('category', 'account', 'transaction', 'investment', 'class',
+                'memorized')
+
+
+class _CountingDict(dict):
+    """
+    dict counting the calls to setdefault, i.e. the lookups of the
+    interned strings
+    """
+
+    def __init__(self):
+        super(_CountingDict, self).__init__()
+        self.lookups = 0
+
+    def setdefault(self, key, default=None):
+        self.lookups += 1
+        return super(_CountingDict, self).setdefault(key, default)
+
+
+class ParseStats(object):
+    """
+    Measures of one or more parses
+    """
+
+    def __init__(self):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.records = dict.fromkeys(RECORD_TYPES, 0)
+        # size of the data read: bytes, or characters for text files
+        self.bytes = 0
+        self.lines = 0
+        self._stack = []
+        self._since = None
+        self._date_parsers = []
+        self._strings = []
+
+    def start(self, phase):
+        """
+        Start timing phase, pausing the phase running
+        """
+        now = _clock()
+        if self._stack:
+            self.times[self._stack[-1]] += now - self._since
+        self._stack.append(phase)
+        self._since = now
+
+    def stop(self):
+        """
+        Stop timing the last phase started, resuming the previous one
+        """
+        now = _clock()
+        self.times[self._stack.pop()] += now - self._since
+        self._since = now
+
+    def timed(self, phase, func):
+        """
+        :return: func, with its calls timed as phase
+        """
+        start = self.start
+        stop = self.stop
+
+        def wrapper(*args):
+            start(phase)
+            try:
+                return func(*args)
+            finally:
+                stop()
+        return wrapper
+
+    def timed_iter(self, phase, iterable):
+        """
+        Yield the items of iterable, the time spent getting them being
+        timed as phase
+        """
+        iterator = iter(iterable)
+        while True:
+            self.start(phase)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.stop()
+            yield item
+
+    def read_lines(self, lines, size=None):
+        """
+        Yield the stripped lines of a file, counting them and their size
+        :param size: size of the file, summed from the lines if None
+        """
+        if size is not None:
+            self.bytes += size
+        for line in self.timed_iter('read', lines):
+            self.lines += 1
+            if size is None:
+                self.bytes += len(line)
+            yield line.strip()
+
+    def record_parser(self, rtype, parser):
+        """
+        :return: parser, counting and timing the records of type rtype
+        """
+        records = self.records
+        timed_parser = self.timed('records', parser)
+
+        def wrapper(lines):
+            records[rtype] += 1
+            return timed_parser(lines)
+        return wrapper
+
+    def instrument(self, parse_date, parse_number):
+        """
+        Time the decoders used by record parsers, and watch their caches
+        :param parse_date: a DateParser
+        :return: ``(parse_date, parse_number, strings)``, strings being the
+            dict of the interned values to use
+        """
+        strings = _CountingDict()
+        self._date_parsers.append(parse_date)
+        self._strings.append(strings)
+        return (self.timed('dates', parse_date),
+                self.timed('numbers', parse_number), strings)
+
+    @property
+    def elapsed(self):
+        return sum(self.times.values())
+
+    @property
+    def date_cache_hits(self):
+        return sum(parser.hits for parser in self._date_parsers)
+
+    @property
+    def date_cache_misses(self):
+        return sum(parser.misses for parser in self._date_parsers)
+
+    @property
+    def date_cache_hit_rate(self):
+        lookups = self.date_cache_hits + self.date_cache_misses
+        return self.date_cache_hits / float(lookups) if lookups else 0.0
+
+    @property
+    def string_hit_rate(self):
+        """
+        Share of the values of interned fields that were already known
+        """
+        lookups = sum(strings.lookups for strings in self._strings)
+        distinct = sum(len(strings) for strings in self._strings)
+        return (lookups - distinct) / float(lookups) if lookups else 0.0
+
+    def as_dict(self):
+        return {
+            'times': dict(self.times),
+            'records': dict(self.records),
+            'bytes': self.bytes,
+            'lines': self.lines,
+            'date_cache_hit_rate': self.date_cache_hit_rate,
+            'string_hit_rate': self.string_hit_rate,
+        }
+
+    def __str__(self):
+        elapsed = self.elapsed
+        res = ['%d bytes, %d lines in %.3fs' % (self.bytes, self.lines,
+                                                elapsed)]
+        for phase in PHASES:
+            res.append('  %-8s %8.3fs %5.1f%%' % (
+                phase, self.times[phase],
+                100 * self.times[phase] / elapsed if elapsed else 0.0))
+        res.append('records: %s' % ', '.join(
+            '%s %d' % (rtype, self.records[rtype]) for rtype in RECORD_TYPES))
+        res.append('date cache hit rate %.1f%%, interned strings hit rate '
+                   '%.1f%%' % (100 * self.date_cache_hit_rate,
+                               100 * self.string_hit_rate))
+        return '\n'.join(res)
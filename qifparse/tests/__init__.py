@@ -1 +1,19 @@
 #
+import os
+import sys
+import unittest
+
+
+def test_suite():
+    """
+    Tests of ``python setup.py test``: unlike the scan of the whole package
+    by setuptools, qifparse.aio and its tests are only imported on Python
+    3.7 or later
+    """
+    names = sorted(
+        name[:-3] for name in os.listdir(os.path.dirname(__file__))
+        if name.startswith('test') and name.endswith('.py'))
+    if sys.version_info < (3, 7):
+        names.remove('test_aio')
+    return unittest.TestLoader().loadTestsFromNames(
+        ['%s.%s' % (__name__, name) for name in names])
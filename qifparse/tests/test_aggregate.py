@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+from decimal import Decimal
+
+from qifparse import columnar
+from qifparse.aggregate import totals, parent_categories
+from qifparse.parser import QifParser
+
+filename = os.path.join(os.path.dirname(__file__), 'data', 'file.qif')
+
+
+class TestAggregatePurePython(unittest.TestCase):
+    use_numpy = False
+
+    def setUp(self):
+        self.numpy = columnar.get_numpy()
+        if not self.use_numpy:
+            columnar.numpy = None
+        elif self.numpy is None:
+            self.skipTest('NumPy not installed')
+        with open(filename) as fh:
+            self.qif = QifParser.parse(fh, date_format='dmy')
+
+    def tearDown(self):
+        columnar.numpy = self.numpy
+
+    def testByCategory(self):
+        self.assertEqual(self.qif.get_totals(), {
+            'food:lunch': Decimal('-23.50'),
+            'Telephone': Decimal('-25.00'),
+            None: Decimal('1050.00')})
+        self.assertEqual(self.qif.get_totals(rollup=True), {
+            'food': Decimal('-23.50'),
+            'food:lunch': Decimal('-23.50'),
+            'Telephone': Decimal('-25.00'),
+            None: Decimal('1050.00')})
+        self.assertEqual(parent_categories('a:b:c'), ['a:b:c', 'a:b', 'a'])
+
+    def testByMonthAndAccount(self):
+        self.assertEqual(self.qif.get_totals(by='month'), {
+            (2013, 10): Decimal('-23.50'),
+            (1993, 7): Decimal('1000.00'),
+            (1993, 8): Decimal('100.00'),
+            None: Decimal('-75.00')})
+        self.assertEqual(self.qif.get_totals(by='account'), {
+            'My Cash': Decimal('-23.50'), 'My Cc': Decimal('1025.00')})
+        table = self.qif.get_columns()
+        self.assertEqual(totals(table, by=('account', 'category'), rollup=True), {
+            ('My Cash', 'food:lunch'): Decimal('-23.50'),
+            ('My Cash', 'food'): Decimal('-23.50'),
+            ('My Cash', None): Decimal('0.00'),
+            ('My Cc', None): Decimal('1050.00'),
+            ('My Cc', 'Telephone'): Decimal('-25.00')})
+        self.assertEqual(totals(table, by=('month', 'account')), {
+            ((2013, 10), 'My Cash'): Decimal('-23.50'),
+            ((1993, 7), 'My Cc'): Decimal('1000.00'),
+            ((1993, 8), 'My Cc'): Decimal('100.00'),
+            (None, 'My Cc'): Decimal('-75.00')})
+        self.assertRaises(ValueError, totals, table, by='payee')
+
+
+class TestAggregateNumPy(TestAggregatePurePython):
+    use_numpy = True
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import unittest
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from qifparse import aio
+from qifparse.parser import QifParser, QifParserException
+
+
+def build_data_path(fn):
+    return os.path.join(os.path.dirname(__file__), 'data', fn)
+
+filename = build_data_path('file.qif')
+
+
+async def stream(data, size):
+    """
+    In memory stream of chunks of size bytes or characters
+    """
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+class MemoryReader(object):
+
+    def __init__(self, data):
+        self.data = data
+
+    async def read(self, size):
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def collect(records):
+    return [record async for record in records]
+
+
+class TestAsyncParsing(unittest.TestCase):
+
+    def setUp(self):
+        with open(filename, 'rb') as fh:
+            self.data = fh.read()
+        with open(filename) as fh:
+            self.expected = str(QifParser.parse(fh, date_format='dmy'))
+
+    def testParse(self):
+        for size in (1, 7, len(self.data)):
+            for batch_lines in (1, 5000):
+                qif = run(aio.parse(stream(self.data, size), date_format='dmy',
+                                    batch_lines=batch_lines))
+                self.assertEqual(str(qif), self.expected)
+        text = self.data.decode('ascii')
+        qif = run(aio.parse(stream(text.replace('\n', '\r\n'), 3),
+                            batch_lines=2))
+        self.assertEqual(str(qif), self.expected)
+        qif = run(aio.parse(MemoryReader(self.data.replace(b'\n', b'\r'))))
+        self.assertEqual(str(qif), self.expected)
+        with self.assertRaises(QifParserException):
+            run(aio.parse(stream(b'\n  \n', 1)))
+
+    def testSniffAll(self):
+        # the dates of the first lines fit both dmy and mdy
+        text = '!Type:Bank\n' + 'D01/02/2014\nT-10.00\n^\n' * 5 + \
+            'D25/02/2014\nT1.00\n^\n'
+        items = run(collect(aio.iter_records(stream(text, 5), sniff_lines=6,
+                                             batch_lines=4)))
+        self.assertEqual([item.date.day for item in items], [1] * 5 + [25])
+
+    def testIterRecords(self):
+        with open(filename) as fh:
+            expected = list(QifParser.iter_records(fh, date_format='dmy',
+                                                   context=True))
+
+        async def main(executor):
+            # a task running along with parsing
+            ticks = []
+
+            async def tick():
+                while True:
+                    ticks.append(None)
+                    await asyncio.sleep(0)
+            task = asyncio.ensure_future(tick())
+            records = await collect(aio.iter_records(
+                stream(self.data, 16), date_format='dmy', num_sep=('.', ''),
+                context=True, executor=executor, batch_lines=4))
+            task.cancel()
+            return records, len(ticks)
+
+        with ThreadPoolExecutor(1) as executor:
+            for pool in (None, executor):
+                records, ticks = run(main(pool))
+                self.assertTrue(ticks > 1)
+                self.assertEqual([record[:2] for record in records],
+                                 [record[:2] for record in expected])
+                self.assertEqual(
+                    [record[2] and record[2].name for record in records],
+                    [record[2] and record[2].name for record in expected])
+                self.assertEqual([str(record[3]) for record in records],
+                                 [str(record[3]) for record in expected])
+        items = run(collect(aio.iter_records(stream(self.data, 64),
+                                             date_format='dmy')))
+        self.assertEqual([str(item) for item in items],
+                         [str(record[3]) for record in expected])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+try:
+    from benchmarks import suite
+except ImportError:
+    # the benchmarks are not part of the installed package
+    suite = None
+
+
+@unittest.skipIf(suite is None, "benchmarks not found")
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def testRoundTrip(self):
+        for scenario in suite.SCENARIOS:
+            metrics, failures = suite.run_scenario(scenario, transactions=60,
+                                                   repeat=1)
+            self.assertEqual(failures, [], scenario.name)
+            self.assertEqual(sorted(metrics),
+                             sorted(suite.THROUGHPUT_METRICS +
+                                    suite.MEMORY_METRICS))
+
+    def testCompare(self):
+        baseline = {'parse_records_per_sec': 1000.0, 'parse_mb_per_sec': 2.0,
+                    'write_mb_per_sec': 2.0,
+                    'parse_peak_bytes_per_record': 500.0}
+        metrics = dict(baseline, parse_records_per_sec=800.0)
+        self.assertEqual(suite.compare(metrics, baseline, 0.3), [])
+        metrics.update(parse_mb_per_sec=1.0, parse_peak_bytes_per_record=700)
+        self.assertEqual(len(suite.compare(metrics, baseline, 0.3)), 2)
+        self.assertEqual(suite.compare(metrics, {}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
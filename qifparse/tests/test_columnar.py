@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import datetime
+import io
+import os
+import unittest
+from decimal import Decimal
+
+from qifparse import columnar
+from qifparse.parser import QifParser
+
+filename = os.path.join(os.path.dirname(__file__), 'data', 'file.qif')
+
+
+class TestColumnarPurePython(unittest.TestCase):
+    use_numpy = False
+
+    def setUp(self):
+        self.numpy = columnar.get_numpy()
+        if not self.use_numpy:
+            columnar.numpy = None
+        elif self.numpy is None:
+            self.skipTest('NumPy not installed')
+        with open(filename) as fh:
+            self.table = QifParser.parseColumns(fh, date_format='dmy')
+
+    def tearDown(self):
+        columnar.numpy = self.numpy
+
+    def testColumns(self):
+        table = self.table
+        self.assertEqual(len(table), 7)
+        self.assertEqual(table.row(0), {
+            'date': datetime.date(2013, 10, 23),
+            'amount': Decimal('-6.50'),
+            'payee': None,
+            'category': 'food:lunch',
+            'to_account': None,
+            'account': 'My Cash',
+            'header': '!Type:Cash',
+        })
+        self.assertEqual(table.row(5)['header'], '!Type:Memorized')
+        self.assertEqual(len(table.splits), 2)
+        self.assertEqual(table.splits.row(1), {
+            'parent': 2, 'amount': Decimal('-17.00'),
+            'category': 'food:lunch', 'to_account': None})
+        with open(filename) as fh:
+            from_qif = QifParser.parse(fh, date_format='dmy').get_columns()
+        for name, types in table._columns:
+            self.assertEqual(list(getattr(from_qif, name)),
+                             list(getattr(table, name)))
+
+    def testTotals(self):
+        table = self.table
+        self.assertEqual(table.total(), Decimal('1001.50'))
+        cash = table.select(account='My Cash')
+        self.assertEqual(list(cash), [0, 1, 2])
+        self.assertEqual(table.total(cash), Decimal('-23.50'))
+        self.assertEqual(table.totals_by('account'), {
+            'My Cash': Decimal('-23.50'), 'My Cc': Decimal('1025.00')})
+        self.assertEqual(table.splits.totals_by('category'), {
+            None: Decimal('-31.00'), 'food:lunch': Decimal('-17.00')})
+
+    def testSelect(self):
+        table = self.table
+        rows = table.select(start=datetime.date(2013, 10, 1),
+                            end=datetime.date(2013, 10, 11))
+        self.assertEqual(list(rows), [1, 2])
+        # the memorized transactions (rows 5 and 6) have no date
+        self.assertEqual(list(table.select(end=datetime.date(2000, 1, 1))),
+                         [3, 4])
+        self.assertEqual(list(table.select(start=datetime.date(2000, 1, 1))),
+                         [0, 1, 2])
+        self.assertEqual(list(table.select(category='food:lunch')), [0])
+        self.assertEqual(list(table.select(payee='nobody')), [])
+        self.assertRaises(ValueError, table.totals_by, 'date')
+
+    def testScale(self):
+        data = ('!Type:Bank\nD01/02/2013\nT-2.50\nSfood\n$-1.2\nSrent\n$-1.3\n^\n'
+                'D02/02/2013\nT1.234\nLfood\n^\nD03/02/2013\nT0.0005\n^\n')
+        table = QifParser.parseColumns(io.StringIO(data), date_format='dmy')
+        self.assertEqual((table.scale, table.splits.scale), (4, 4))
+        self.assertEqual(list(table.amount), [-25000, 12340, 5])
+        self.assertEqual(list(table.splits.amount), [-12000, -13000])
+        self.assertEqual(table.total(), Decimal('-1.2655'))
+        qif = QifParser.parse(io.StringIO(data), date_format='dmy')
+        self.assertEqual(qif.get_totals(), {
+            'food': Decimal('0.034'), 'rent': Decimal('-1.3'),
+            None: Decimal('0.0005')})
+        self.assertRaises(ValueError, qif.get_columns, scale=2)
+
+
+class TestColumnarNumPy(TestColumnarPurePython):
+    use_numpy = True
+
+
+if __name__ == "__main__":
+    unittest.main()
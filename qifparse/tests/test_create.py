@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
+import pickle
 import unittest
+from datetime import datetime
+from decimal import Decimal
 from qifparse import qif
 
 
@@ -34,6 +37,80 @@ class TestCreateQIF(unittest.TestCase):
         res = qif_obj.get_categories(name='my cat')
         self.failUnless(len(res))
 
+    def testLookups(self):
+        qif_obj = qif.Qif()
+        cash = qif.Account(name='My Cash', account_type='Cash')
+        bank = qif.Account(name='My Bank', account_type='Bank')
+        other_bank = qif.Account(name='Other Bank', account_type='Bank')
+        for acc in (cash, bank, other_bank):
+            qif_obj.add_account(acc)
+        food = qif.Category(name='food')
+        salary = qif.Category(name='salary', income=True, expense=False)
+        qif_obj.add_category(food)
+        qif_obj.add_category(salary)
+        klass = qif.Class(name='work')
+        qif_obj.add_class(klass)
+        self.assertEqual(qif_obj.get_accounts(name='My Bank'), (bank,))
+        self.assertEqual(qif_obj.get_accounts(atype='Bank'), (bank, other_bank))
+        self.assertEqual(qif_obj.get_accounts(name='My Bank', atype='Cash'), ())
+        self.assertEqual(qif_obj.get_accounts(name='Unknown'), ())
+        self.assertEqual(qif_obj.get_categories(income=True), (salary,))
+        self.assertEqual(qif_obj.get_categories(expense=True), (food,))
+        self.assertEqual(qif_obj.get_categories(name='food', income=True), ())
+        self.assertEqual(qif_obj.get_categories(name='salary'), (salary,))
+        self.assertEqual(qif_obj.get_classes(name='work'), (klass,))
+
+        tr1 = qif.Transaction(amount=Decimal('10'), category='salary/work')
+        tr2 = qif.Transaction(amount=Decimal('-5'), to_account='My Bank')
+        split = qif.AmountSplit(amount=Decimal('-5'), category='car')
+        tr2.splits.append(split)
+        cash.add_transaction(tr1, header='!Type:Cash')
+        cash.add_transaction(tr2)
+        refs = qif_obj.resolve_references()
+        self.assertEqual([(ref.item, ref.field, ref.name, ref.target) for ref in refs], [
+            (tr1, 'category', 'salary', salary),
+            (tr1, 'class', 'work', klass),
+            (tr2, 'to_account', 'My Bank', bank),
+            (split, 'category', 'car', None),
+        ])
+
+    def testCompactEntries(self):
+        tr = qif.Transaction(amount=Decimal('-6.50'), payee='Joe', unknown=1)
+        self.assertFalse(hasattr(tr, '__dict__'))
+        self.assertFalse(hasattr(tr, 'unknown'))
+        self.assertEqual(tr.payee, 'Joe')
+        self.assertEqual(tr.memo, None)
+        self.assertEqual(tr.date_format, '%d/%m/%Y')
+        self.assertRaises(AttributeError, setattr, tr, 'unknown', 1)
+        self.assertFalse(hasattr(tr, '_splits'))
+        tr.splits.append(qif.AmountSplit(amount=Decimal('-6.50')))
+        self.assertEqual(len(tr.splits), 1)
+        memorized = qif.MemorizedTransaction(mtype='C', amount=Decimal('1'))
+        self.assertEqual(memorized.mtype, 'C')
+        self.assertEqual(qif.MemorizedTransaction().mtype, None)
+        self.assertEqual(qif.Category(name='food').expense, True)
+        copy = pickle.loads(pickle.dumps(tr))
+        self.assertEqual(str(copy), str(tr))
+
+    def testSerializer(self):
+        tr = qif.Transaction(date=datetime(2013, 10, 11), amount=Decimal('-48'),
+                             address=['via Roma', 'Ferrara'], to_account='My Cc',
+                             reimbursable_expense=True, category='food')
+        tr.splits.append(qif.AmountSplit(category='food:lunch', amount=Decimal('-17'),
+                                         percent='35%'))
+        self.assertEqual(tr.get_lines(), [
+            'D11/10/2013', 'T-48.00', 'Avia Roma', 'AFerrara', 'Lfood', 'F',
+            'L[My Cc]', 'Sfood:lunch', '$-17.00', '%35%', '^'])
+        tr.date_format = '%Y-%m-%d'
+        self.assertEqual(tr.get_lines()[0], 'D2013-10-11')
+        investment = qif.Investment(date=datetime(1993, 7, 25), price=Decimal('11.26'))
+        self.assertEqual(str(investment), 'D25/07/1993\nI11.260\n^')
+        self.assertRaises(RuntimeError, qif.Transaction(amount=0).get_lines)
+        self.assertEqual(str(qif.Category(name='food', income=True)), 'Nfood\nE\nI\n^')
+        self.assertTrue(qif.Transaction._serializer() is qif.Transaction._serializer())
+        self.assertFalse(qif.Transaction._serializer() is
+                         qif.MemorizedTransaction._serializer())
+
 
 if __name__ == "__main__":
     import unittest
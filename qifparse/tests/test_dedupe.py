@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import unittest
+import io
+import os
+from datetime import datetime
+from decimal import Decimal
+
+from qifparse import dedupe
+from qifparse.parser import QifParser
+from qifparse.qif import AmountSplit, Transaction
+
+
+def build_data_path(fn):
+    return os.path.join(os.path.dirname(__file__), 'data', fn)
+
+filename = build_data_path('file.qif')
+
+OLD = """!Account
+NChecking
+TBank
+^
+!Type:Bank
+D01/02/2014
+T-10.00
+PBaker
+^
+D01/02/2014
+T-10.00
+PBaker
+^
+D02/02/2014
+T-25.50
+PGarage
+^
+"""
+
+NEW = """!Account
+NChecking
+TBank
+^
+!Type:Bank
+D02/02/2014
+T-25.5
+P garage
+^
+D01/02/2014
+T-10.00
+PBaker
+^
+D01/02/2014
+T-10.00
+PBaker
+^
+D01/02/2014
+T-10.00
+PBaker
+^
+D03/02/2014
+T100.00
+PEmployer
+^
+!Account
+NSavings
+TBank
+^
+!Type:Bank
+D02/02/2014
+T-25.50
+PGarage
+^
+"""
+
+
+def parse(data):
+    return QifParser.parse(io.StringIO(data), date_format='dmy')
+
+
+class TestDedupe(unittest.TestCase):
+
+    def testFingerprint(self):
+        first = Transaction(date=datetime(2014, 2, 1), amount=Decimal('31.00'),
+                            payee='Joe  Hayes', memo='first')
+        first.splits.append(AmountSplit(category='food', amount=10))
+        first.splits.append(AmountSplit(to_account='Cash', amount=21))
+        second = Transaction(date=datetime(2014, 2, 1, 12), amount=31,
+                             payee='joe hayes ', memo='second')
+        second.splits.append(AmountSplit(to_account='Cash', amount=21.0))
+        second.splits.append(AmountSplit(category='Food', amount=10))
+        self.assertEqual(dedupe.fingerprint(first), dedupe.fingerprint(second))
+        self.assertEqual(len(dedupe.fingerprint(first)), 20)
+        second.num = '12'
+        self.assertNotEqual(dedupe.fingerprint(first),
+                            dedupe.fingerprint(second))
+        # a split to an account isn't a split to the same category
+        third = Transaction(date=datetime(2014, 2, 1), amount=31)
+        third.splits.append(AmountSplit(category='cash', amount=31))
+        fourth = Transaction(date=datetime(2014, 2, 1), amount=31)
+        fourth.splits.append(AmountSplit(to_account='cash', amount=31))
+        self.assertNotEqual(dedupe.fingerprint(third),
+                            dedupe.fingerprint(fourth))
+        self.assertRaises(ValueError, dedupe.fingerprint, AmountSplit())
+
+    def testLazy(self):
+        with open(filename) as fh:
+            qif = QifParser.parse(fh, date_format='dmy')
+        with open(filename) as fh:
+            lazy = QifParser.parse(fh, date_format='dmy', lazy=True)
+        self.assertEqual(
+            [dedupe.fingerprint(item) for _, _, item in lazy.iter_transactions()],
+            [dedupe.fingerprint(item) for _, _, item in qif.iter_transactions()])
+
+    def testMergeSame(self):
+        with open(filename) as fh:
+            qif = QifParser.parse(fh, date_format='dmy')
+        with open(filename) as fh:
+            other = QifParser.parse(fh, date_format='dmy')
+        self.assertEqual(qif.merge(other), (0, 7))
+        self.assertEqual(str(qif), str(other))
+
+    def testMergeOverlap(self):
+        qif = parse(OLD)
+        result = qif.merge(parse(NEW))
+        self.assertEqual(result.added, 3)
+        self.assertEqual(result.duplicates, 3)
+        checking, savings = qif.get_accounts()
+        self.assertEqual([(item.payee, item.amount)
+                          for item in checking.get_transactions()[0]],
+                         [('Baker', Decimal('-10.00')),
+                          ('Baker', Decimal('-10.00')),
+                          ('Garage', Decimal('-25.50')),
+                          ('Baker', Decimal('-10.00')),
+                          ('Employer', Decimal('100.00'))])
+        # the same transaction in another account isn't a duplicate
+        self.assertEqual(savings.name, 'Savings')
+        self.assertEqual(len(savings.get_transactions()[0]), 1)
+        # merging again adds nothing
+        self.assertEqual(qif.merge(parse(NEW)), (0, 6))
+
+    def testMergeLists(self):
+        with open(filename) as fh:
+            other = QifParser.parse(fh, date_format='dmy')
+        qif = parse(OLD)
+        self.assertEqual(qif.merge(other), (7, 0))
+        self.assertEqual([cat.name for cat in qif.get_categories()],
+                         ['food', 'food:lunch'])
+        self.assertEqual([cls.name for cls in qif.get_classes()],
+                         ['my class'])
+        self.assertEqual([account.name for account in qif.get_accounts()],
+                         ['Checking', 'My Cash', 'My Cc'])
+        self.assertEqual(len(qif.get_accounts('My Cc')[0]
+                             .get_transactions()[0]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import unittest
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+from qifparse import export
+from qifparse.parser import QifParser
+
+
+def build_data_path(fn):
+    return os.path.join(os.path.dirname(__file__), 'data', fn)
+
+filename = build_data_path('file.qif')
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        with open(filename) as fh:
+            self.qif = QifParser.parse(fh, date_format='dmy')
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def testBatches(self):
+        batches = list(export.iter_batches(self.qif, batch_size=2))
+        self.assertEqual([len(batch.transactions['id']) for batch in batches],
+                         [2, 2, 2, 1])
+        first = batches[0].transactions
+        self.assertEqual(list(first), list(export.TRANSACTION_COLUMNS))
+        self.assertEqual(first['date'], [date(2013, 10, 23), date(2013, 10, 11)])
+        self.assertEqual(first['amount'], [Decimal('-6.50'), Decimal('31.00')])
+        self.assertEqual(first['account'], ['My Cash', 'My Cash'])
+        self.assertEqual(first['type'], ['Cash', 'Cash'])
+        self.assertEqual(first['to_account'], [None, 'My Cc'])
+        self.assertEqual(dict(batches[1].splits),
+                         {'transaction': [2, 2],
+                          'amount': [Decimal('-31.00'), Decimal('-17.00')],
+                          'category': [None, 'food:lunch'],
+                          'to_account': ['My Cc', None],
+                          'memo': [None, None]})
+        self.assertEqual(batches[1].transactions['type'], ['Cash', 'Invst'])
+        self.assertEqual(batches[3].transactions['type'], ['Memorized'])
+        self.assertEqual(batches[3].transactions['date'], [None])
+        # streaming
+        with open(filename) as fh:
+            streamed = list(export.iter_batches(
+                QifParser.iter_records(fh, date_format='dmy', context=True),
+                batch_size=2))
+        self.assertEqual(streamed, batches)
+
+    def testCsv(self):
+        path = self.path('transactions.csv')
+        splits_path = self.path('splits.csv')
+        self.assertEqual(self.qif.export(path, splits_path, batch_size=3), 7)
+        with open(path) as fh:
+            rows = list(csv.reader(fh))
+        self.assertEqual(rows[0], list(export.TRANSACTION_COLUMNS))
+        self.assertEqual(rows[1], ['0', '2013-10-23', '-6.50', '',
+                                   'food:lunch', '', '', 'My Cash', 'Cash'])
+        self.assertEqual(len(rows), 8)
+        with open(splits_path) as fh:
+            rows = list(csv.reader(fh))
+        self.assertEqual(rows[1:], [['2', '-31.00', '', 'My Cc', ''],
+                                    ['2', '-17.00', 'food:lunch', '', '']])
+
+    def testJsonLines(self):
+        out = io.StringIO()
+        export.write_jsonl(export.iter_batches(self.qif), out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[2]['amount'], -48.0)
+        self.assertEqual(rows[2]['date'], '2013-10-11')
+        self.assertEqual(rows[2]['payee'], None)
+        self.assertEqual(export.export(self.qif, self.path('out.jsonl')), 7)
+        with open(self.path('out.jsonl')) as fh:
+            self.assertEqual(fh.read(), out.getvalue())
+        self.assertRaises(ValueError, export.export, self.qif,
+                          self.path('out.txt'), format='xml')
+
+    def testArrow(self):
+        if export.pyarrow is None:
+            self.skipTest('pyarrow not installed')
+        path = self.path('transactions.parquet')
+        splits_path = self.path('splits.parquet')
+        self.assertEqual(self.qif.export(path, splits_path, batch_size=2), 7)
+        table = export.pyarrow.parquet.read_table(path)
+        self.assertEqual(table.num_rows, 7)
+        self.assertEqual(table.column('amount').to_pylist()[2],
+                         Decimal('-48.0000'))
+        self.assertEqual(table.column('date').to_pylist()[0],
+                         date(2013, 10, 23))
+        splits = export.pyarrow.parquet.read_table(splits_path)
+        self.assertEqual(splits.column('transaction').to_pylist(), [2, 2])
+        path = self.path('transactions.arrow')
+        self.qif.export(path)
+        with export.pyarrow.ipc.open_file(path) as reader:
+            self.assertEqual(reader.read_all().num_rows, 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import unittest
+import io
+import os
+import tempfile
+
+from qifparse.parser import QifParser
+from qifparse.index import RecordIndex, scan_records
+
+
+def build_data_path(fn):
+    return os.path.join(os.path.dirname(__file__), 'data', fn)
+
+filename = build_data_path('file.qif')
+
+NEW_INVESTMENT = b'''D26/08/1993
+NBuyX
+Yibm4
+T50.00
+^
+'''
+
+
+class TestRecordIndex(unittest.TestCase):
+
+    def setUp(self):
+        with open(filename, 'rb') as fh:
+            self.data = fh.read()
+        fd, self.path = tempfile.mkstemp(suffix='.qif')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write(self, data):
+        with open(self.path, 'wb') as fh:
+            fh.write(data)
+
+    def parse_delta(self, index=None):
+        return QifParser.parse_delta(self.path, index, date_format='dmy',
+                                     encoding='ascii')
+
+    def testScanRecords(self):
+        data = b'!Type:Cat\r\nNa\r\n^\r\n^\n\n  \n^\nNb\r^\r!Account\nNc'
+        entries = list(scan_records(data, 'ascii'))
+        self.assertEqual([(entry.start, entry.end, entry.header, entry.account)
+                          for entry in entries],
+                         [(0, 18, '!Type:Cat', -1), (26, 31, '!Type:Cat', -1),
+                          (31, 42, '!Account', 2)])
+
+    def testFullParse(self):
+        self.write(self.data)
+        delta = self.parse_delta()
+        with open(filename) as fh:
+            expected = list(QifParser.iter_records(fh, date_format='dmy',
+                                                   context=True))
+        self.assertEqual(len(delta.records), len(expected))
+        for record, other in zip(delta.records, expected):
+            self.assertEqual(record[:2], other[:2])
+            self.assertEqual(str(record[3]), str(other[3]))
+            if other[2] is None:
+                self.assertEqual(record[2], None)
+            else:
+                self.assertEqual(record[2].name, other[2].name)
+        self.assertEqual(delta.removed, [])
+        self.assertEqual(len(delta.index), 12)
+        self.assertEqual(delta.index.size, len(self.data))
+        self.assertEqual(str(QifParser.buildQif(delta.records)),
+                         self.data.decode('ascii'))
+
+    def testAppended(self):
+        # insert the new investment before the memorized transactions
+        pos = self.data.index(b'!Type:Memorized')
+        self.write(self.data[:pos])
+        index = self.parse_delta().index
+        self.write(self.data[:pos] + NEW_INVESTMENT)
+        delta = self.parse_delta(index)
+        self.assertEqual(delta.removed, [])
+        self.assertEqual(len(delta.records), 1)
+        rtype, header, account, item = delta.records[0]
+        self.assertEqual((rtype, header, account.name), (
+            'investment', '!Type:Invst', 'My Cc'))
+        self.assertEqual(item.security, 'ibm4')
+        self.assertEqual(len(delta.index), len(index) + 1)
+        self.assertEqual(self.parse_delta(delta.index).records, [])
+
+    def testIncompleteRecord(self):
+        self.write(self.data[:-2])
+        index = self.parse_delta().index
+        self.assertEqual(index.size, self.data.index(b"!Type:Class"))
+        self.write(self.data)
+        delta = self.parse_delta(index)
+        self.assertEqual(delta.removed, [index.entries[-1]])
+        self.assertEqual([record[0] for record in delta.records], ['class'])
+        self.assertEqual(delta.index.size, len(self.data))
+
+    def testChanged(self):
+        self.write(self.data)
+        index = self.parse_delta().index
+        self.write(self.data.replace(b'T31.00', b'T32.00')
+                   .replace(b'NMy Cc\nTInvst', b'NMy Cc\nDBroker\nTInvst'))
+        delta = self.parse_delta(index)
+        self.assertEqual([entry.header for entry in delta.removed],
+                         ['!Type:Cash', '!Account', '!Type:Invst',
+                          '!Type:Invst', '!Type:Memorized',
+                          '!Type:Memorized'])
+        records = delta.records
+        self.assertEqual([record[0] for record in records],
+                         ['transaction', 'account', 'investment',
+                          'investment', 'memorized', 'memorized'])
+        self.assertEqual(records[0][2].name, 'My Cash')
+        self.assertEqual(str(records[0][3].amount), '32.00')
+        self.assertEqual(records[1][3].description, 'Broker')
+        self.assertTrue(records[2][2] is records[1][3])
+
+    def testSaveLoad(self):
+        self.write(self.data)
+        index = self.parse_delta().index
+        fh = io.StringIO()
+        index.save(fh)
+        fh.seek(0)
+        loaded = RecordIndex.load(fh)
+        self.assertEqual(loaded.entries, index.entries)
+        self.assertEqual((loaded.size, loaded.prefix, loaded.encoding,
+                          loaded.date_format, loaded.num_sep),
+                         (index.size, index.prefix, index.encoding,
+                          index.date_format, index.num_sep))
+        self.write(self.data + b'!Type:Class\nNother\n^\n')
+        delta = QifParser.parse_delta(self.path, loaded)
+        self.assertEqual([record[3].name for record in delta.records],
+                         ['other'])
+        self.write(self.data + b'!Type:Class\nNother\n^\n' + b'!Type:Invst\n' +
+                   NEW_INVESTMENT)
+        delta = QifParser.parse_delta(self.path, delta.index)
+        self.assertEqual(delta.records[0][2].name, 'My Cc')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,18 @@
 # -*- coding: utf-8 -*-
 import unittest
+import io
 import os
+import pickle
+import tempfile
 
 import datetime
 
 from decimal import Decimal
 
-from qifparse.parser import QifParser, QifParserInvalidDate, QifParserInvalidNumber, QifParserException
-from qifparse.qif import Qif, Account, Transaction, AmountSplit
+from qifparse.parser import QifParser, QifParserInvalidDate, QifParserInvalidNumber, QifParserException, DateParser, number_parser
+from qifparse.parser import ErrorReport, MAX_UNKNOWN_LINE_WARNINGS, QifParserInvalidValue
+from qifparse.stats import ParseStats, PHASES
+from qifparse.qif import Qif, Account, Transaction, AmountSplit, Investment, MemorizedTransaction, LazyFields, write_records
 
 
 def build_data_path(fn):
@@ -108,6 +113,22 @@ class TestQIFParsing(unittest.TestCase):
 #        out.close()
         self.assertEqual(data, str(qif))
 
+    def testWriteStream(self):
+        for fn in (filename, filename3):
+            with open(fn) as fh:
+                data = fh.read()
+            with open(fn) as fh:
+                qif = QifParser.parse(fh, date_format='dmy')
+            for chunk_size in (3, 1000):
+                out = io.StringIO()
+                qif.write(out, chunk_size=chunk_size)
+                self.assertEqual(out.getvalue(), data)
+            with open(fn) as fh:
+                out = io.StringIO()
+                write_records(out, QifParser.iter_records(fh, date_format='dmy', context=True),
+                              chunk_size=3)
+            self.assertEqual(out.getvalue(), data)
+
     def testParseTransactionsFile(self):
         with open(filename3) as fh:
             data = fh.read()
@@ -118,6 +139,403 @@ class TestQIFParsing(unittest.TestCase):
 #        out.close()
         self.assertEqual(data, str(qif))
 
+    def testIterRecords(self):
+        with open(filename) as fh:
+            items = list(QifParser.iter_records(fh, date_format='dmy'))
+        self.assertEqual([type(item).__name__ for item in items],
+                         ['Category', 'Category', 'Account', 'Transaction',
+                          'Transaction', 'Transaction', 'Account',
+                          'Investment', 'Investment', 'MemorizedTransaction',
+                          'MemorizedTransaction', 'Class'])
+        self.assertEqual(items[5].splits[0].amount, Decimal("-31.00"))
+
+    def testIterRecordsContext(self):
+        with open(filename) as fh:
+            records = list(QifParser.iter_records(fh, date_format='dmy', context=True))
+        rtype, header, account, item = records[7]
+        self.assertEqual(rtype, 'investment')
+        self.assertEqual(header, '!Type:Invst')
+        self.assertEqual(account.name, 'My Cc')
+        self.assertEqual(item.security, 'ibm4')
+        with open(filename) as fh:
+            data = fh.read()
+        self.assertEqual(data, str(QifParser.buildQif(iter(records))))
+
+    def testIterRecordsNonSeekable(self):
+        with open(filename) as fh:
+            lines = iter(fh.readlines())
+        items = list(QifParser.iter_records(lines))
+        self.assertEqual(len(items), 12)
+        self.assertEqual(items[3].date, datetime.datetime(2013, 10, 23))
+
+    def testGuessFormatsStopEarly(self):
+        def samples(values):
+            for value in values:
+                yield value
+            raise AssertionError("samples consumed past the needed prefix")
+        self.assertEqual(QifParser.guessDateFormat(samples(['13/12/2015']), stop_early=True), 'dmy')
+        self.assertEqual(QifParser.guessNumberFormat(samples(['-1.234,56']), stop_early=True), (',', '.'))
+        self.assertEqual(QifParser.guessDateFormat(['13/12/2015', 'garbage'], max_samples=1), 'dmy')
+        self.assertRaises(QifParserInvalidDate, QifParser.guessDateFormat, ['13/12/2015', 'garbage'])
+
+    def testSniffFormats(self):
+        lines = ['!Type:Bank', 'D13/12/2015', 'T-1.234,56', '^', 'D02/01/2016', 'T-1,00', '^']
+        date_format, num_sep, all_lines = QifParser.sniffFormats(iter(lines))
+        self.assertEqual((date_format, num_sep), ('dmy', (',', '.')))
+        self.assertEqual(list(all_lines), lines)
+        self.assertRaises(QifParserInvalidDate, QifParser.sniffFormats, iter(lines), max_lines=1)
+
+    def testParseRecordFields(self):
+        tr = QifParser.parseTransaction('!Type:Bank\nD11/10/2013\nT-48.00\nF\nS[My Cc]\n$-31.05\nEsplit memo\n%50%\nSfood\n$-16.95')
+        self.assertTrue(tr.reimbursable_expense)
+        self.assertEqual(tr.splits[0].to_account, 'My Cc')
+        self.assertEqual(tr.splits[0].memo, 'split memo')
+        self.assertEqual(tr.splits[0].percent, '50%')
+        self.assertEqual(tr.splits[1].amount, Decimal('-16.95'))
+        self.assertTrue('\nEsplit memo' in str(tr))
+        memorized = QifParser.parseMemorizedTransaction('S[My Cc]\n$-31.05\nKC')
+        self.assertEqual(memorized.splits[0].amount, Decimal('-31.05'))
+        self.assertEqual(memorized.mtype, 'C')
+        cat = QifParser.parseCategory('!Type:Cat\nNsalary\nI\nRschedule')
+        self.assertEqual((cat.income, cat.expense), (True, False))
+        self.assertEqual(cat.tax_schedule_amount, 'schedule')
+        investment = QifParser.parseInvestment('D25/08/1993\nL[CHECKING]\nO1.50')
+        self.assertEqual(investment.to_account, 'CHECKING')
+        self.assertEqual(investment.commission, Decimal('1.50'))
+
+    def testParseRecordCachedParsers(self):
+        first = QifParser.parseTransaction('D11/10/2013\nT-48.00')
+        second = QifParser.parseTransaction('D10/11/2013\nT1,50',
+                                            decimal_sep=',')
+        third = QifParser.parseTransaction('D11/10/2013\nPJoe')
+        self.assertEqual((first.date, first.amount),
+                         (datetime.datetime(2013, 10, 11), Decimal('-48.00')))
+        self.assertEqual((second.date, second.amount),
+                         (datetime.datetime(2013, 11, 10), Decimal('1.50')))
+        self.assertIsNot(third, first)
+        self.assertEqual(third.payee, 'Joe')
+        self.assertEqual(first.payee, None)
+
+    def testDateParser(self):
+        parse_date = DateParser('mdy', maxsize=2)
+        for qdate in ["12/13/2015", "12/13'15", "1/2/2016", "12/13/2015", "12/13/2015"]:
+            self.assertEqual(parse_date(qdate), QifParser.parseQifDateTime(qdate, 'mdy'))
+        # 12/13/2015 was evicted by 1/2/2016 and is a miss again
+        self.assertEqual(parse_date.cache_info(), (1, 4, 2, 2))
+        # a hit makes a date the most recently used one
+        parse_date.cache_clear()
+        for qdate in ["1/2/2016", "1/3/2016", "1/2/2016", "1/4/2016", "1/2/2016"]:
+            parse_date(qdate)
+        self.assertEqual(parse_date.cache_info(), (2, 3, 2, 2))
+        self.assertRaises(QifParserInvalidDate, parse_date, '13/12/2015')
+        self.assertRaises(QifParserInvalidDate, DateParser, 'ydm')
+
+    def testParseStats(self):
+        counts = {'category': 2, 'account': 2, 'transaction': 3,
+                  'investment': 2, 'memorized': 2, 'class': 1}
+        with open(filename) as fh:
+            expected = str(QifParser.parse(fh, date_format='dmy'))
+        stats = ParseStats()
+        with open(filename) as fh:
+            self.assertEqual(str(QifParser.parse(fh, stats=stats)), expected)
+        self.assertEqual(stats.records, counts)
+        self.assertEqual(stats.lines, 68)
+        self.assertEqual(stats.bytes, len(expected))
+        for phase in PHASES:
+            self.assertTrue(stats.times[phase] > 0, phase)
+        # 5 dates, 2 of them the same
+        self.assertEqual((stats.date_cache_hits, stats.date_cache_misses),
+                         (1, 4))
+        self.assertEqual(stats.date_cache_hit_rate, 0.2)
+        self.assertTrue(0 < stats.string_hit_rate < 1)
+        self.assertTrue('transaction 3' in str(stats))
+        stats = ParseStats()
+        QifParser.parse_path(filename, date_format='dmy', num_sep=('.', ''),
+                             stats=stats)
+        self.assertEqual(stats.records, counts)
+        self.assertEqual(stats.bytes, os.path.getsize(filename))
+        self.assertEqual(stats.times['guess'], 0)
+        stats = ParseStats()
+        with open(filename) as fh:
+            records = QifParser.iter_records(fh, stats=stats)
+            self.assertEqual(stats.records['transaction'], 0)
+            self.assertEqual(len(list(records)), 12)
+        self.assertEqual(stats.records, counts)
+        self.assertEqual(stats.as_dict()['lines'], 68)
+
+    def testParseLenient(self):
+        with open(filename) as fh:
+            data = fh.read()
+        data = data.replace('D11/10/2013\nT31.00', 'Dgarbage\nT31.00')
+        data = data.replace('T-48.00', 'T-4x8.00')
+        data = data.replace('Lfood:lunch\n', 'Lfood:lunch\n' + 'Zzz\n' * 12)
+        data += '!Option:AutoSwitch\n^\nNfoo\n^\n'
+        lines = data.split('\n')
+        self.assertRaises(QifParserException, QifParser.parse,
+                          io.StringIO(data))
+        fd, path = tempfile.mkstemp(suffix='.qif')
+        os.close(fd)
+        try:
+            with open(path, 'w') as fh:
+                fh.write(data)
+            for parse in (lambda errors: QifParser.parse(io.StringIO(data), errors=errors),
+                          lambda errors: QifParser.parse_path(path, block_size=10, errors=errors)):
+                errors = ErrorReport()
+                qif = parse(errors)
+                cash = qif.get_accounts('My Cash')[0]
+                self.assertEqual(len(cash.get_transactions()[0]), 1)
+                self.assertEqual(len(qif.get_accounts()), 2)
+                self.assertEqual(len(qif.get_classes()), 1)
+                self.assertEqual(len(errors), 4)
+                self.assertEqual([error.line for error in errors],
+                                 [lines.index('Dgarbage') + 1,
+                                  lines.index('T-4x8.00'),
+                                  lines.index('!Option:AutoSwitch') + 1,
+                                  lines.index('Nfoo') + 1])
+                self.assertEqual(errors.records[0].header, '!Type:Cash')
+                self.assertEqual(errors.records[0].lines, ['Dgarbage', 'T31.00', 'L[My Cc]'])
+                self.assertEqual(errors.records[3].reason, "Header not recognized: '!Option:AutoSwitch'")
+                self.assertEqual(dict(errors.unknown_lines), {('Transaction', 'Z'): [12, 'Zzz']})
+                self.assertTrue('12 unknown Z lines' in str(errors))
+        finally:
+            os.remove(path)
+        errors = ErrorReport()
+        items = list(QifParser.iter_records(io.StringIO(data), errors=errors))
+        self.assertEqual(len(items), 10)
+        self.assertEqual(len(errors), 4)
+        self.assertRaises(QifParserException, QifParser.parse,
+                          io.StringIO(data), errors=ErrorReport(max_errors=3))
+        with self.assertLogs('qifparse', 'WARNING') as logs:
+            QifParser.parse(io.StringIO(data.replace('Dgarbage', 'D11/10/2013').replace('T-4x8', 'T-48')
+                                        .replace('!Option:AutoSwitch\n^\nNfoo\n^\n', '')))
+        self.assertEqual(len(logs.output), MAX_UNKNOWN_LINE_WARNINGS + 1)
+
+    def testParseLenientInvalidValues(self):
+        with open(filename) as fh:
+            data = fh.read()
+        data = data.replace('TInvst', 'TPort').replace('KP', 'KZ')
+        self.assertRaises(QifParserInvalidValue, QifParser.parse,
+                          io.StringIO(data), date_format='dmy')
+        errors = ErrorReport()
+        qif = QifParser.parse(io.StringIO(data), date_format='dmy', errors=errors)
+        self.assertEqual([error.lines for error in errors],
+                         [['!Account', 'NMy Cc', 'TPort'], ['T-25.00', 'LTelephone', 'KZ']])
+        self.assertEqual(errors.records[0].reason, 'TPort: Port is not a valid account type')
+        self.assertEqual([item.mtype for _, _, item in qif.iter_transactions()
+                          if isinstance(item, MemorizedTransaction)], ['C'])
+
+    def testParseLazy(self):
+        with open(filename) as fh:
+            expected = str(QifParser.parse(fh, date_format='dmy'))
+        with open(filename) as fh:
+            qif = QifParser.parse(fh, date_format='dmy', lazy=True)
+        tr = qif.get_accounts('My Cash')[0].get_transactions()[0][2]
+        self.assertTrue(isinstance(tr, Transaction))
+        self.assertTrue(isinstance(tr, LazyFields))
+        self.assertEqual(type(tr).__name__, 'Transaction')
+        self.assertEqual(sorted(tr._raw), ['amount', 'date'])
+        self.assertEqual(tr.address, ['via Roma', '44100, Ferrara', 'Italy'])
+        self.assertEqual(tr.amount, Decimal('-48.00'))
+        self.assertEqual(sorted(tr._raw), ['date'])
+        self.assertEqual(tr.splits[1].amount, Decimal('-17.00'))
+        self.assertEqual(tr.memo, None)
+        self.assertEqual(str(qif), expected)
+        investment = qif.get_accounts('My Cc')[0].get_transactions()[0][0]
+        self.assertTrue(isinstance(investment, Investment))
+        self.assertEqual(investment.quantity, Decimal('88.810'))
+        with open(filename) as fh:
+            data = fh.read().replace('D23/10/2013', 'D31/02/2013')
+        qif = QifParser.parse(io.StringIO(data), date_format='dmy', lazy=True)
+        tr = qif.get_accounts('My Cash')[0].get_transactions()[0][0]
+        self.assertEqual(tr.amount, Decimal('-6.50'))
+        self.assertRaises(QifParserInvalidDate, getattr, tr, 'date')
+        self.assertRaises(QifParserInvalidDate, tr.decode)
+
+    def testParseLazyPickle(self):
+        with open(filename) as fh:
+            expected = str(QifParser.parse(fh, date_format='dmy'))
+        with open(filename) as fh:
+            qif = QifParser.parse(fh, date_format='dmy', lazy=True)
+        tr = qif.get_accounts('My Cash')[0].get_transactions()[0][2]
+        copy = pickle.loads(pickle.dumps(tr))
+        self.assertIs(type(copy), Transaction)
+        self.assertIs(type(copy.splits[0]), AmountSplit)
+        self.assertEqual(copy.date, datetime.datetime(2013, 10, 11))
+        self.assertEqual(str(copy), str(tr))
+        copy = pickle.loads(pickle.dumps(qif, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(str(copy), expected)
+        self.assertFalse(any(isinstance(item, LazyFields)
+                             for _, _, item in copy.iter_transactions()))
+
+    def testParseFields(self):
+        with open(filename) as fh:
+            qif = QifParser.parse(fh, date_format='dmy',
+                                  fields=('date', 'amount', 'category'))
+        transactions = qif.get_accounts('My Cash')[0].get_transactions()[0]
+        self.assertEqual([(tr.date, tr.amount, tr.category, tr.to_account)
+                          for tr in transactions],
+                         [(datetime.datetime(2013, 10, 23), Decimal('-6.50'), 'food:lunch', None),
+                          (datetime.datetime(2013, 10, 11), Decimal('31.00'), None, None),
+                          (datetime.datetime(2013, 10, 11), Decimal('-48.00'), None, None)])
+        self.assertEqual(transactions[2].address, None)
+        self.assertRaises(AttributeError, object.__getattribute__, transactions[2], '_splits')
+        investment = qif.get_accounts('My Cc')[0].get_transactions()[0][1]
+        self.assertEqual((investment.amount, investment.security, investment.to_account),
+                         (Decimal('100.00'), None, None))
+        # accounts and categories are whole
+        self.assertEqual(qif.get_accounts('My Cash')[0].account_type, 'Cash')
+        self.assertEqual(len(qif.get_categories()), 2)
+        with open(filename) as fh:
+            items = list(QifParser.iter_records(fh, date_format='dmy',
+                                                fields=('to_account', 'splits')))
+        self.assertEqual(items[4].to_account, 'My Cc')
+        self.assertEqual(items[4].amount, None)
+        self.assertEqual(items[5].splits[0].to_account, 'My Cc')
+        self.assertEqual(items[5].splits[1].amount, Decimal('-17.00'))
+        self.assertEqual(items[5].address, None)
+        self.assertRaises(QifParserException, QifParser.parse_path, filename,
+                          fields=('payee', 'amounts'))
+
+    def testParsePath(self):
+        for fn in (filename, filename2, filename3):
+            with open(fn) as fh:
+                expected = str(QifParser.parse(fh, date_format='dmy'))
+            for block_size in (10, 1 << 20):
+                qif = QifParser.parse_path(fn, date_format='dmy', block_size=block_size)
+                self.assertEqual(str(qif), expected)
+        self._check(QifParser.parse_path(filename2, date_format='dmy'))
+        qif = QifParser.parse_path(build_data_path('date_format_03.qif'), num_sep=('.', ''))
+        self.assertEqual(qif.get_transactions()[0][0].date, datetime.datetime(2016, 1, 2))
+        with open(filename, 'rb') as fh:
+            data = fh.read()
+        fd, path = tempfile.mkstemp(suffix='.qif')
+        os.close(fd)
+        try:
+            with open(path, 'wb') as fh:
+                fh.write(data.replace(b'\n', b'\r'))
+            for block_size in (10, 1 << 20):
+                qif = QifParser.parse_path(path, date_format='dmy', block_size=block_size)
+                self.assertEqual(str(qif), data.decode('ascii'))
+            for content in (b'', b' \r\n\n'):
+                with open(path, 'wb') as fh:
+                    fh.write(content)
+                self.assertRaises(QifParserException, QifParser.parse_path, path)
+        finally:
+            os.remove(path)
+
+    def testParsePathLateDateGuess(self):
+        # the only date telling dmy from mdy comes after the sniffed samples
+        lines = ['!Type:Bank']
+        for i in range(1200):
+            lines.extend(['D%02d/01/2013' % (i % 12 + 1), 'T-1.00', '^'])
+        lines.extend(['D13/01/2013', 'T-2.00', '^'])
+        data = '\n'.join(lines) + '\n'
+        expected = str(QifParser.parse(io.StringIO(data)))
+        fd, path = tempfile.mkstemp(suffix='.qif')
+        os.close(fd)
+        try:
+            with open(path, 'w') as fh:
+                fh.write(data)
+            self.assertEqual(str(QifParser.parse_path(path)), expected)
+            self.assertEqual(str(QifParser.parse_parallel(path, workers=2)),
+                             expected)
+            records = list(QifParser.iter_records(io.StringIO(data)))
+            self.assertEqual(records[-1].date, datetime.datetime(2013, 1, 13))
+            self.assertEqual(len(records), 1201)
+        finally:
+            os.remove(path)
+        self.assertRaises(QifParserInvalidDate, QifParser.sniffFormats,
+                          iter(lines))
+
+    def testParseParallel(self):
+        for fn in (filename, filename2, filename3):
+            with open(fn) as fh:
+                expected = str(QifParser.parse(fh, date_format='dmy'))
+            for workers in (1, 2, 5):
+                qif = QifParser.parse_parallel(fn, workers=workers, date_format='dmy')
+                self.assertEqual(str(qif), expected)
+        qif = QifParser.parse_parallel(filename, workers=3, date_format='dmy')
+        self._check(qif)
+
+    def testParseMany(self):
+        tmpdir = tempfile.mkdtemp()
+        bad_date = os.path.join(tmpdir, 'bad_date.qif')
+        bad_number = os.path.join(tmpdir, 'bad_number.qif')
+        empty = os.path.join(tmpdir, 'empty.qif')
+        missing = os.path.join(tmpdir, 'missing.qif')
+        with open(bad_date, 'w') as fh:
+            fh.write('!Type:Bank\nD32/13/2013\nT1.00\n^\n')
+        with open(bad_number, 'w') as fh:
+            fh.write('!Type:Bank\nD01/02/2013\nT1.0.0\n^\n')
+        with open(empty, 'w') as fh:
+            fh.write('\n')
+        paths = [filename, bad_date, filename2, bad_number, empty, missing,
+                 filename3]
+        try:
+            for task_size in (1, 1 << 20):
+                batch = QifParser.parse_many(paths, workers=2,
+                                             date_format='dmy',
+                                             num_sep=('.', ''),
+                                             task_size=task_size)
+                self.assertEqual([result.path for result in batch], paths)
+                self.assertEqual([result.path for result in batch.errors],
+                                 [bad_date, bad_number, empty, missing])
+                errors = [result.error for result in batch.errors]
+                self.assertTrue(isinstance(errors[0], QifParserInvalidDate))
+                self.assertTrue(isinstance(errors[1], QifParserInvalidNumber))
+                self.assertTrue(isinstance(errors[2], QifParserException))
+                self.assertTrue(isinstance(errors[3], EnvironmentError))
+                for result in batch:
+                    if result.error is None:
+                        with open(result.path) as fh:
+                            expected = str(QifParser.parse(fh, date_format='dmy'))
+                        self.assertEqual(str(result.qif), expected)
+                        self.assertEqual(result.size, os.path.getsize(result.path))
+                self._check(batch.results[0].qif)
+                self.assertEqual(batch.size, sum(result.size for result in batch))
+                self.assertTrue(batch.bytes_per_second > 0)
+            # formats are guessed per file
+            batch = QifParser.parse_many([filename, filename2], workers=1)
+            self.assertEqual(batch.errors, [])
+        finally:
+            for path in (bad_date, bad_number, empty):
+                os.remove(path)
+            os.rmdir(tmpdir)
+
+    def testParseManyInvalidEntries(self):
+        tmpdir = tempfile.mkdtemp()
+        bad_type = os.path.join(tmpdir, 'bad_type.qif')
+        no_account = os.path.join(tmpdir, 'no_account.qif')
+        with open(bad_type, 'w') as fh:
+            fh.write('!Account\nNMy Port\nTPort\n^\n')
+        with open(no_account, 'w') as fh:
+            fh.write('!Type:Invst\nD01/02/2013\nNBuy\nT1.00\n^\n')
+        paths = [bad_type, filename, no_account]
+        try:
+            for workers in (1, 2):
+                batch = QifParser.parse_many(paths, workers=workers,
+                                             date_format='dmy',
+                                             num_sep=('.', ''))
+                self.assertEqual([result.path for result in batch.errors],
+                                 [bad_type, no_account])
+                self.assertTrue(isinstance(batch.results[0].error, QifParserInvalidValue))
+                self.assertTrue(isinstance(batch.results[2].error, RuntimeError))
+                self._check(batch.results[1].qif)
+        finally:
+            for path in paths[::2]:
+                os.remove(path)
+            os.rmdir(tmpdir)
+
+    def testFindShards(self):
+        with open(filename, 'rb') as fh:
+            data = fh.read()
+        shards = QifParser._findShards(data, 4, 'ascii')
+        self.assertEqual([(header, has_account) for start, end, header, has_account in shards],
+                         [(None, False), ('!Type:Cash', True), ('!Type:Invst', True), ('!Type:Invst', True)])
+        self.assertEqual(b''.join(data[start:end] for start, end, header, has_account in shards), data)
+        for start, end, header, has_account in shards[1:]:
+            self.assertEqual(data[start - 2:start], b'^\n')
+
     def testParseQifNumber(self):
         self.assertEqual(QifParser.parseQifNumber('1'), Decimal('1'))
         self.assertEqual(QifParser.parseQifNumber('1.2'), Decimal('1.2'))
@@ -132,6 +550,28 @@ class TestQIFParsing(unittest.TestCase):
         self.assertRaises(QifParserException, QifParser.parseQifNumber, '-1234.56', decimal_sep=',')
 
 
+    def testNumberParser(self):
+        samples = ['1', '1.2', '-1234.56', '-0.99', '5.', '+3.50', '1,234.56', '-1.234,56', '1.234', '12,5']
+        for decimal_sep, thousands_sep in [('.', ''), ('.', ','), (',', ''), (',', '.')]:
+            parse_number = number_parser(decimal_sep, thousands_sep)
+            for sample in samples:
+                try:
+                    expected = QifParser.parseQifNumber(sample, decimal_sep, thousands_sep)
+                except Exception:
+                    self.assertRaises(QifParserInvalidNumber, parse_number, sample)
+                else:
+                    self.assertEqual(parse_number(sample), expected)
+        self.assertRaises(QifParserException, number_parser, ',', ',')
+
+    def testNumberParserScaled(self):
+        to_cents = number_parser(scale=2)
+        self.assertEqual([to_cents(x) for x in ['-6.50', '-0.99', '31', '5.', '1.230']], [-650, -99, 3100, 500, 123])
+        self.assertRaises(QifParserInvalidNumber, to_cents, '1.234')
+        to_cents = number_parser(',', '.', scale=2)
+        self.assertEqual([to_cents(x) for x in ['-1.234,56', '-0,9', '7']], [-123456, -90, 700])
+        self.assertRaises(QifParserInvalidNumber, to_cents, '1234,56')
+
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+import timeit
+import unittest
+
+from qifparse.parser import QifParser, number_parser
+
+
+def best_times(funcs, repeat=7):
+    """
+    Best running time of each function, running them in turn so that they
+    all suffer the same noise
+    """
+    times = [[] for func in funcs]
+    for _ in range(repeat):
+        for func, func_times in zip(funcs, times):
+            func_times.append(timeit.timeit(func, number=1))
+    return [min(func_times) for func_times in times]
+
+
+# wall clock comparisons are noisy on loaded machines: run them on demand
+PERFORMANCE_TESTS = bool(os.environ.get('QIFPARSE_PERFORMANCE_TESTS'))
+
+
+@unittest.skipUnless(PERFORMANCE_TESTS,
+                     "set QIFPARSE_PERFORMANCE_TESTS to compare timings")
+class TestNumberParserPerformance(unittest.TestCase):
+    # (field code, min value, max value, decimals) of the number fields
+    FIELDS = [
+        ('T', -5000, 5000, 2),  # amount
+        ('$', -5000, 5000, 2),  # split amount
+        ('I', 0, 500, 3),  # price
+        ('Q', 0, 1000, 3),  # quantity
+        ('O', 0, 50, 2),  # commission
+    ]
+
+    def testPerAmountCost(self):
+        rnd = random.Random(0)
+        parse_number = number_parser('.', '')
+        parse_scaled = number_parser('.', '', scale=3)
+        for code, low, high, decimals in self.FIELDS:
+            samples = ['%.*f' % (decimals, rnd.uniform(low, high))
+                       for _ in range(5000)]
+            generic, specialised, scaled = best_times([
+                lambda: [QifParser.parseQifNumber(x, '.', '')
+                         for x in samples],
+                lambda: [parse_number(x) for x in samples],
+                lambda: [parse_scaled(x) for x in samples],
+            ])
+            self.assertLess(specialised, generic, "%s field: %.0fns >= %.0fns"
+                            % (code, specialised / len(samples) * 1e9,
+                               generic / len(samples) * 1e9))
+            self.assertLess(scaled, generic, "%s field: %.0fns >= %.0fns"
+                            % (code, scaled / len(samples) * 1e9,
+                               generic / len(samples) * 1e9))
+
+
+if __name__ == "__main__":
+    unittest.main()
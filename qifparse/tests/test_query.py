@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import unittest
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from qifparse import qif
+from qifparse.parser import QifParser
+
+
+def build_data_path(fn):
+    return os.path.join(os.path.dirname(__file__), 'data', fn)
+
+filename = build_data_path('file.qif')
+
+
+class TestQuery(unittest.TestCase):
+
+    def setUp(self):
+        with open(filename) as fh:
+            self.qif = QifParser.parse(fh, date_format='dmy')
+
+    def amounts(self, **kwargs):
+        return [str(item.amount) for item in self.qif.query(**kwargs)]
+
+    def testFilters(self):
+        self.assertEqual(len(self.qif.query()), 7)
+        self.assertEqual(self.amounts(account='My Cash'),
+                         ['-6.50', '31.00', '-48.00'])
+        self.assertEqual(self.amounts(account='Unknown'), [])
+        self.assertEqual(self.amounts(start=date(2013, 10, 11)),
+                         ['-6.50', '31.00', '-48.00'])
+        self.assertEqual(self.amounts(start=datetime(1993, 1, 1),
+                                      end=date(1993, 7, 25)), ['1000.00'])
+        self.assertEqual(self.amounts(payee='Joe Hayes'), ['-50.00'])
+        self.assertEqual(self.amounts(payee='Joe*'), ['-50.00'])
+        self.assertEqual(self.amounts(category='food:lunch'),
+                         ['-6.50', '-48.00'])
+        self.assertEqual(self.amounts(category='food:*'),
+                         ['-6.50', '-48.00'])
+        self.assertEqual(self.amounts(category='food'), [])
+        self.assertEqual(self.amounts(category='Tele*'), ['-25.00'])
+        self.assertEqual(self.amounts(min_amount=0),
+                         ['31.00', '1000.00', '100.00'])
+        self.assertEqual(self.amounts(min_amount=Decimal('-30'),
+                                      max_amount=Decimal('31')),
+                         ['-6.50', '31.00', '-25.00'])
+        self.assertEqual(self.amounts(account='My Cash',
+                                      category='food:*',
+                                      max_amount=-10), ['-48.00'])
+
+    def testInvalidation(self):
+        index = self.qif.get_transaction_index()
+        self.assertTrue(self.qif.get_transaction_index() is index)
+        cash = self.qif.get_accounts('My Cash')[0]
+        cash.add_transaction(qif.Transaction(
+            date=datetime(2013, 10, 12), amount=Decimal('-3.00'),
+            category='food:coffee'))
+        self.assertFalse(self.qif.get_transaction_index() is index)
+        self.assertEqual(self.amounts(category='food:*'),
+                         ['-6.50', '-48.00', '-3.00'])
+        acc = qif.Account(name='Savings')
+        acc.add_transaction(qif.Transaction(amount=Decimal('5')),
+                            header='!Type:Bank')
+        self.qif.add_account(acc)
+        self.assertEqual(self.amounts(account='Savings'), ['5'])
+        self.qif.add_transaction(qif.Transaction(amount=Decimal('7')),
+                                 header='!Type:Bank')
+        self.assertEqual(len(self.qif.query()), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import unittest
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+from qifparse import qif, snapshot
+from qifparse.parser import QifParser
+
+
+def build_data_path(fn):
+    return os.path.join(os.path.dirname(__file__), 'data', fn)
+
+filenames = [build_data_path(fn) for fn in (
+    'file.qif', 'file2.qif', 'transactions_only.qif')]
+
+
+def round_trip(qif_obj, source=None):
+    fh = io.BytesIO()
+    qif_obj.save_snapshot(fh, source)
+    fh.seek(0)
+    return qif.Qif.load_snapshot(fh, source)
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def testRoundTrip(self):
+        for fn in filenames:
+            with open(fn) as fh:
+                expected = QifParser.parse(fh, date_format='dmy')
+            loaded = round_trip(expected)
+            self.assertEqual(str(loaded), str(expected))
+            self.assertEqual(
+                [(account and account.name, header, type(item))
+                 for account, header, item in loaded.iter_transactions()],
+                [(account and account.name, header, type(item))
+                 for account, header, item in expected.iter_transactions()])
+        with open(filenames[0]) as fh:
+            loaded = round_trip(QifParser.parse(fh, date_format='dmy'))
+        cash = loaded.get_accounts('My Cash')[0]
+        self.assertEqual(cash.account_type, 'Cash')
+        tr = cash.get_transactions()[0][1]
+        self.assertEqual(tr.amount, Decimal('31.00'))
+        self.assertEqual(str(tr.amount), '31.00')
+        self.assertEqual(len(loaded.query(category='food:*')), 2)
+        self.assertEqual(len(loaded.get_categories(expense=True)), 2)
+
+    def testLazy(self):
+        with open(filenames[0]) as fh:
+            expected = QifParser.parse(fh, date_format='dmy')
+        with open(filenames[0]) as fh:
+            lazy = QifParser.parse(fh, date_format='dmy', lazy=True)
+        loaded = round_trip(lazy)
+        self.assertEqual(str(loaded), str(expected))
+        tr = loaded.get_accounts('My Cash')[0].get_transactions()[0][0]
+        self.assertTrue(type(tr) is qif.Transaction)
+
+    def testValues(self):
+        tr = qif.Transaction(date=datetime(2015, 3, 4, 12, 30),
+                             amount=Decimal('-1.5'), payee='Shop',
+                             address=['Street', 'Town'], num=12)
+        tr.splits.append(qif.AmountSplit(amount=Decimal('-1.25'),
+                                         category='food'))
+        tr.splits.append(qif.AmountSplit(amount=1.5, to_account='Cash'))
+        memorized = qif.MemorizedTransaction(amount=Decimal('2'), mtype='C')
+        qif_obj = qif.Qif()
+        qif_obj.add_transaction(tr, header='!Type:Bank')
+        qif_obj.add_transaction(memorized, header='!Type:Memorized')
+        loaded = round_trip(qif_obj)
+        self.assertEqual(str(loaded), str(qif_obj))
+        loaded_tr = loaded.get_transactions()[0][0]
+        self.assertEqual(loaded_tr.date, datetime(2015, 3, 4, 12, 30))
+        self.assertEqual(loaded_tr.num, 12)
+        self.assertEqual(loaded_tr.address, ['Street', 'Town'])
+        self.assertEqual([split.amount for split in loaded_tr.splits],
+                         [Decimal('-1.25'), 1.5])
+        self.assertEqual(loaded_tr.memo, None)
+        self.assertEqual(loaded.get_transactions()[1][0].mtype, 'C')
+        # values of other types are stored as tagged JSON, not pickled
+        tr.memo = [Decimal('NaN'), datetime(2015, 3, 4).date(), None, 2.5]
+        loaded_tr = round_trip(qif_obj).get_transactions()[0][0]
+        self.assertEqual(str(loaded_tr.memo), str(tr.memo))
+        tr.memo = object()
+        self.assertRaises(ValueError, qif_obj.save_snapshot, io.BytesIO())
+
+    def testSource(self):
+        key = snapshot.SourceKey(10, 1.5, 'abc', {'date_format': 'dmy'})
+        with open(filenames[0]) as fh:
+            qif_obj = QifParser.parse(fh, date_format='dmy')
+        fh = io.BytesIO()
+        qif_obj.save_snapshot(fh, key)
+        fh.seek(0)
+        self.assertEqual(snapshot.read_source(fh), key)
+        fh.seek(0)
+        self.assertRaises(ValueError, qif.Qif.load_snapshot, fh,
+                          key._replace(digest='abd'))
+        self.assertRaises(ValueError, qif.Qif.load_snapshot,
+                          io.BytesIO(b'!Type:Bank\n'))
+
+    def testCorrupt(self):
+        with open(filenames[0]) as fh:
+            qif_obj = QifParser.parse(fh, date_format='dmy')
+        fh = io.BytesIO()
+        qif_obj.save_snapshot(fh)
+        data = fh.getvalue()
+        for size in [0, 8, 12, 16, 100] + list(range(len(data) - 400, len(data))):
+            self.assertRaises(ValueError, qif.Qif.load_snapshot,
+                              io.BytesIO(data[:size]))
+        self.assertRaises(ValueError, qif.Qif.load_snapshot,
+                          io.BytesIO(data + b'\x00'))
+        for position in (10, 30, len(data) - 100, len(data) - 1):
+            damaged = bytearray(data)
+            damaged[position] ^= 1
+            self.assertRaises(ValueError, qif.Qif.load_snapshot,
+                              io.BytesIO(bytes(damaged)))
+
+    def testParseCachedCorrupt(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'file.qif')
+            shutil.copy(filenames[0], path)
+            cache_path = path + '.snapshot'
+            qif_obj = QifParser.parse_cached(path, date_format='dmy')
+            with open(cache_path, 'rb') as fh:
+                data = fh.read()
+            for size in (12, 100, len(data) - 300, len(data) - 1):
+                with open(cache_path, 'wb') as fh:
+                    fh.write(data[:size])
+                cached = QifParser.parse_cached(path, date_format='dmy')
+                self.assertEqual(str(cached), str(qif_obj))
+                # the snapshot has been saved again
+                with open(cache_path, 'rb') as fh:
+                    self.assertEqual(fh.read(), data)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def testParseCached(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'file.qif')
+            shutil.copy(filenames[0], path)
+            cache_path = path + '.snapshot'
+            qif_obj = QifParser.parse_cached(path, date_format='dmy',
+                                             num_sep=('.', ''))
+            self.assertTrue(os.path.exists(cache_path))
+            with open(cache_path, 'rb') as fh:
+                key = snapshot.read_source(fh)
+            self.assertTrue(snapshot.matches(
+                key, path, date_format='dmy', num_sep=('.', ''),
+                encoding=key.options['encoding']))
+            self.assertFalse(snapshot.matches(
+                key, path, date_format='mdy', num_sep=('.', ''),
+                encoding=key.options['encoding']))
+            cached = QifParser.parse_cached(path, date_format='dmy',
+                                            num_sep=('.', ''))
+            self.assertEqual(str(cached), str(qif_obj))
+            # same size, other content
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            with open(path, 'wb') as fh:
+                fh.write(data.replace(b'T31.00', b'T32.00'))
+            changed = QifParser.parse_cached(path, date_format='dmy',
+                                             num_sep=('.', ''))
+            self.assertTrue('T32.00' in str(changed))
+            with open(cache_path, 'rb') as fh:
+                self.assertNotEqual(snapshot.read_source(fh).digest,
+                                    key.digest)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    unittest.main()
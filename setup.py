@@ -34,11 +34,15 @@ setup(name='qifparse',
       packages=find_packages(exclude=['ez_setup']),
       include_package_data=True,
       zip_safe=False,
-      test_suite='qifparse',
+      test_suite='qifparse.tests.test_suite',
       install_requires=[
           'setuptools',
           'six',
       ],
+      extras_require={
+          'numpy': ['numpy'],
+          'arrow': ['pyarrow'],
+      },
       entry_points="""
       """,
       )